@@ -0,0 +1,198 @@
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from dedup_index import IdSet, contains_ids, open_ids
+from keyword_analysis import (KEYWORDS, count_trend_hits, iter_clean_frames, report_top_hashtags,
+                              save_cooccurrence, save_trends, trend_table)
+from keyword_index import build_automaton, cooccurrence_counts, keyword_hit_matrix
+from post_store import is_store_path, time_range
+from rotating_output import input_files
+
+# 合并两份 (区间, 关键词下标) 计数
+def merge_trend_counts(a, b):
+    if a.empty:
+        return b
+    if b.empty:
+        return a
+    return pd.concat([a, b]).groupby(level=[0, 1]).sum()
+
+# 处理单个分片：按块加载、清洗、匹配关键词，只保留部分聚合结果，内存占用与块大小有关而与分片大小无关
+# filters 为 iter_clean_frames 的筛选条件（since/until/uids/match），帖子库分片在库里筛选
+# ids_path 不为 None 时把本分片出现的全部微博 id 按排好序的 int64 写入该文件，用于跨分片去重，
+# 结果中的 id_range 为 (最小 id, 最大 id)；only_path 为 id 文件时只统计其中的微博
+def analyze_shard(path, keywords, interval='M', chunk_size=100000, filters=None, ids_path=None, only_path=None):
+    automaton = build_automaton(keywords)
+    posts = 0
+    trends = pd.Series(dtype='int64')
+    cooccurrence = sparse.csr_matrix((len(keywords), len(keywords)), dtype=np.int64)
+    hashtags = Counter()
+    seen = IdSet()
+    only = open_ids(only_path) if only_path is not None else None
+    for frame in iter_clean_frames(path, chunk_size, seen=seen, only=only, **(filters or {})):
+        if frame.empty:
+            continue
+        hits = keyword_hit_matrix(frame['text'], keywords, automaton)
+        posts += len(frame)
+        # 区间边界以 epoch 为起点，各块、各分片的区间才能直接相加
+        trends = merge_trend_counts(trends, count_trend_hits(frame['created_at'], hits, interval, origin='epoch'))
+        cooccurrence = cooccurrence + cooccurrence_counts(hits).astype(np.int64)
+        hashtags.update(chain.from_iterable(frame['hashtags']))
+    result = {'path': path, 'posts': posts, 'trends': trends, 'cooccurrence': cooccurrence, 'hashtags': hashtags,
+              'ids': None, 'id_range': None}
+    if ids_path is not None and len(seen):
+        seen.save(ids_path)
+        result.update(ids=ids_path, id_range=(int(seen.ids[0]), int(seen.ids[-1])))
+    return result
+
+# 从一个分片的结果中减去其中部分微博的贡献；各项都是按微博累加的计数，相减后与没统计这些微博的结果相同
+def subtract_part(part, other):
+    trends = merge_trend_counts(part['trends'], -other['trends'])
+    part.update(posts=part['posts'] - other['posts'], trends=trends[trends != 0],
+                cooccurrence=part['cooccurrence'] - other['cooccurrence'])
+    part['hashtags'] -= other['hashtags']
+    return part
+
+# 同一次分片爬取（shard_crawl）的输出 all_weibos.shard0.txt、all_weibos.shard1.00003.txt.zst 等：
+# 分片按用户划分，不同分片的微博不会重复
+SHARD_OUTPUT = re.compile(r'(?P<root>.+)\.shard(?P<index>\d+)(?:\.\d{5})?(?P<ext>\.[^./\\]+)(?:\.gz|\.zst)?$')
+
+# 两个输入分片是否可能有相同的微博
+def may_overlap(a, b):
+    match_a, match_b = SHARD_OUTPUT.match(a), SHARD_OUTPUT.match(b)
+    if match_a is None or match_b is None:
+        return True
+    return match_a.group('root', 'ext') != match_b.group('root', 'ext') or match_a['index'] == match_b['index']
+
+# 与 WeiboAnalyzer 一样，同一条微博在多个分片（重叠的分片、增量爬取的文件）中出现时只统计第一次：
+# 按输入顺序找出每个分片中已在前面分片出现过的 id。各分片的 id 是磁盘上排好序的数组，按块二分查找比较，
+# id 范围不相交的分片直接跳过；重复的 id 写入 workdir 下的文件，返回 {路径: 重复 id 文件}，没有重复的分片不在其中
+def overlapping_ids(paths, parts, workdir, chunk_size=100000):
+    overlaps = {}
+    for i, path in enumerate(paths):
+        if parts[path]['ids'] is None:
+            continue
+        ids = open_ids(parts[path]['ids'])
+        duplicates = []
+        for earlier in paths[:i]:
+            other = parts[earlier]
+            if other['ids'] is None or not may_overlap(earlier, path):
+                continue
+            low, high = other['id_range']
+            start, stop = np.searchsorted(ids, low), np.searchsorted(ids, high, side='right')
+            if start == stop:
+                continue
+            others = open_ids(other['ids'])
+            for offset in range(start, stop, chunk_size):
+                block = np.asarray(ids[offset:min(offset + chunk_size, stop)])
+                duplicates.append(block[contains_ids(others, block)])
+        duplicates = np.unique(np.concatenate(duplicates)) if duplicates else []
+        if len(duplicates):
+            overlaps[path] = os.path.join(workdir, f'{i}.dup')
+            duplicates.astype('<i8').tofile(overlaps[path])
+    return overlaps
+
+# 展开命令行中的通配符，分段输出的清单展开为各分段（每个分段一个任务），保持顺序并去重
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matched = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matched:
+            for part in (input_files(path) if os.path.exists(path) else [path]):
+                if part not in paths:
+                    paths.append(part)
+    return paths
+
+# 多进程分析多个分片：每个分片一个任务，全部完成后按 id 跨分片去重再合并
+# 可能与其他分片重复的分片（不是同一次分片爬取的不同分片）把 id 写入临时文件，主进程按块比较找出重复的微博，
+# 只把这些微博在后面分片中的贡献单独统计一次再减去；没有重复时不需要第二遍
+def run_analysis(paths, keywords, interval='M', chunk_size=100000, workers=None, filters=None):
+    keywords = list(dict.fromkeys(keywords))
+    posts = 0
+    trends = pd.Series(dtype='int64')
+    cooccurrence = sparse.csr_matrix((len(keywords), len(keywords)), dtype=np.int64)
+    hashtags = Counter()
+
+    def run(tasks):
+        if workers == 1:
+            # 单进程时直接在当前进程处理
+            return [analyze_shard(path, keywords, interval, chunk_size, filters, ids_path, only_path)
+                    for path, ids_path, only_path in tasks]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(analyze_shard, path, keywords, interval, chunk_size, filters, ids_path, only_path)
+                       for path, ids_path, only_path in tasks]
+            return [future.result() for future in as_completed(futures)]
+
+    with tempfile.TemporaryDirectory(prefix='weibo_analysis_') as workdir:
+        tasks = []
+        for i, path in enumerate(paths):
+            check = any(may_overlap(path, other) for other in paths if other != path)
+            tasks.append((path, os.path.join(workdir, f'{i}.ids') if check else None, None))
+        parts = {part['path']: part for part in run(tasks)}
+        overlaps = overlapping_ids(paths, parts, workdir, chunk_size)
+        if overlaps:
+            print(f"{len(overlaps)} 个分片中有与前面分片重复的微博，单独统计这些微博后从结果中减去")
+            for duplicate in run([(path, None, only_path) for path, only_path in overlaps.items()]):
+                subtract_part(parts[duplicate['path']], duplicate)
+
+    for path in paths:
+        part = parts[path]
+        print(f"分片 {path} 完成: {part['posts']} 条微博")
+        posts += part['posts']
+        trends = merge_trend_counts(trends, part['trends'])
+        cooccurrence = cooccurrence + part['cooccurrence']
+        hashtags.update(part['hashtags'])
+
+    print(f"共分析 {len(paths)} 个分片，{posts} 条有效微博")
+    return {'posts': posts, 'trends': trend_table(trends, keywords, interval, origin='epoch'),
+            'cooccurrence': cooccurrence, 'hashtags': hashtags, 'keywords': keywords}
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程并行分析多个微博数据分片')
+    parser.add_argument('inputs', nargs='+', help='JSONL（可压缩）、Parquet分片文件、分段输出清单或帖子库（.db），支持通配符，如 "data/*.txt"')
+    parser.add_argument('--keywords', help='逗号分隔的关键词，默认使用报告核心关键词组', default=None)
+    parser.add_argument('--interval', help='趋势统计的时间区间', default='M')
+    parser.add_argument('--chunk-size', type=int, help='每块读取的微博条数，决定单个进程的内存占用', default=100000)
+    parser.add_argument('--workers', type=int, help='进程数，默认为CPU核数', default=os.cpu_count())
+    parser.add_argument('--top-n', type=int, help='输出的热门话题数量', default=20)
+    parser.add_argument('--since', help='只分析此时间（含）之后的微博，YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS', default=None)
+    parser.add_argument('--until', help='只分析此时间（不含）之前的微博', default=None)
+    parser.add_argument('--days', type=float, help='只分析最近多少天的微博，优先于 --since', default=None)
+    parser.add_argument('--uid', action='append', help='只分析这些用户的微博，可重复指定（需要帖子库）', default=None)
+    parser.add_argument('--match', action='append', help='只分析包含这些关键词之一的微博，可重复指定', default=None)
+    args = parser.parse_args()
+
+    paths = expand_inputs(args.inputs)
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"错误: 文件不存在 {missing}")
+        return
+    keywords = [kw.strip() for kw in args.keywords.split(',') if kw.strip()] if args.keywords else KEYWORDS
+    if args.uid and not all(is_store_path(path) for path in paths):
+        print("错误: 按用户筛选（--uid）需要帖子库（.db）输入")
+        return
+    since, until = time_range(args.since, args.until, args.days)
+    filters = {'since': since, 'until': until, 'uids': args.uid, 'match': args.match}
+
+    start = time.time()
+    print(f"正在用 {args.workers} 个进程分析 {len(paths)} 个分片...")
+    result = run_analysis(paths, keywords, args.interval, args.chunk_size, args.workers, filters)
+
+    save_trends(result['trends'])
+    save_cooccurrence(result['cooccurrence'], result['keywords'], result['posts'])
+    print("\n正在提取高频话题...")
+    report_top_hashtags(result['hashtags'], args.top_n)
+    print(f"分析完成，耗时 {time.time() - start:.1f} 秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+import aiohttp
+
+from http_transport import RETRY_STATUSES
+from rate_limiter import endpoint_family, parse_retry_after
+from crawl_state import filter_new_weibos
+from text_clean import clean_texts
+from weibo_crawler import WeiboCrawler, DEFAULT_BASE_URL, logger
+
+class AsyncWeiboCrawler(WeiboCrawler):
+    def __init__(self, cookie=None, base_url=DEFAULT_BASE_URL, per_host_limit=8, rate_limiter=None, endpoint_memo=None,
+                 response_cache=None, metrics=None, retries=2, keep_alive=True):
+        super().__init__(cookie=cookie, base_url=base_url, rate_limiter=rate_limiter, endpoint_memo=endpoint_memo,
+                         response_cache=response_cache, metrics=metrics)
+        # 每个主机的最大并发连接数，所有请求共用一个连接池
+        self.per_host_limit = per_host_limit
+        # 网络异常和 5xx 的重试次数，与同步版 HttpTransport.retries 含义相同
+        self.retries = retries
+        self.keep_alive = keep_alive
+        self.http = None
+
+    # 请求都走 aiohttp 会话，不创建同步版的 HttpTransport
+    def _init_transport(self, transport):
+        self.transport = None
+        self.session = None
+
+    # 创建共享的 aiohttp 会话（必须在事件循环内调用）
+    async def open(self):
+        if self.http is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self.per_host_limit, force_close=not self.keep_alive)
+            self.http = aiohttp.ClientSession(headers=self.headers, connector=connector)
+
+    # 关闭会话并释放连接池
+    async def close(self):
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+
+    # 发送GET请求，返回状态码和解析后的JSON（非200时为None）；与同步版一样先查响应缓存
+    # 网络异常和 5xx 最多重试 retries 次，每次重试都重新等待令牌，限速器先按失败降速退避
+    async def _get_json(self, url, timeout=30):
+        family = endpoint_family(url)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(url)
+            if cached is not None:
+                self.metrics.record_cache_hit(family)
+                return cached.status_code, cached.json()
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            await self.rate_limiter.async_wait(url)
+            start = time.perf_counter()
+            try:
+                async with self.http.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    self.rate_limiter.record(url, response.status,
+                                             parse_retry_after(response.headers.get('Retry-After')))
+                    if response.status != 200:
+                        self.metrics.record_request(family, response.status, time.perf_counter() - start,
+                                                    response.content_length or 0)
+                        if last or response.status not in RETRY_STATUSES:
+                            return response.status, None
+                        logger.debug("状态码 %s，重试 (%d/%d): %s", response.status, attempt + 1, self.retries, url)
+                        continue
+                    content = await response.read()
+                    self.metrics.record_request(family, response.status, time.perf_counter() - start, len(content))
+                    if self.response_cache is not None:
+                        self.response_cache.put(url, response.status, response.headers, content)
+                    return response.status, json.loads(content)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.metrics.record_request(family, None, time.perf_counter() - start)
+                self.rate_limiter.record(url, None)
+                if last:
+                    raise
+                logger.debug("请求失败，重试 (%d/%d): %s %s", attempt + 1, self.retries, url, e)
+
+    # 获取用户基本信息
+    async def get_user_info_async(self, user_id):
+        url = f'{self.base_url}/ajax/profile/info?uid={user_id}'
+        try:
+            status, data = await self._get_json(url)
+            if status == 200 and data.get('ok') == 1 and 'data' in data:
+                return data['data']['user']
+            logger.warning("获取用户信息失败: %s 状态码 %s", user_id, status)
+            return None
+        except Exception as e:
+            logger.warning("获取用户信息失败: %s", e)
+            return None
+
+    # 获取用户的微博列表，与同步版本共用接口记忆
+    async def get_user_weibos_async(self, user_id, page=1, count=20):
+        candidates = self.endpoint_memo.candidates(self.base_url, user_id, page, count)
+
+        for attempts, (name, url) in enumerate(candidates, 1):
+            try:
+                status, data = await self._get_json(url, timeout=30)
+                if status == 200:
+                    if data.get('ok') == 1 and 'data' in data:
+                        weibo_list = data['data']['list']
+                        total = data['data'].get('total', 0)
+                        self.endpoint_memo.record_success(name, attempts)
+                        return weibo_list, total
+                    else:
+                        logger.warning("API返回错误: %s", data)
+                else:
+                    logger.warning("HTTP请求失败: %s，尝试下一个接口...", status)
+                self.endpoint_memo.record_failure(name, status)
+            except Exception as e:
+                logger.warning("请求失败: %s", e)
+                self.endpoint_memo.record_failure(name)
+                continue
+
+        logger.warning("用户 %s 第 %d 页所有API接口都失败了", user_id, page)
+        self.endpoint_memo.record_exhausted(len(candidates))
+        return [], 0
+
+    # 获取微博下的评论，按 max_id 翻页，规则与同步版 get_comments 相同
+    async def get_comments_async(self, weibo_id, count=10, max_pages=1):
+        comments = []
+        max_id = 0
+        fetched_pages = 0
+        while max_pages is None or fetched_pages < max_pages:
+            url = f"{self.base_url}/ajax/statuses/buildComments?is_reload=1&id={weibo_id}&is_show_bulletin=2&is_mix=0&count={count}"
+            if max_id:
+                url += f"&max_id={max_id}"
+            try:
+                status, data = await self._get_json(url, timeout=10)
+                if data is not None and data.get("ok") == 1 and "data" in data:
+                    texts = clean_texts([c.get("text", "") for c in data["data"]])
+                    for c, text in zip(data["data"], texts):
+                        comments.append({
+                            "user": c.get("user", {}).get("screen_name", ""),
+                            "text": text,
+                            "like_count": c.get("like_count", 0)
+                        })
+                    fetched_pages += 1
+                    max_id = data.get("max_id", 0)
+                    if not max_id or not data["data"]:
+                        break
+                else:
+                    break
+            except Exception as e:
+                logger.warning("获取评论失败: %s", e)
+                break
+        return comments
+
+    # 爬取用户的所有微博（页与页之间仍按顺序，因为需要根据返回条数判断是否到最后一页）
+    # 返回 [(页码, 微博列表), ...] 和用户名；用户不存在时页列表为 None
+    async def crawl_user_pages_async(self, user_id, max_pages=None, start_page=1, since_id=None):
+        user_info = await self.get_user_info_async(user_id)
+        if not user_info:
+            logger.warning("未找到用户 %s 的信息", user_id)
+            return None, str(user_id)
+
+        screen_name = user_info.get('screen_name', user_id)
+        pages = []
+        page = start_page
+
+        while max_pages is None or page <= max_pages:
+            weibos, total = await self.get_user_weibos_async(user_id, page)
+            if not weibos:
+                break
+
+            new_weibos, reached_seen = filter_new_weibos(weibos, since_id)
+            pages.append((page, new_weibos))
+            if reached_seen or len(weibos) < 20:
+                break
+
+            page += 1
+
+        return pages, screen_name
+
+    # 爬取用户微博，并并发获取每条微博的评论
+    async def crawl_user_with_comments_async(self, user_id, max_pages=None, journal=None, since_id=None, comment_pages=1,
+                                             dedup=None):
+        start_page = journal.next_page(user_id) if journal is not None else 1
+        pages, screen_name = await self.crawl_user_pages_async(user_id, max_pages, start_page, since_id)
+        if pages is None:
+            return None, screen_name
+        if dedup is not None:
+            # 已写过的微博不再抓评论
+            pages = [(page, [weibo for weibo in weibos if not dedup.check(weibo)]) for page, weibos in pages]
+        jobs = [(page, weibo) for page, weibos in pages for weibo in weibos]
+        results = await asyncio.gather(*(self._comments_for(weibo, user_id, page, journal, comment_pages)
+                                         for page, weibo in jobs))
+        for (page, weibo), comments in zip(jobs, results):
+            weibo["comments"] = comments
+        return pages, screen_name
+
+    async def _comments_for(self, weibo, user_id, page, journal, comment_pages):
+        weibo_id = weibo.get("id")
+        if not weibo_id or weibo.get("comments_count") == 0:
+            return []
+        if journal is not None:
+            cached = journal.cached_comments(user_id, page, weibo_id)
+            if cached is not None:
+                return cached
+        comments = await self.get_comments_async(weibo_id, count=10, max_pages=comment_pages)
+        if journal is not None:
+            journal.record_comments(user_id, page, weibo_id, comments)
+        return comments
+
+# 异步批量爬取：多个用户同时在途，但按输入顺序汇总，输出与同步版 batch_crawl 一致
+# output / journal / state / incremental / dedup / retweets 的含义与 batch_crawl 相同
+async def async_batch_crawl(user_ids, cookie=None, max_pages=None, total_limit=10000,
+                            base_url=DEFAULT_BASE_URL, user_concurrency=8, per_host_limit=8, rate_limiter=None,
+                            journal=None, output=None, state=None, incremental=False, endpoint_memo=None,
+                            comment_pages=1, response_cache=None, dedup=None, retweets=None, metrics=None,
+                            retries=2, keep_alive=True):
+    crawler = AsyncWeiboCrawler(cookie=cookie, base_url=base_url, per_host_limit=per_host_limit,
+                                rate_limiter=rate_limiter, endpoint_memo=endpoint_memo,
+                                response_cache=response_cache, metrics=metrics, retries=retries,
+                                keep_alive=keep_alive)
+    all_weibos = []
+    total_count = journal.written if journal is not None else 0
+
+    logger.info("开始异步批量爬取，目标：总微博数≥%d", total_limit)
+    logger.info("用户列表长度: %d", len(user_ids))
+    logger.info("每个用户最大爬取页数: %s", max_pages if max_pages else '无限制')
+    logger.info("同时爬取用户数: %d，每主机最大连接数: %d，重试 %d 次，keep-alive %s",
+                user_concurrency, per_host_limit, retries, '开' if keep_alive else '关')
+
+    todo = [(i, user_id) for i, user_id in enumerate(user_ids, 1)
+            if journal is None or not journal.is_user_done(user_id)]
+    if total_count >= total_limit:
+        logger.info("已达到目标：总微博数 %d", total_count)
+        return all_weibos, crawler
+
+    await crawler.open()
+    pending = deque()
+    next_index = 0
+    try:
+        for i, user_id in todo:
+            # 保持窗口内始终有 user_concurrency 个用户在途
+            while next_index < len(todo) and len(pending) < user_concurrency:
+                uid = todo[next_index][1]
+                since_id = state.since_id(uid) if state is not None and incremental else None
+                task = asyncio.create_task(crawler.crawl_user_with_comments_async(uid, max_pages, journal, since_id,
+                                                                                  comment_pages, dedup))
+                pending.append(task)
+                next_index += 1
+
+            task = pending.popleft()
+            logger.info("\n正在处理第 %d/%d 个用户: %s", i, len(user_ids), user_id)
+            try:
+                pages, screen_name = await task
+            except Exception as e:
+                logger.warning("处理用户 %s 时出错: %s", user_id, e)
+                continue
+
+            user_count = 0
+            for page, weibos in pages or []:
+                weibos = weibos[:total_limit - total_count]
+                for weibo in weibos:
+                    if retweets is not None:
+                        retweets.detach(weibo)
+                    if output is not None:
+                        output.write(weibo)
+                    else:
+                        all_weibos.append(weibo)
+                    if state is not None:
+                        state.advance(user_id, weibo)
+                    crawler.metrics.add_posts(1, len(weibo.get('comments') or ()))
+                if dedup is not None:
+                    dedup.commit(weibos)
+                if journal is not None:
+                    journal.record_page(user_id, page, len(weibos))
+                total_count += len(weibos)
+                user_count += len(weibos)
+                if total_count >= total_limit:
+                    logger.info("已达到目标：总微博数 %d", total_count)
+                    return all_weibos, crawler
+
+            if journal is not None:
+                journal.record_user(user_id)
+            logger.info("用户 %s 爬取到 %d 条微博", screen_name, user_count)
+            logger.info("当前累计：总微博数 %d", total_count)
+
+            if i >= 20 and total_count >= total_limit * 0.8:
+                logger.info("已爬取 %d 个用户，达到预期目标，提前停止", i)
+                return all_weibos, crawler
+    finally:
+        # 提前停止时取消尚未完成的任务
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await crawler.close()
+
+    logger.info("所有用户处理完成，最终结果：总微博数 %d", total_count)
+    return all_weibos, crawler
+
+# 同步入口，供 main() 调用
+def run_async_batch_crawl(user_ids, cookie=None, max_pages=None, total_limit=10000, **kwargs):
+    return asyncio.run(async_batch_crawl(user_ids, cookie, max_pages, total_limit, **kwargs))
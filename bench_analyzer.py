@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from keyword_analysis import WeiboAnalyzer
+
+WORDS = ['情绪价值', '悦己', '仪式感', '宠物', 'Citywalk', '泡泡玛特', '周边游', '治愈', '平替', '搭子', '咖啡', '周末']
+
+# 生成接近真实接口返回结构的测试数据
+def generate_corpus(path, lines, seed=0):
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=8)))
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            created_at = base + timedelta(minutes=rng.randint(0, 60 * 24 * 600))
+            a, b, c = rng.sample(WORDS, 3)
+            text = f"今天{a}和{b} #{c}# 真的很<a href='https://weibo.com/x'>好</a> http://t.cn/A{i} 开心"
+            weibo = {
+                'id': 5000000000000000 + i,
+                'created_at': created_at.strftime('%a %b %d %H:%M:%S %z %Y'),
+                'text': text,
+                'text_raw': text,
+                'reposts_count': rng.randint(0, 100),
+                'user': {'id': 1000 + i % 500, 'screen_name': f'用户{i % 500}'},
+                'comments': [{'user': 'c', 'text': '评论', 'like_count': 1}],
+            }
+            f.write(json.dumps(weibo, ensure_ascii=False) + '\n')
+
+def timed_load(path, vectorized):
+    analyzer = WeiboAnalyzer(path)
+    start = time.perf_counter()
+    analyzer.load_and_clean_data(vectorized=vectorized)
+    return time.perf_counter() - start, analyzer.df
+
+def main():
+    parser = argparse.ArgumentParser(description='对比逐行加载与向量化加载的速度')
+    parser.add_argument('--lines', type=int, help='生成的测试数据行数', default=1000000)
+    parser.add_argument('--file', help='使用已有的JSONL文件，不再生成', default=None)
+    args = parser.parse_args()
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.gettempdir(), f'bench_weibos_{args.lines}.txt')
+        if not os.path.exists(path):
+            print(f"正在生成 {args.lines} 行测试数据: {path}")
+            generate_corpus(path, args.lines)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+
+    rowwise_time, rowwise_df = timed_load(path, vectorized=False)
+    vectorized_time, vectorized_df = timed_load(path, vectorized=True)
+
+    same = (len(rowwise_df) == len(vectorized_df)
+            and rowwise_df['text'].tolist() == vectorized_df['text'].tolist()
+            and (rowwise_df['created_at'] == vectorized_df['created_at']).all()
+            and rowwise_df['hashtags'].tolist() == vectorized_df['hashtags'].tolist())
+
+    print("-" * 50)
+    print(f"数据: {len(rowwise_df)} 行, {size_mb:.1f} MB")
+    print(f"逐行加载:   {rowwise_time:8.2f} s  ({len(rowwise_df) / rowwise_time:,.0f} 行/秒)")
+    print(f"向量化加载: {vectorized_time:8.2f} s  ({len(vectorized_df) / vectorized_time:,.0f} 行/秒)")
+    print(f"加速比: {rowwise_time / vectorized_time:.2f}x，结果一致: {same}")
+
+if __name__ == "__main__":
+    main()
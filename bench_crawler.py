@@ -0,0 +1,178 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import requests
+
+from mock_weibo_server import MockConfig, MockWeiboServer, synthetic_weibos
+
+# 端到端爬取基准：在本地模拟服务器上运行 batch_crawl（同步/异步）、collect_users 和 save_batch_weibos，
+# 输出请求数/秒、微博数/秒和峰值内存。服务器和每个测试都在单独的进程里运行，互不影响内存统计
+
+CASES = ['batch_crawl', 'async_batch_crawl', 'collect_users', 'save_batch_weibos']
+
+# 限速器放开到不成为瓶颈，测的是爬虫本身的开销
+FAST_LIMITS = {family: {'rate': 100000.0, 'burst': 1000, 'max_rate': 100000.0}
+               for family in ('profile', 'statuses', 'comments', 'friends', 'default')}
+
+def _serve(config, ready):
+    server = MockWeiboServer(config=config)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+def fetch_stats(base_url):
+    return requests.get(base_url + '/_stats', timeout=10).json()
+
+# 当前常驻内存（MB），只在Linux上可用，其他平台返回 0
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return 0.0
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if peak > 1 << 32 else peak / 1024
+
+def run_batch_crawl(base_url, workdir, args, engine):
+    from rate_limiter import RateLimiter
+    from jsonl_writer import JsonlWriter
+    user_ids = [str(uid) for uid in range(1, args.users + 1)]
+    with JsonlWriter(open(os.path.join(workdir, f'{engine}.jsonl'), 'wb')) as output:
+        if engine == 'async':
+            from async_crawler import run_async_batch_crawl
+            run_async_batch_crawl(user_ids, None, None, 10 ** 9, base_url=base_url, rate_limiter=RateLimiter(FAST_LIMITS),
+                                  output=output, user_concurrency=args.concurrency, per_host_limit=args.concurrency)
+        else:
+            from weibo_crawler import batch_crawl
+            batch_crawl(user_ids, None, None, 10 ** 9, base_url=base_url, rate_limiter=RateLimiter(FAST_LIMITS),
+                        output=output, comment_workers=args.comment_workers)
+    return output.count
+
+def run_collect_users(base_url, workdir, args):
+    from rate_limiter import RateLimiter
+    from user_collecter import collect_users
+    cookies_path = os.path.join(workdir, 'cookies.json')
+    with open(cookies_path, 'w', encoding='utf-8') as f:
+        json.dump([{'name': 'SUB', 'value': 'bench'}], f)
+    users = collect_users(['1'], args.collect_max, args.collect_depth, args.collect_workers, cookies_path,
+                          os.path.join(workdir, 'user_ids.txt'), rate_limiter=RateLimiter(FAST_LIMITS),
+                          base_url=base_url, fresh=True)
+    return len(users)
+
+def run_save_batch_weibos(workdir, args, weibos):
+    from weibo_crawler import save_batch_weibos
+    save_batch_weibos(weibos, output_file=os.path.join(workdir, 'saved.jsonl'))
+    return len(weibos)
+
+# 在子进程中运行一个测试，结果放入队列
+def run_case(name, base_url, workdir, args, results):
+    from crawl_metrics import configure_logging
+    # 失败重试等日志在配置了错误率时是预期的，不输出
+    configure_logging('ERROR')
+    weibos = None
+    if name == 'save_batch_weibos':
+        # 写文件的测试不走网络，合成数据先生成好，不计入耗时
+        weibos = list(synthetic_weibos(args.save_count, MockConfig(posts_per_user=args.posts_per_user,
+                                                                 comments_per_post=args.comments_per_post)))
+    before = fetch_stats(base_url)
+    rss_start = current_rss_mb()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if name == 'batch_crawl':
+            items = run_batch_crawl(base_url, workdir, args, 'sync')
+        elif name == 'async_batch_crawl':
+            items = run_batch_crawl(base_url, workdir, args, 'async')
+        elif name == 'collect_users':
+            items = run_collect_users(base_url, workdir, args)
+        else:
+            items = run_save_batch_weibos(workdir, args, weibos)
+    elapsed = time.perf_counter() - start
+    after = fetch_stats(base_url)
+    statuses = {status: count - before['statuses'].get(status, 0) for status, count in after['statuses'].items()}
+    results.put({
+        'case': name,
+        'elapsed': elapsed,
+        'requests': after['requests'] - before['requests'],
+        'statuses': {status: count for status, count in statuses.items() if count},
+        'bytes': after['bytes'] - before['bytes'],
+        'items': items,
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_growth_mb': peak_rss_mb() - rss_start,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='在本地模拟微博接口上测量爬虫吞吐量和内存')
+    parser.add_argument('--cases', default=','.join(CASES), help=f'逗号分隔的测试项，可选: {",".join(CASES)}')
+    parser.add_argument('--users', type=int, default=50, help='batch_crawl 爬取的用户数')
+    parser.add_argument('--posts-per-user', type=int, default=60, help='模拟服务器上每个用户的微博数')
+    parser.add_argument('--comments-per-post', type=int, default=5, help='每条微博最多的评论数')
+    parser.add_argument('--friends-per-user', type=int, default=40, help='每个用户的关注数')
+    parser.add_argument('--latency', type=float, default=0.0, help='模拟服务器每个响应的延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟的随机波动（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务器随机返回 500 的概率')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='模拟服务器的全局限速（次/秒），0 表示不限')
+    parser.add_argument('--comment-workers', type=int, default=4, help='同步引擎抓评论的线程数')
+    parser.add_argument('--concurrency', type=int, default=8, help='异步引擎同时爬取的用户数')
+    parser.add_argument('--collect-depth', type=int, default=2,
+                        help='collect_users 的扩展层数（1 层、1 个线程即 collect_user_ids）')
+    parser.add_argument('--collect-workers', type=int, default=4, help='collect_users 的线程数')
+    parser.add_argument('--collect-max', type=int, default=2000, help='collect_users 最多采集的用户数')
+    parser.add_argument('--save-count', type=int, default=100000, help='save_batch_weibos 写入的微博数')
+    parser.add_argument('--json', help='把结果另存为JSON文件，便于前后对比', default=None)
+    args = parser.parse_args()
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f'未知的测试项: {sorted(unknown)}')
+
+    context = multiprocessing.get_context('spawn')
+    config = MockConfig(args.posts_per_user, args.comments_per_post, args.friends_per_user,
+                        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, rate_limit=args.rate_limit)
+    ready = context.Queue()
+    server = context.Process(target=_serve, args=(config, ready), daemon=True)
+    server.start()
+    base_url = ready.get(timeout=30)
+    print(f"模拟服务器: {base_url}（延迟 {args.latency}s，错误率 {args.error_rate}，限速 {args.rate_limit or '无'}）")
+
+    workdir = tempfile.mkdtemp(prefix='bench_crawler_')
+    report = []
+    try:
+        for name in cases:
+            results = context.Queue()
+            process = context.Process(target=run_case, args=(name, base_url, workdir, args, results))
+            process.start()
+            result = results.get()
+            process.join()
+            report.append(result)
+    finally:
+        server.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("-" * 90)
+    print(f"{'测试项':<20}{'耗时(s)':>9}{'请求数':>9}{'请求/秒':>10}{'产出':>9}{'产出/秒':>10}{'峰值内存MB':>12}{'内存增长MB':>12}")
+    for result in report:
+        elapsed = result['elapsed']
+        print(f"{result['case']:<20}{elapsed:>9.2f}{result['requests']:>9}{result['requests'] / elapsed:>10.1f}"
+              f"{result['items']:>9}{result['items'] / elapsed:>10.1f}{result['peak_rss_mb']:>12.1f}{result['rss_growth_mb']:>12.1f}")
+        failed = {status: count for status, count in result['statuses'].items() if status != '200'}
+        if failed:
+            print(f"{'':<20}非200响应: {failed}")
+    print("产出：batch_crawl 为微博数，collect_users 为用户数，save_batch_weibos 为写入的微博数")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': report}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+
+if __name__ == '__main__':
+    main()
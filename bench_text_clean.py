@@ -0,0 +1,100 @@
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from text_clean import clean_texts, extract_hashtags_batch
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+WORDS = ['情绪价值', '悦己', '仪式感', '宠物', 'Citywalk', '泡泡玛特', '周边游', '治愈', '平替', '搭子', '咖啡', '周末']
+EMOTIONS = ['[笑cry]', '[doge]', '[心]', '[哈哈]', '[允悲]']
+
+# 生成接近接口返回的 text 字段：带链接标签、表情图片、换行标签和HTML实体
+def generate_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        a, b, c = rng.sample(WORDS, 3)
+        emotion = rng.choice(EMOTIONS)
+        text = (f"今天{a}和{b}<br />"
+                f"<a href='https://m.weibo.cn/search?containerid=231522'>#{c}#</a> 真的很好"
+                f"<img alt=\"{emotion}\" title=\"{emotion}\" src=\"https://face.t.sinajs.cn/t4/{i % 97}.png\" />"
+                f" &quot;{a}&quot;&nbsp;&amp; <a href='/n/用户{i % 500}'>@用户{i % 500}</a> http://t.cn/A{i} 开心")
+        if i % 3 == 0:
+            text = f"{a}{b}{c}，没有标签的短微博 {i}"
+        texts.append(text)
+    return texts
+
+# 原 WeiboCrawler.clean_text：一次正则、四次 str.replace、再一次正则
+def legacy_crawler_clean(text):
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = text.replace('&nbsp;', ' ')
+    text = text.replace('&lt;', '<')
+    text = text.replace('&gt;', '>')
+    text = text.replace('&amp;', '&')
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+# 原 build_clean_frame 中的 pandas 字符串方法链
+def legacy_analyzer_clean(texts):
+    text_clean = pd.Series(texts, dtype=object).fillna('').astype(str).str.replace(r'<[^>]+>', '', regex=True)
+    text_clean = text_clean.str.replace(r'http\S+', '', regex=True)
+    return text_clean.tolist(), text_clean.str.findall(r'#([^#]+)#').tolist()
+
+# 新旧实现交替运行，各取最快的一次，减少机器负载波动的影响
+def timed_pair(legacy, new, repeat):
+    legacy_best = new_best = None
+    for _ in range(repeat):
+        for func, is_new in ((legacy, False), (new, True)):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            if is_new:
+                new_best = elapsed if new_best is None else min(new_best, elapsed)
+            else:
+                legacy_best = elapsed if legacy_best is None else min(legacy_best, elapsed)
+    return legacy_best, new_best
+
+def main():
+    parser = argparse.ArgumentParser(description='对比新旧文本清洗函数的吞吐量')
+    parser.add_argument('--count', type=int, help='生成的文本条数', default=200000)
+    parser.add_argument('--repeat', type=int, help='每项重复次数，取最快的一次', default=5)
+    args = parser.parse_args()
+
+    texts = generate_texts(args.count)
+    # 分析器读的是 text_raw，通常没有标签，只有链接和实体
+    raw_texts = [TAG_PATTERN.sub('', text) for text in texts]
+
+    def analyzer_clean(data):
+        return extract_hashtags_batch(clean_texts(data, strip_urls=True, collapse_space=False))
+
+    cases = [
+        ('爬虫 text', texts,
+         lambda: [legacy_crawler_clean(text) for text in texts], lambda: clean_texts(texts)),
+        ('分析器 text', texts,
+         lambda: legacy_analyzer_clean(texts), lambda: analyzer_clean(texts)),
+        ('分析器 text_raw', raw_texts,
+         lambda: legacy_analyzer_clean(raw_texts), lambda: analyzer_clean(raw_texts)),
+    ]
+
+    print("-" * 50)
+    for name, data, legacy, new in cases:
+        size_mb = sum(len(text.encode('utf-8')) for text in data) / 1024 / 1024
+        legacy_time, new_time = timed_pair(legacy, new, args.repeat)
+        print(f"{name}: {len(data)} 条, {size_mb:.1f} MB")
+        print(f"  原实现: {legacy_time:8.3f} s  ({size_mb / legacy_time:6.1f} MB/秒)")
+        print(f"  新实现: {new_time:8.3f} s  ({size_mb / new_time:6.1f} MB/秒)  加速比 {legacy_time / new_time:.2f}x")
+
+    # 新实现额外解码全部实体、保留表情文字、不吞掉链接后的正文，输出与旧实现不完全相同
+    sample = texts[1]
+    print(f"示例原文: {sample}")
+    print(f"原爬虫:   {legacy_crawler_clean(sample)}")
+    print(f"新实现:   {clean_texts([sample])[0]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from compressed_io import open_binary
+from rotating_output import input_files
+
+# 微博时间格式: Wed Dec 03 10:00:00 +0800 2025，时区固定为东八区
+CREATED_AT_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+COMMENT_TYPE = pa.struct([
+    ('user', pa.string()),
+    ('text', pa.string()),
+    ('like_count', pa.int64()),
+])
+
+# 列式存储只保留分析需要的字段，并使用明确的类型
+SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('mblogid', pa.string()),
+    ('uid', pa.int64()),
+    ('screen_name', pa.string()),
+    ('created_at', pa.timestamp('s', tz='+08:00')),
+    ('text_raw', pa.string()),
+    ('reposts_count', pa.int64()),
+    ('comments_count', pa.int64()),
+    ('attitudes_count', pa.int64()),
+    ('retweeted_id', pa.int64()),
+    ('comments', pa.list_(COMMENT_TYPE)),
+])
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_created_at(value):
+    try:
+        return datetime.strptime(value, CREATED_AT_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+# 把一条接口返回的微博转换为一行
+def weibo_to_row(weibo):
+    user = weibo.get('user') or {}
+    retweeted = weibo.get('retweeted_status') or {}
+    return {
+        'id': _int(weibo.get('id')),
+        'mblogid': weibo.get('mblogid'),
+        'uid': _int(user.get('id')),
+        'screen_name': user.get('screen_name'),
+        'created_at': _parse_created_at(weibo.get('created_at')),
+        # 与分析脚本一致：优先使用raw文本
+        'text_raw': weibo.get('text_raw', weibo.get('text', '')),
+        'reposts_count': _int(weibo.get('reposts_count')),
+        'comments_count': _int(weibo.get('comments_count')),
+        'attitudes_count': _int(weibo.get('attitudes_count')),
+        'retweeted_id': _int(retweeted.get('id')),
+        'comments': [{
+            'user': c.get('user'),
+            'text': c.get('text'),
+            'like_count': _int(c.get('like_count')),
+        } for c in weibo.get('comments') or []],
+    }
+
+# 分批写入Parquet文件，每攒够 row_group_size 条写一个行组，内存占用与总量无关
+class ParquetWeiboWriter:
+    def __init__(self, path, row_group_size=50000, compression='zstd'):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(path, SCHEMA, compression=compression)
+        self.rows = []
+        self.count = 0
+
+    def write(self, weibo):
+        self.rows.append(weibo_to_row(weibo))
+        self.count += 1
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=SCHEMA))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# 把爬虫输出的JSONL（支持 .gz/.zst 和分段输出清单）转换为Parquet
+def jsonl_to_parquet(jsonl_path, parquet_path, row_group_size=50000):
+    print(f"正在转换 {jsonl_path} -> {parquet_path} ...")
+    with ParquetWeiboWriter(parquet_path, row_group_size) as writer:
+        for part in input_files(jsonl_path):
+            with open_binary(part) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        writer.write(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+    print(f"转换完成，共 {writer.count} 条微博")
+    return writer.count
+
+# 按需读取部分列，返回 pandas DataFrame
+def load_parquet(path, columns=None, filters=None):
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
+
+# 按批读取，每批返回一个 DataFrame，内存占用只与 batch_size 有关
+def iter_parquet(path, columns=None, batch_size=100000):
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
+
+def main():
+    parser = argparse.ArgumentParser(description='把爬取结果转换为Parquet列式存储')
+    parser.add_argument('input', help='JSONL格式的微博文件（支持 .gz/.zst 和分段输出清单）')
+    parser.add_argument('output', help='输出的Parquet文件')
+    parser.add_argument('--row-group-size', type=int, help='每个行组的微博条数', default=50000)
+    args = parser.parse_args()
+    jsonl_to_parquet(args.input, args.output, args.row_group_size)
+
+if __name__ == "__main__":
+    main()
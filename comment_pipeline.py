@@ -0,0 +1,49 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# 评论抓取流水线：爬微博的线程只负责把微博放进队列，评论由线程池并发获取，
+# 队首的评论到齐后按原顺序产出，输出顺序与逐条抓取时一致
+class CommentPipeline:
+    def __init__(self, crawler, workers=4, max_pages=1, journal=None, max_pending=200):
+        self.crawler = crawler
+        self.max_pages = max_pages
+        self.journal = journal
+        # 队列中未产出的微博超过该数量时，爬取线程会等待评论抓取赶上来
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='comments') if workers > 0 else None
+        self.queue = deque()
+        self.pending = 0
+
+    def put_weibo(self, weibo, user_id, page):
+        args = (weibo, user_id, page, self.journal, self.max_pages)
+        if self.executor is not None:
+            future = self.executor.submit(self.crawler.fetch_weibo_comments, *args)
+        else:
+            # workers=0 时在当前线程直接抓取
+            future = Future()
+            future.set_result(self.crawler.fetch_weibo_comments(*args))
+        self.queue.append((user_id, weibo, future, None))
+        self.pending += 1
+
+    # 放入一个回调（如记录某页/某用户已完成），在它之前的微博全部产出后执行
+    def put_marker(self, callback):
+        self.queue.append((None, None, None, callback))
+
+    # 按放入顺序产出 (user_id, 微博)；block 为 False 时只产出评论已到齐的部分，
+    # 但积压超过 max_pending 时仍会等待
+    def drain(self, block=False):
+        while self.queue:
+            user_id, weibo, future, callback = self.queue[0]
+            if future is not None and not block and not future.done() and self.pending <= self.max_pending:
+                return
+            self.queue.popleft()
+            if callback is not None:
+                callback()
+                continue
+            weibo["comments"] = future.result()
+            self.pending -= 1
+            yield user_id, weibo
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,75 @@
+import gzip
+import io
+import zlib
+
+# 按文件扩展名透明读写压缩文件：.gz 用标准库 gzip，.zst 需要装 zstandard，其他按普通文件处理
+
+# 装了 zstandard 时支持 .zst
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 普通文件的读写缓冲区，大块读写减少系统调用
+BUFFER_SIZE = 1 << 20
+# gzip 默认 9 级压缩很慢，6 级体积只大一点但快好几倍；zstd 3 级是它自己的默认值
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+
+# 根据扩展名判断压缩格式，返回 'gzip'、'zstd' 或 None
+def compression_of(path):
+    lower = str(path).lower()
+    if lower.endswith('.gz'):
+        return 'gzip'
+    if lower.endswith('.zst') or lower.endswith('.zstd'):
+        return 'zstd'
+    return None
+
+# 压缩扩展名
+SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# 压缩流在中途被截断（写入时崩溃）时读到末尾会抛出的异常
+TRUNCATED_ERRORS = (EOFError, zlib.error, gzip.BadGzipFile)
+if zstandard is not None:
+    TRUNCATED_ERRORS += (zstandard.ZstdError,)
+
+# 给已打开的二进制文件套上压缩层，用于写入；压缩层关闭时不关闭 raw，调用方自己关闭并可以先 fsync
+# 压缩层的 flush() 会把已写入的数据压缩成完整的块，崩溃后读到最后一次 flush 为止的数据仍然可以解压
+def compress_stream(raw, compression, level=None):
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level or DEFAULT_LEVELS['gzip'])
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd 压缩需要安装 zstandard: pip install zstandard")
+        return zstandard.ZstdCompressor(level=level or DEFAULT_LEVELS['zstd']).stream_writer(raw, closefd=False)
+    return raw
+
+# 以二进制模式打开（'rb'、'wb'、'ab'），压缩文件自动解压/压缩
+# gzip 和 zstd 都允许把多段压缩数据直接拼接，追加模式写入的文件可以一次读完
+def open_binary(path, mode='rb', level=None):
+    if 'b' not in mode:
+        mode += 'b'
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=level or DEFAULT_LEVELS['gzip'])
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError(f"读写 {path} 需要安装 zstandard: pip install zstandard")
+        if 'r' in mode:
+            # zstandard 的解压读取器不能逐行迭代，套一层缓冲读取器
+            return io.BufferedReader(zstandard.open(path, mode), BUFFER_SIZE)
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=level or DEFAULT_LEVELS['zstd']))
+    return open(path, mode, buffering=BUFFER_SIZE)
+
+# 以UTF-8文本模式打开，mode 为 'r'、'w' 或 'a'
+def open_text(path, mode='r', level=None, newline=None):
+    return io.TextIOWrapper(open_binary(path, mode.replace('t', ''), level), encoding='utf-8', newline=newline)
+
+# 逐行读取可能没有正常关闭的文件：压缩流被截断时读到截断处为止，最后一行不完整时丢弃
+def iter_complete_lines(path):
+    with open_binary(path) as f:
+        try:
+            for line in f:
+                if line.endswith(b'\n'):
+                    yield line
+        except TRUNCATED_ERRORS:
+            return
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+
+# 追加写入的爬取进度日志，每行一个事件：
+#   {"event": "start", "offset": ...}                                             本次爬取开始时输出文件的大小
+#   {"event": "comments", "uid": ..., "page": ..., "id": ..., "comments": [...]}  某条微博的评论已获取
+#   {"event": "page", "uid": ..., "page": ..., "count": ..., "offset": ...}       某页微博已写入输出文件
+#   {"event": "user", "uid": ...}                                                 某个用户已爬取完成
+# offset 是写完该页后输出文件的字节位置，续爬时据此截掉崩溃前写了一半的内容
+# 绑定输出写入器后，page/user 事件会先暂存，等写入器把对应数据刷到文件后再写入日志
+class CrawlJournal:
+    def __init__(self, path):
+        self.path = path
+        self.done_users = set()
+        self.last_pages = {}
+        self.pending_comments = {}
+        self.writer = None
+        self.written = 0
+        self.output_offset = None
+        self.deferred = []
+        # 评论事件由抓取评论的线程写入
+        self.lock = threading.Lock()
+        self.f = None
+
+    # 打开日志；resume 为 True 时先回放已有事件，否则清空重新开始
+    def open(self, resume=False):
+        if resume and os.path.exists(self.path):
+            self._replay()
+            self.f = open(self.path, 'a', encoding='utf-8')
+        else:
+            self.f = open(self.path, 'w', encoding='utf-8')
+        return self
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def _replay(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                self._apply(event)
+        print(f"已读取进度日志 {self.path}：完成用户 {len(self.done_users)} 个，已写入微博 {self.written} 条")
+
+    def _apply(self, event):
+        uid = str(event.get('uid'))
+        kind = event.get('event')
+        if kind == 'comments':
+            self.pending_comments.setdefault((uid, event['page']), {})[str(event['id'])] = event['comments']
+        elif kind == 'page':
+            self.last_pages[uid] = event['page']
+            self.written += event.get('count', 0)
+            if 'offset' in event:
+                self.output_offset = event['offset']
+            self.pending_comments.pop((uid, event['page']), None)
+        elif kind == 'start':
+            self.output_offset = event['offset']
+        elif kind == 'user':
+            self.done_users.add(uid)
+            self.last_pages.pop(uid, None)
+
+    def _write(self, event):
+        with self.lock:
+            self._apply(event)
+            self.f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self.f.flush()
+
+    # 绑定 JsonlWriter：写入器每次刷新后再写入暂存的事件
+    def bind_writer(self, writer):
+        self.writer = writer
+        writer.add_listener(self._on_flush)
+        if self.output_offset is None:
+            # 增量模式下输出文件里已有数据，续爬时不能截掉
+            self._write({'event': 'start', 'offset': writer.tell()})
+
+    def _on_flush(self, offset):
+        if not self.deferred:
+            return
+        with self.lock:
+            for event in self.deferred:
+                self.f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self.f.flush()
+            self.deferred.clear()
+
+    def _defer(self, event):
+        if self.writer is None:
+            self._write(event)
+            return
+        # 内存中的进度立即更新，日志文件等数据落盘后再写
+        with self.lock:
+            self._apply(event)
+            self.deferred.append(event)
+
+    def is_user_done(self, user_id):
+        return str(user_id) in self.done_users
+
+    # 该用户下一次应从第几页开始
+    def next_page(self, user_id):
+        return self.last_pages.get(str(user_id), 0) + 1
+
+    # 崩溃前已获取但所在页尚未写完的评论
+    def cached_comments(self, user_id, page, weibo_id):
+        return self.pending_comments.get((str(user_id), page), {}).get(str(weibo_id))
+
+    def record_comments(self, user_id, page, weibo_id, comments):
+        self._write({'event': 'comments', 'uid': str(user_id), 'page': page, 'id': weibo_id, 'comments': comments})
+
+    # 在该页最后一条微博交给写入器之后调用，偏移取写入器的逻辑位置
+    def record_page(self, user_id, page, count):
+        event = {'event': 'page', 'uid': str(user_id), 'page': page, 'count': count}
+        if self.writer is not None:
+            event['offset'] = self.writer.tell()
+        self._defer(event)
+
+    def record_user(self, user_id):
+        self._defer({'event': 'user', 'uid': str(user_id)})
+
+# 打开续爬的输出文件：截掉最后一个已记录页之后的残留内容，再以二进制追加方式打开
+def open_resumed_output(output_file, journal):
+    if journal.output_offset is not None and os.path.exists(output_file):
+        with open(output_file, 'r+b') as f:
+            f.truncate(journal.output_offset)
+    elif journal.output_offset is None:
+        # 日志里还没有写完的页，输出文件也应从头开始
+        open(output_file, 'w').close()
+    return open(output_file, 'ab')
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# 延迟直方图的桶上界（秒），与 Prometheus 的 histogram 一致，按桶计数，内存占用固定
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+# 请求耗时的分段（见 http_transport），按段累计总耗时
+PHASES = ('dns', 'connect', 'tls', 'transfer')
+
+# 配置爬虫日志：只输出消息本身，与原来的 print 输出一致；级别只作用于爬虫自己的日志，第三方库仍只输出警告
+# 绑定调用时的 sys.stdout，分片进程重定向输出后调用也能写到各自的日志文件
+def configure_logging(level='INFO', name='weibo_crawler'):
+    logging.basicConfig(level=logging.WARNING, format='%(message)s', stream=sys.stdout, force=True)
+    logging.getLogger(name).setLevel(getattr(logging, level.upper()))
+
+# 单个接口族的统计
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.statuses = {}
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.timed = 0
+        self.new_connections = 0
+        self.phase_sums = dict.fromkeys(PHASES, 0.0)
+
+    def observe(self, status, latency, nbytes, phases=None):
+        self.requests += 1
+        key = str(status) if status is not None else 'error'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        self.bytes += nbytes
+        self.latency_sum += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        if phases is not None:
+            self.timed += 1
+            # 复用 keep-alive 连接的请求没有建连耗时
+            if phases['connect'] > 0:
+                self.new_connections += 1
+            for phase in PHASES:
+                self.phase_sums[phase] += phases[phase]
+
+    # 由直方图估算分位数：找到所在的桶，在桶内线性插值
+    def percentile(self, q):
+        if not self.requests:
+            return 0.0
+        rank = q * self.requests
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            if count and seen + count >= rank:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+    def errors(self):
+        return sum(count for status, count in self.statuses.items() if status != '200')
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'statuses': dict(self.statuses),
+            'bytes': self.bytes,
+            'latency_avg': self.latency_sum / self.requests if self.requests else 0.0,
+            'latency_p50': self.percentile(0.5),
+            'latency_p95': self.percentile(0.95),
+            'latency_p99': self.percentile(0.99),
+            'new_connections': self.new_connections,
+            'phases_avg': {phase: total / self.timed if self.timed else 0.0 for phase, total in self.phase_sums.items()},
+        }
+
+# 爬取指标：按接口族统计请求数、状态码、延迟分布和流量，以及微博/评论的产出速度
+# 评论线程池和异步任务都会调用，所有更新都在锁内
+class CrawlMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.endpoints = {}
+        self.posts = 0
+        self.comments = 0
+        self.reporter = None
+        self.stop_event = threading.Event()
+
+    def _endpoint(self, family):
+        stats = self.endpoints.get(family)
+        if stats is None:
+            stats = self.endpoints[family] = EndpointStats()
+        return stats
+
+    # status 为 None 表示网络异常；phases 为 HttpTransport.timed_get 返回的分段耗时
+    def record_request(self, family, status, latency, nbytes=0, phases=None):
+        with self.lock:
+            self._endpoint(family).observe(status, latency, nbytes, phases)
+
+    def record_cache_hit(self, family):
+        with self.lock:
+            self._endpoint(family).cache_hits += 1
+
+    def add_posts(self, count=1, comments=0):
+        with self.lock:
+            self.posts += count
+            self.comments += comments
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            return {
+                'elapsed': elapsed,
+                'posts': self.posts,
+                'comments': self.comments,
+                'posts_per_sec': self.posts / elapsed,
+                'comments_per_sec': self.comments / elapsed,
+                'endpoints': {family: stats.to_dict() for family, stats in sorted(self.endpoints.items())},
+            }
+
+    # 一行进度摘要
+    def progress_line(self):
+        data = self.snapshot()
+        requests = sum(stats['requests'] for stats in data['endpoints'].values())
+        errors = sum(count for stats in data['endpoints'].values()
+                     for status, count in stats['statuses'].items() if status != '200')
+        latencies = ' '.join(f"{family} p50={stats['latency_p50'] * 1000:.0f}ms p95={stats['latency_p95'] * 1000:.0f}ms"
+                             for family, stats in data['endpoints'].items() if stats['requests'])
+        return (f"[进度] {data['elapsed']:.0f}s 微博 {data['posts']} ({data['posts_per_sec']:.1f}/s) "
+                f"评论 {data['comments']} ({data['comments_per_sec']:.1f}/s) "
+                f"请求 {requests} ({requests / data['elapsed']:.1f}/s) 失败 {errors} {latencies}")
+
+    def to_prometheus(self):
+        data = self.snapshot()
+        lines = [
+            '# TYPE weibo_crawl_posts_total counter',
+            f"weibo_crawl_posts_total {data['posts']}",
+            '# TYPE weibo_crawl_comments_total counter',
+            f"weibo_crawl_comments_total {data['comments']}",
+            '# TYPE weibo_crawl_requests_total counter',
+        ]
+        for family, stats in data['endpoints'].items():
+            for status, count in sorted(stats['statuses'].items()):
+                lines.append(f'weibo_crawl_requests_total{{endpoint="{family}",status="{status}"}} {count}')
+        lines.append('# TYPE weibo_crawl_cache_hits_total counter')
+        lines.extend(f'weibo_crawl_cache_hits_total{{endpoint="{family}"}} {stats["cache_hits"]}'
+                     for family, stats in data['endpoints'].items())
+        lines.append('# TYPE weibo_crawl_response_bytes_total counter')
+        lines.extend(f'weibo_crawl_response_bytes_total{{endpoint="{family}"}} {stats["bytes"]}'
+                     for family, stats in data['endpoints'].items())
+        lines.append('# TYPE weibo_crawl_new_connections_total counter')
+        lines.extend(f'weibo_crawl_new_connections_total{{endpoint="{family}"}} {stats["new_connections"]}'
+                     for family, stats in data['endpoints'].items())
+        lines.append('# TYPE weibo_crawl_request_phase_seconds_total counter')
+        with self.lock:
+            for family, stats in sorted(self.endpoints.items()):
+                lines.extend(f'weibo_crawl_request_phase_seconds_total{{endpoint="{family}",phase="{phase}"}} {total}'
+                             for phase, total in stats.phase_sums.items())
+        lines.append('# TYPE weibo_crawl_request_seconds histogram')
+        with self.lock:
+            for family, stats in sorted(self.endpoints.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'weibo_crawl_request_seconds_bucket{{endpoint="{family}",le="{le}"}} {cumulative}')
+                lines.append(f'weibo_crawl_request_seconds_sum{{endpoint="{family}"}} {stats.latency_sum}')
+                lines.append(f'weibo_crawl_request_seconds_count{{endpoint="{family}"}} {stats.requests}')
+        return '\n'.join(lines) + '\n'
+
+    # 写入指标文件：.prom 后缀为 Prometheus 文本格式，其余为JSON；先写临时文件再替换
+    def dump(self, path):
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    # 后台线程每 interval 秒输出一行进度，并刷新指标文件
+    def start_reporter(self, interval=30.0, path=None, log=print):
+        def run():
+            while not self.stop_event.wait(interval):
+                log(self.progress_line())
+                if path:
+                    self.dump(path)
+        self.reporter = threading.Thread(target=run, name='metrics-reporter', daemon=True)
+        self.reporter.start()
+
+    def stop_reporter(self):
+        self.stop_event.set()
+        if self.reporter is not None:
+            self.reporter.join()
+            self.reporter = None
@@ -0,0 +1,71 @@
+import json
+import os
+
+# 每个用户已爬到的最新微博（高水位），增量爬取时遇到不超过它的微博就停止翻页
+# 文件格式: {"uid": {"max_id": 5012345678901234, "created_at": "..."}}
+# seed_path：path 不存在时改从该文件读取初始状态（分片进程从总状态文件起步）
+class CrawlState:
+    def __init__(self, path, seed_path=None):
+        self.path = path
+        self.users = {}
+        self.pending = {}
+        self.writer = None
+        if not os.path.exists(path) and seed_path and os.path.exists(seed_path):
+            path = seed_path
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.users = json.load(f)
+            print(f"已读取增量状态 {path}：{len(self.users)} 个用户")
+
+    def since_id(self, user_id):
+        mark = self.users.get(str(user_id))
+        return mark['max_id'] if mark else None
+
+    # 每条微博交给写入器后调用；绑定写入器时等数据落盘后再真正保存
+    def advance(self, user_id, weibo):
+        weibo_id = weibo_id_of(weibo)
+        if weibo_id is None:
+            return
+        uid = str(user_id)
+        mark = self.pending.get(uid) or self.users.get(uid)
+        if mark and mark['max_id'] >= weibo_id:
+            return
+        self.pending[uid] = {'max_id': weibo_id, 'created_at': weibo.get('created_at', '')}
+        if self.writer is None:
+            self.save()
+
+    # 绑定 JsonlWriter：写入器每次刷新后保存状态，保证状态不会领先于已落盘的数据
+    def bind_writer(self, writer):
+        self.writer = writer
+        writer.add_listener(lambda offset: self.save())
+
+    def save(self):
+        if not self.pending:
+            return
+        self.users.update(self.pending)
+        self.pending.clear()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.users, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+def weibo_id_of(weibo):
+    try:
+        return int(weibo.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+# 过滤一页微博，只保留比高水位新的；第二个返回值表示是否已碰到旧微博（可以停止翻页）
+# 置顶微博不按时间排序，跳过它们但不据此停止
+def filter_new_weibos(weibos, since_id):
+    if since_id is None:
+        return weibos, False
+    new_weibos = []
+    reached_seen = False
+    for weibo in weibos:
+        weibo_id = weibo_id_of(weibo)
+        if weibo_id is None or weibo_id > since_id:
+            new_weibos.append(weibo)
+        elif not weibo.get('isTop'):
+            reached_seen = True
+    return new_weibos, reached_seen
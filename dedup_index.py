@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from crawl_state import weibo_id_of
+from jsonl_writer import JsonlWriter
+
+# 已写入微博的 id 索引，跨用户、跨次运行去重
+# 文件是追加写入的 int64 序列；加载后排序为紧凑数组（每个 id 8 字节），用二分查找判断，没有误判
+# seed_path：另外读入该文件中的 id 但不写入它（分片进程读总索引，新 id 只写自己的分片索引，结束后再合并）
+class SeenIndex:
+    def __init__(self, path, seed_path=None):
+        self.path = path
+        self.ids = np.empty(0, dtype=np.int64)
+        # 本次运行中已排队（可能尚未写入）的 id，用于运行内去重
+        self.marked = set()
+        # 已写入输出、等待下次刷新时追加到索引文件的 id
+        self.pending = []
+        self.lock = threading.Lock()
+        self.writer = None
+        self.skipped = 0
+        paths = [p for p in (seed_path, path) if p and os.path.exists(p)]
+        if paths:
+            self.ids = np.unique(np.concatenate([np.fromfile(p, dtype='<i8') for p in paths]))
+            print(f"已读取去重索引 {', '.join(paths)}：{len(self.ids)} 条微博")
+
+    def __contains__(self, weibo_id):
+        if weibo_id in self.marked:
+            return True
+        i = np.searchsorted(self.ids, weibo_id)
+        return i < len(self.ids) and self.ids[i] == weibo_id
+
+    # 检查并登记一条微博；已见过时返回 True，调用方应跳过它
+    def check(self, weibo):
+        weibo_id = weibo_id_of(weibo)
+        if weibo_id is None:
+            return False
+        with self.lock:
+            if weibo_id in self:
+                self.skipped += 1
+                return True
+            self.marked.add(weibo_id)
+        return False
+
+    # 一页微博全部交给写入器后调用，这些 id 在下次刷新时写入索引文件
+    def commit(self, weibos):
+        ids = [weibo_id for weibo_id in map(weibo_id_of, weibos) if weibo_id is not None]
+        with self.lock:
+            self.pending.extend(ids)
+        if self.writer is None:
+            self.save()
+
+    # 与 CrawlState 一样，等数据落盘后再保存，索引不会领先于输出文件
+    def bind_writer(self, writer):
+        self.writer = writer
+        writer.add_listener(lambda offset: self.save())
+
+    def save(self):
+        with self.lock:
+            if not self.pending:
+                return
+            data = np.asarray(self.pending, dtype='<i8').tobytes()
+            self.pending.clear()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def summary(self):
+        return f"去重索引：跳过重复微博 {self.skipped} 条"
+
+# 一批 id 是否在排好序的 id 数组中（可以是内存映射的 id 文件），返回布尔掩码
+def contains_ids(sorted_ids, ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(sorted_ids) == 0 or len(ids) == 0:
+        return np.zeros(len(ids), dtype=bool)
+    positions = np.searchsorted(sorted_ids, ids)
+    positions[positions == len(sorted_ids)] = 0
+    return np.asarray(sorted_ids[positions]) == ids
+
+# 只读方式打开 id 文件（与 SeenIndex 相同的 int64 序列，已排序），内存映射，不整个读入内存
+def open_ids(path):
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.memmap(path, dtype='<i8', mode='r')
+
+# 分析时按 id 去重用的内存集合：与 SeenIndex 一样是排好序的 int64 数组，每个 id 8 字节，按块判断和登记
+class IdSet:
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # 一块 id 中第一次出现且不在集合里的位置为 True，并把这些 id 登记进集合
+    def add_new(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        unique, first = np.unique(ids, return_index=True)
+        new = ~contains_ids(self.ids, unique)
+        mask = np.zeros(len(ids), dtype=bool)
+        mask[first[new]] = True
+        if new.any():
+            # 两段有序数组拼接后用归并排序，线性时间
+            self.ids = np.sort(np.concatenate([self.ids, unique[new]]), kind='stable')
+        return mask
+
+    def save(self, path):
+        self.ids.astype('<i8').tofile(path)
+
+# 转发原文单独存放：每条原文只写一次，微博里的 retweeted_status 只保留 id
+# seed_path 为总转发文件，分片进程跳过其中已有的原文，新原文写入自己的分片文件
+class RetweetStore:
+    def __init__(self, path, batch_size=200, fsync_interval=30.0, seed_path=None):
+        self.path = path
+        self.index = SeenIndex(path + '.idx', seed_path + '.idx' if seed_path else None)
+        self.writer = JsonlWriter(open(path, 'ab'), batch_size, fsync_interval)
+        self.index.bind_writer(self.writer)
+        self.stored = 0
+        self.referenced = 0
+
+    # 把微博中的转发原文换成 {"id": ...} 引用，原文未存过时写入转发文件
+    def detach(self, weibo):
+        retweeted = weibo.get('retweeted_status')
+        if not isinstance(retweeted, dict) or weibo_id_of(retweeted) is None:
+            return
+        if not self.index.check(retweeted):
+            self.writer.write(retweeted)
+            self.index.commit([retweeted])
+            self.stored += 1
+        weibo['retweeted_status'] = {'id': retweeted.get('id')}
+        self.referenced += 1
+
+    # 主输出刷新时一并刷新转发文件
+    def bind_writer(self, writer):
+        writer.add_listener(lambda offset: self.writer.flush())
+
+    def summary(self):
+        return f"转发原文：引用 {self.referenced} 次，实际保存 {self.stored} 条到 {self.path}"
+
+    def close(self):
+        self.writer.close()
+
+# 把各分片的去重索引追加到总索引；分片按用户划分，各分片写入的微博互不重复
+def merge_seen_indexes(paths, path):
+    with open(path, 'ab') as out:
+        for part in paths:
+            if os.path.exists(part):
+                with open(part, 'rb') as f:
+                    out.write(f.read())
+
+# 把各分片的转发文件合并到总转发文件：不同分片的用户可能转发同一条原文，按 id 只保留总文件里还没有的
+def merge_retweet_stores(paths, path):
+    index = SeenIndex(path + '.idx')
+    with open(path, 'ab') as out:
+        for part in paths:
+            if not os.path.exists(part):
+                continue
+            with open(part, 'rb') as f:
+                for line in f:
+                    try:
+                        retweet = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if index.check(retweet):
+                        continue
+                    out.write(line)
+        # 原文先落盘，索引再追加，中断时索引不会领先于转发文件
+        out.flush()
+        os.fsync(out.fileno())
+    stored = len(index.marked)
+    index.pending.extend(index.marked)
+    index.save()
+    print(f"转发原文合并完成：新增 {stored} 条到 {path}")
+    return stored
+
+# 读取转发文件，返回 {id: 原文}
+def load_retweets(path):
+    retweets = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                retweet = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            retweets[retweet.get('id')] = retweet
+    return retweets
+
+# 把引用形式的 retweeted_status 还原为完整原文
+def expand_retweet(weibo, retweets):
+    retweeted = weibo.get('retweeted_status')
+    if isinstance(retweeted, dict) and set(retweeted) == {'id'} and retweeted['id'] in retweets:
+        weibo['retweeted_status'] = retweets[retweeted['id']]
+    return weibo
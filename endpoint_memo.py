@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+
+# 获取用户微博列表的候选接口，按默认尝试顺序排列
+# 第三个字段表示该接口是否带分页参数；不带分页的接口总是返回第一页，只作兜底，不会被记为首选
+WEIBO_LIST_VARIANTS = [
+    ('mymblog_page_count', '/ajax/statuses/mymblog?uid={uid}&page={page}&count={count}', True),
+    ('mymblog_page', '/ajax/statuses/mymblog?uid={uid}&page={page}', True),
+    ('mymblog', '/ajax/statuses/mymblog?uid={uid}', False),
+    ('user_timeline_page_count', '/ajax/statuses/user_timeline?uid={uid}&page={page}&count={count}', True),
+    ('user_timeline_page', '/ajax/statuses/user_timeline?uid={uid}&page={page}', True),
+]
+
+# 这些失败与接口本身无关（限流或服务端故障），不据此淘汰接口
+TRANSIENT_STATUSES = {418, 429}
+
+# 记住哪个接口可用并优先尝试；失败的接口在冷却期内不再尝试
+class EndpointMemo:
+    def __init__(self, variants=WEIBO_LIST_VARIANTS, cooldown=600, path=None):
+        self.variants = variants
+        self.cooldown = cooldown
+        self.path = path
+        self.preferred = None
+        self.retired = {}
+        self.lock = threading.Lock()
+        self.stats = {'calls': 0, 'attempts': 0, 'baseline': 0, 'failed_calls': 0}
+        if path and os.path.exists(path):
+            self.load()
+
+    # 本次调用要依次尝试的 (名称, URL)
+    def candidates(self, base_url, user_id, page=1, count=20):
+        now = time.time()
+        with self.lock:
+            names = [name for name, _, _ in self.variants if self.retired.get(name, 0) <= now]
+            if not names:
+                # 所有接口都在冷却中，只能按默认顺序全部再试一遍
+                names = [name for name, _, _ in self.variants]
+            if self.preferred in names:
+                names.remove(self.preferred)
+                names.insert(0, self.preferred)
+        templates = {name: template for name, template, _ in self.variants}
+        return [(name, base_url + templates[name].format(uid=user_id, page=page, count=count)) for name in names]
+
+    def record_success(self, name, attempts):
+        with self.lock:
+            if self._paged(name):
+                self.preferred = name
+            self.retired.pop(name, None)
+            self._count(attempts, self._default_index(name) + 1)
+
+    # status 为 None 表示网络异常，为 200 表示接口返回了 ok != 1
+    def record_failure(self, name, status=None):
+        if status is None or status in TRANSIENT_STATUSES or status >= 500:
+            return
+        with self.lock:
+            self.retired[name] = time.time() + self.cooldown
+            if self.preferred == name:
+                self.preferred = None
+
+    # 所有候选接口都失败的调用
+    def record_exhausted(self, attempts):
+        with self.lock:
+            self.stats['failed_calls'] += 1
+            self._count(attempts, len(self.variants))
+
+    def _count(self, attempts, baseline):
+        self.stats['calls'] += 1
+        self.stats['attempts'] += attempts
+        self.stats['baseline'] += baseline
+
+    def _default_index(self, name):
+        for i, (variant, _, _) in enumerate(self.variants):
+            if variant == name:
+                return i
+        return len(self.variants) - 1
+
+    def _paged(self, name):
+        return any(variant == name and paged for variant, _, paged in self.variants)
+
+    # 与每次都按默认顺序尝试相比节省的请求次数
+    def saved_round_trips(self):
+        return self.stats['baseline'] - self.stats['attempts']
+
+    def summary(self):
+        return (f"接口记忆：调用 {self.stats['calls']} 次，实际请求 {self.stats['attempts']} 次，"
+                f"按默认顺序需 {self.stats['baseline']} 次，节省 {self.saved_round_trips()} 次往返，"
+                f"首选接口 {self.preferred or '无'}")
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.preferred = data.get('preferred')
+        self.retired = {name: until for name, until in data.get('retired', {}).items() if until > time.time()}
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = {'preferred': self.preferred, 'retired': self.retired}
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
@@ -1,20 +1,139 @@
+import argparse
 import json
+import multiprocessing
+import os
+import shutil
+import time
+from datetime import datetime
+
+from compressed_io import BUFFER_SIZE, open_binary
+from rotating_output import input_files
+
+# 把爬虫输出的JSONL转成便于阅读的文本。流式逐行处理，内存占用与文件大小无关；
+# 每条记录的各段文本放进列表，攒够一批后一次 join、一次编码、一次写入，避免逐条 += 拼接字符串
+# 输入输出按扩展名支持 .gz / .zst 压缩；多个分片文件可以用多个进程并行转换
+
+# 有 orjson 时用它解析JSON，速度快数倍
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+SEPARATOR = '-' * 40 + '\n'
+# 每攒够这么多条记录写一次
+FLUSH_RECORDS = 2000
+
+CREATED_AT_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+MONTHS = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+          'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'}
+
+# 微博时间 'Sat Oct 12 10:00:00 +0800 2024' 转成 '2024-10-12 10:00:00'（保留原时区的钟点，与 strptime + strftime 结果相同）
+# 格式固定时直接切片，比 strptime 快一个数量级；格式不符时退回 strptime，仍解析不了就原样返回
+def format_created_at(created_at):
+    if (isinstance(created_at, str) and len(created_at) == 30 and created_at[10] == ' ' and created_at[13] == ':'
+            and created_at[16] == ':' and created_at[19] == ' ' and created_at[25] == ' '):
+        month = MONTHS.get(created_at[4:7])
+        if month and created_at[8:10].isdigit() and created_at[26:].isdigit():
+            return f"{created_at[26:]}-{month}-{created_at[8:10]} {created_at[11:19]}"
+    try:
+        return datetime.strptime(created_at, CREATED_AT_FORMAT).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return str(created_at)
+
+# 把一条微博的各段文本追加到 parts，由调用方统一 join
+def append_weibo(parts, weibo):
+    append = parts.append
+    user = weibo.get('user') or {}
+    append(f"【用户】{user.get('screen_name', '未知用户')}\n【发布时间】{weibo.get('created_at', '')}\n"
+           f"【内容】\n{weibo.get('text', '')}\n\n【评论】\n")
+    for idx, c in enumerate(weibo.get('comments') or (), 1):
+        append(f"{idx}. {c.get('user', '未知')}：{c.get('text', '')}\n")
+    append(SEPARATOR)
 
 def format_weibo(weibo):
-    user = weibo.get('user', {}).get('screen_name', '未知用户')
-    created_at = weibo.get('created_at', '')
-    text = weibo.get('text', '')
-    comments = weibo.get('comments', [])
-    s = f"【用户】{user}\n【发布时间】{created_at}\n【内容】\n{text}\n\n【评论】\n"
-    for idx, c in enumerate(comments, 1):
-        s += f"{idx}. {c.get('user', '未知')}：{c.get('text', '')}\n"
-    s += '-'*40 + '\n'
-    return s
-
-with open('all_weibos.txt', 'r', encoding='utf-8') as fin, open('all_weibos_readable.txt', 'w', encoding='utf-8') as fout:
-    for line in fin:
-        try:
-            weibo = json.loads(line)
-            fout.write(format_weibo(weibo))
-        except Exception as e:
-            print('格式化失败:', e) 
\ No newline at end of file
+    parts = []
+    append_weibo(parts, weibo)
+    return ''.join(parts)
+
+# 流式转换一个文件，返回 (成功条数, 失败条数)
+def export_readable(input_path, output_path, append=False, level=None):
+    written = failed = 0
+    parts = []
+    pending = 0
+    with open_binary(input_path, 'rb') as fin, open_binary(output_path, 'ab' if append else 'wb', level) as fout:
+        for line in fin:
+            if not line.strip():
+                continue
+            try:
+                append_weibo(parts, json_loads(line))
+            except Exception as e:
+                failed += 1
+                print('格式化失败:', e)
+                continue
+            written += 1
+            pending += 1
+            if pending >= FLUSH_RECORDS:
+                fout.write(''.join(parts).encode('utf-8'))
+                parts.clear()
+                pending = 0
+        if parts:
+            fout.write(''.join(parts).encode('utf-8'))
+    return written, failed
+
+# all_weibos_readable.txt.gz -> all_weibos_readable.part0.txt.gz，保留压缩扩展名，分段文件可以直接拼接
+def part_path(path, index):
+    root, ext = os.path.splitext(path)
+    if ext.lower() in ('.gz', '.zst', '.zstd'):
+        root, inner = os.path.splitext(root)
+        ext = inner + ext
+    return f"{root}.part{index}{ext}"
+
+def _export_part(task):
+    input_path, output_path, level = task
+    return export_readable(input_path, output_path, level=level)
+
+# 转换多个输入文件，按输入顺序写入同一个输出文件
+# workers > 1 时每个输入由一个进程转换到临时分段文件，最后按顺序把分段的字节拼接起来；
+# 压缩输出时各分段是独立的 gzip/zstd 数据块，拼接后仍是合法的压缩文件，不必解压再压缩
+def export_files(input_paths, output_path, workers=1, level=None):
+    if workers <= 1 or len(input_paths) <= 1:
+        written = failed = 0
+        for index, input_path in enumerate(input_paths):
+            counts = export_readable(input_path, output_path, append=index > 0, level=level)
+            written += counts[0]
+            failed += counts[1]
+        return written, failed
+
+    parts = [part_path(output_path, index) for index in range(len(input_paths))]
+    try:
+        with multiprocessing.Pool(min(workers, len(input_paths))) as pool:
+            results = pool.map(_export_part, [(src, dst, level) for src, dst in zip(input_paths, parts)], chunksize=1)
+        with open(output_path, 'wb') as out:
+            for path in parts:
+                with open(path, 'rb') as f:
+                    shutil.copyfileobj(f, out, BUFFER_SIZE)
+    finally:
+        for path in parts:
+            if os.path.exists(path):
+                os.remove(path)
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+def main():
+    parser = argparse.ArgumentParser(description='把爬取的JSONL微博数据转换成便于阅读的文本')
+    parser.add_argument('inputs', nargs='*', default=['all_weibos.txt'],
+                        help='输入的JSONL文件（可多个分片，支持 .gz/.zst 和分段输出清单），默认 all_weibos.txt')
+    parser.add_argument('-o', '--output', default='all_weibos_readable.txt',
+                        help='输出文件，扩展名为 .gz/.zst 时压缩输出')
+    parser.add_argument('--workers', type=int, default=1, help='并行转换分片的进程数')
+    parser.add_argument('--level', type=int, default=None, help='压缩输出的压缩级别，默认 gzip 6 / zstd 3')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    inputs = [part for path in args.inputs for part in input_files(path)]
+    written, failed = export_files(inputs, args.output, args.workers, args.level)
+    elapsed = time.perf_counter() - start
+    print(f"转换完成：{written} 条微博写入 {args.output}，失败 {failed} 条，耗时 {elapsed:.1f} 秒")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.retry import Retry
+
+# WeiboCrawler 和 user_collecter 共用的HTTP传输层：可配置的连接池、keep-alive、重试策略，
+# 可选的 HTTP/2（需要 httpx[http2]），以及把每个请求的耗时拆成 DNS、建连、TLS 握手和传输四段
+# 响应的 gzip/deflate 由 requests/httpx 自动解压；装了 brotli 时请求头会自动加上 br 并解压
+
+# 装了 httpx 时支持 HTTP/2 多路复用
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# 耗时分段：transfer 为总耗时减去前三段，包括发送请求、等待服务器和读取响应体
+PHASES = ('dns', 'connect', 'tls', 'transfer')
+
+# 传输层可能抛出的网络异常，调用方据此区分网络失败和其他错误
+TRANSPORT_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx is not None else ())
+
+# 传输层只重试建立连接失败，且只对幂等方法；请求已发出后的失败和 5xx 由调用方重试，
+# 每次重试都经过限速器，失败状态码照常触发它的降速和退避
+RETRY_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+# 调用方应当重试的状态码；429/418 不在其中，由限速器暂停后按正常流程处理
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+# 当前线程正在进行的请求的分段耗时；连接在发请求的线程里建立，新建连接时把耗时累加进来
+_local = threading.local()
+
+def _add_phase(name, seconds):
+    phases = getattr(_local, 'phases', None)
+    if phases is not None:
+        phases[name] += seconds
+
+# 建连前先自己解析域名以单独计时，再按解析结果依次尝试连接，与 urllib3 自己的做法一致
+class TimedConnectionMixin:
+    def _new_conn(self):
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = [info[4][0] for info in
+                         socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)]
+        except socket.gaierror:
+            # 解析失败时交给 urllib3 抛出它自己的异常
+            addresses = [host]
+        addresses = list(dict.fromkeys(addresses))
+        resolved = time.perf_counter()
+        _add_phase('dns', resolved - start)
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, OSError) as e:
+                    # 拒绝连接、超时、IPv6 不可达等，换下一个地址；全部失败时抛出最后一个错误
+                    error = e
+            raise error
+        finally:
+            self._dns_host = host
+            _add_phase('connect', time.perf_counter() - resolved)
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+# TLS 握手耗时为整个 connect() 减去解析和建连
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        phases = getattr(_local, 'phases', None)
+        before = phases['dns'] + phases['connect'] if phases is not None else 0.0
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            if phases is not None:
+                _add_phase('tls', time.perf_counter() - start - (phases['dns'] + phases['connect'] - before))
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+# 使用计时连接的适配器
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+# httpx 的连接事件对应的耗时分段；httpx 的建连包含域名解析，DNS 不单独计时
+HTTPX_PHASES = {'connection.connect_tcp': 'connect', 'connection.start_tls': 'tls'}
+
+def _httpx_trace(phases):
+    started = {}
+
+    def trace(event, info):
+        name, _, stage = event.rpartition('.')
+        if name not in HTTPX_PHASES:
+            return
+        if stage == 'started':
+            started[name] = time.perf_counter()
+        elif name in started:
+            phases[HTTPX_PHASES[name]] += time.perf_counter() - started.pop(name)
+    return trace
+
+# 一个共享的HTTP会话及其连接池配置；session 属性是 requests.Session（http2=True 时是 httpx.Client），
+# 两者的 get()、headers、cookies 和响应对象的 status_code/headers/content/json() 用法相同
+# pool_connections 为缓存连接池的主机数，pool_maxsize 为每个主机保持的连接数，应不少于同时发请求的线程数
+# retries 为重试次数：传输层用它重试建立连接失败（backoff 为重试间隔的指数退避因子），
+# 调用方用它重试网络异常和 RETRY_STATUSES（见 WeiboCrawler._get）；HTTP/2 时一个连接上多路复用所有请求
+class HttpTransport:
+    def __init__(self, pool_connections=4, pool_maxsize=16, retries=2, backoff=0.5, keep_alive=True, http2=False,
+                 timing=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        self.timing = timing
+        self.session = self._create_http2_client() if http2 else self._create_session()
+
+    def _create_session(self):
+        session = requests.Session()
+        retry = Retry(total=self.retries, connect=self.retries, read=0, status=0, other=0,
+                      allowed_methods=RETRY_METHODS, backoff_factor=self.backoff,
+                      respect_retry_after_header=False, raise_on_status=False, raise_on_redirect=False)
+        adapter_cls = TimedHTTPAdapter if self.timing else HTTPAdapter
+        adapter = adapter_cls(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def _create_http2_client(self):
+        if httpx is None:
+            raise ImportError("HTTP/2 需要安装 httpx: pip install 'httpx[http2]'")
+        limits = httpx.Limits(max_connections=self.pool_maxsize,
+                              max_keepalive_connections=self.pool_maxsize if self.keep_alive else 0)
+        transport = httpx.HTTPTransport(http2=True, retries=self.retries, limits=limits)
+        # 与 requests 一样跟随重定向；未指定 timeout 的请求最多等 30 秒
+        return httpx.Client(transport=transport, follow_redirects=True, timeout=30.0)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    # 发送GET请求，返回 (响应, 分段耗时)；复用已有连接时 dns/connect/tls 都是 0，不计时时分段耗时为 None
+    # 网络异常照常抛出
+    def timed_get(self, url, **kwargs):
+        if not self.timing:
+            return self.session.get(url, **kwargs), None
+        phases = dict.fromkeys(PHASES, 0.0)
+        start = time.perf_counter()
+        if self.http2:
+            extensions = dict(kwargs.pop('extensions', None) or {}, trace=_httpx_trace(phases))
+            response = self.session.get(url, extensions=extensions, **kwargs)
+        else:
+            _local.phases = phases
+            try:
+                response = self.session.get(url, **kwargs)
+            finally:
+                _local.phases = None
+        phases['transfer'] = max(time.perf_counter() - start - phases['dns'] - phases['connect'] - phases['tls'], 0.0)
+        return response, phases
+
+    def close(self):
+        self.session.close()
+
+    def summary(self):
+        protocol = 'HTTP/2' if self.http2 else 'HTTP/1.1'
+        keep_alive = '开' if self.keep_alive else '关'
+        return (f"HTTP传输：{protocol}，连接池 {self.pool_connections} 个主机 × {self.pool_maxsize} 个连接，"
+                f"keep-alive {keep_alive}，重试 {self.retries} 次，压缩 {self.session.headers.get('Accept-Encoding')}")
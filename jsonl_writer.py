@@ -0,0 +1,66 @@
+import json
+import os
+import time
+
+# 带缓冲的JSONL写入器：攒够 batch_size 条再一次性写入，按 fsync_interval 秒落盘
+# f 需以二进制模式打开；tell() 返回含缓冲区在内的逻辑字节偏移，
+# 每次刷新后通知监听者（进度日志据此写入已落盘的事件）；记录监听者在每条记录写入缓冲区时收到记录本身
+class JsonlWriter:
+    def __init__(self, f, batch_size=200, fsync_interval=30.0):
+        self.f = f
+        self.position = f.tell()
+        self.batch_size = batch_size
+        # None 表示从不主动 fsync，0 表示每次刷新都 fsync
+        self.fsync_interval = fsync_interval
+        self.buffer = []
+        self.count = 0
+        self.listeners = []
+        self.record_listeners = []
+        self.last_fsync = time.monotonic()
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def add_record_listener(self, callback):
+        self.record_listeners.append(callback)
+
+    def write(self, record):
+        try:
+            line = json.dumps(record, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存微博json时出错: {e}")
+            line = json.dumps({"error": str(e), "id": record.get('id', 'unknown')}, ensure_ascii=False)
+        data = (line + '\n').encode('utf-8')
+        self.buffer.append(data)
+        self.position += len(data)
+        self.count += 1
+        for callback in self.record_listeners:
+            callback(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.f.write(b''.join(self.buffer))
+            self.buffer.clear()
+        self.f.flush()
+        if self.fsync_interval is not None and time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.f.fileno())
+            self.last_fsync = time.monotonic()
+        for callback in self.listeners:
+            callback(self.position)
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self.flush()
+        if self.fsync_interval is not None:
+            os.fsync(self.f.fileno())
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
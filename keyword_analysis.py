@@ -1,103 +1,416 @@
+import argparse
 import json
 import os
-import re
 import csv
 from collections import Counter, defaultdict
 from datetime import datetime
+from itertools import compress
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+
+from compressed_io import open_binary
+from dedup_index import IdSet, contains_ids
+from post_store import is_store_path
+from rotating_output import input_files
+from keyword_index import association_table, cooccurrence_counts, keyword_hit_matrix, windowed_association
+from text_clean import clean_text, clean_texts, extract_hashtags, extract_hashtags_batch
+
+# 有 orjson 时用它解析JSON，速度快数倍
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+CREATED_AT_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+# 报告核心关键词组
+KEYWORDS = [
+    '情绪价值', '悦己', '仪式感', '宠物', 'Citywalk', 
+    '泡泡玛特', '周边游', '治愈', '平替', '搭子'
+]
+
+# 整列解析微博时间。带 %z 的格式在 pandas 里很慢，而微博时间的时区几乎总是同一个，
+# 所以先切掉时区按无时区格式解析，再统一加上时区；时区不一致或格式不符时退回完整格式
+def parse_created_at(created_at):
+    text = created_at.astype(object).where(created_at.notna(), '')
+    offsets = text.str[20:25].unique()
+    if len(offsets) == 1 and text.str.len().eq(30).all():
+        naive = pd.to_datetime(text.str[4:19] + text.str[25:], format='%b %d %H:%M:%S %Y', errors='coerce')
+        if naive.notna().all():
+            return naive.dt.tz_localize(offsets[0])
+    try:
+        return pd.to_datetime(created_at, format=CREATED_AT_FORMAT, errors='coerce')
+    except ValueError:
+        # 混合时区时统一换算到东八区
+        created_at = pd.to_datetime(created_at, format=CREATED_AT_FORMAT, errors='coerce', utc=True)
+        return created_at.dt.tz_convert('Asia/Shanghai')
+
+# 向量化清洗：一次处理一整列文本和时间，返回与逐行清洗相同结构的 DataFrame
+def build_clean_frame(created_at, texts):
+    if not pd.api.types.is_datetime64_any_dtype(created_at):
+        created_at = parse_created_at(created_at)
+    valid = created_at.notna()
+    
+    # 文本清洗逐条调用预编译正则，比 pandas 的 .str.replace 链少几次整列遍历
+    text_clean = clean_texts(texts[valid].tolist(), strip_urls=True, collapse_space=False)
+    
+    return pd.DataFrame({
+        'created_at': created_at[valid].reset_index(drop=True),
+        'text': pd.Series(text_clean, dtype=object),
+        'hashtags': pd.Series(extract_hashtags_batch(text_clean), dtype=object),
+    })
+
+# 重复运行或多个用户转发可能让同一条微博出现多次，没有 id 的记录不去重
+def is_duplicate(weibo_id, seen):
+    if weibo_id is None or weibo_id != weibo_id:
+        return False
+    if weibo_id in seen:
+        return True
+    seen.add(weibo_id)
+    return False
+
+# 一块微博的 id 转成 int64 数组；valid 为 False 的记录没有 id 或 id 不是整数，不参与去重
+def id_array(raw_ids):
+    ids = np.zeros(len(raw_ids), dtype=np.int64)
+    valid = np.zeros(len(raw_ids), dtype=bool)
+    for i, weibo_id in enumerate(raw_ids):
+        try:
+            ids[i] = int(weibo_id)
+        except (TypeError, ValueError, OverflowError):
+            continue
+        valid[i] = True
+    return ids, valid
+
+# 按 id 去重一块微博，返回要保留的行的掩码：同一条微博只保留第一次出现，没有 id 的记录都保留
+# seen 为 dedup_index.IdSet；only 为排好序的 id 数组时只保留其中的微博，用于单独统计跨分片重复的微博
+def dedup_mask(raw_ids, seen, only=None):
+    ids, valid = id_array(raw_ids)
+    if only is None:
+        keep = np.ones(len(ids), dtype=bool)
+    else:
+        valid &= contains_ids(only, ids)
+        keep = np.zeros(len(ids), dtype=bool)
+    keep[valid] = seen.add_new(ids[valid])
+    return keep
+
+def dedup_frame(id_list, created_list, text_list, seen, only=None):
+    keep = dedup_mask(id_list, seen, only)
+    return build_clean_frame(pd.Series(list(compress(created_list, keep)), dtype=object),
+                             pd.Series(list(compress(text_list, keep)), dtype=object))
+
+# 按块读取JSONL：每块只在Python里解析JSON、取出三个字段，去重、清洗和时间解析按整块处理
+# 同一条微博（按 id）在文件中出现多次时只保留第一次；支持 .gz/.zst 压缩文件和分段输出的清单（依次读各分段）
+# seen 为 IdSet，传入时跳过其中的微博，读完后包含本文件的全部 id，用于跨文件去重；only 同 dedup_mask
+def iter_jsonl_frames(path, chunk_size=100000, seen=None, only=None):
+    id_list = []
+    created_list = []
+    text_list = []
+    if seen is None:
+        seen = IdSet()
+    produced = False
+    for part in input_files(path):
+        with open_binary(part) as f:
+            for line in f:
+                line = line.strip()
+                if not line: continue
+                try:
+                    weibo = json_loads(line)
+                except ValueError:
+                    continue
+                id_list.append(weibo.get('id'))
+                created_list.append(weibo.get('created_at'))
+                text_list.append(weibo.get('text_raw', weibo.get('text', '')))  # 优先使用raw文本
+                if len(created_list) >= chunk_size:
+                    yield dedup_frame(id_list, created_list, text_list, seen, only)
+                    produced = True
+                    id_list = []
+                    created_list = []
+                    text_list = []
+    if created_list or not produced:
+        yield dedup_frame(id_list, created_list, text_list, seen, only)
+
+# 按行组批次读取Parquet，只读需要的列，同样按 id 去重
+def iter_parquet_frames(path, chunk_size=100000, seen=None, only=None):
+    from columnar_store import iter_parquet
+    if seen is None:
+        seen = IdSet()
+    for df in iter_parquet(path, columns=['id', 'created_at', 'text_raw'], batch_size=chunk_size):
+        df = df[dedup_mask(df['id'].tolist(), seen, only)]
+        yield build_clean_frame(df['created_at'], df['text_raw'])
+
+# 从帖子库按块读取，时间、用户、关键词筛选都在库里用索引完成；库里存的已是清洗后的正文
+def iter_store_frames(path, chunk_size=100000, since=None, until=None, uids=None, match=None):
+    from post_store import PostStore
+    with PostStore(path) as store:
+        produced = False
+        for rows in store.iter_rows(('created_at', 'text'), chunk_size, since=since, until=until, uids=uids, match=match):
+            yield store_frame(rows)
+            produced = True
+        if not produced:
+            yield store_frame([])
+
+# 帖子库的行转换成与 build_clean_frame 相同结构的 DataFrame，时间换回东八区
+def store_frame(rows):
+    created_at = pd.Series([row[0] for row in rows], dtype='int64')
+    texts = [row[1] or '' for row in rows]
+    return pd.DataFrame({
+        'created_at': pd.to_datetime(created_at, unit='s', utc=True).dt.tz_convert('+0800').dt.as_unit('us'),
+        'text': pd.Series(texts, dtype=object),
+        'hashtags': pd.Series(extract_hashtags_batch(texts), dtype=object),
+    })
+
+# 文件数据源没有索引，读入后再按时间和关键词筛选，结果与帖子库的筛选一致
+def filter_frame(frame, since=None, until=None, match=None):
+    mask = np.ones(len(frame), dtype=bool)
+    if since is not None:
+        mask &= (frame['created_at'] >= pd.Timestamp(since, unit='s', tz='UTC')).to_numpy()
+    if until is not None:
+        mask &= (frame['created_at'] < pd.Timestamp(until, unit='s', tz='UTC')).to_numpy()
+    if match:
+        mask &= np.fromiter((any(keyword in text for keyword in match) for text in frame['text']), dtype=bool,
+                            count=len(frame))
+    if mask.all():
+        return frame
+    return frame[mask].reset_index(drop=True)
+
+# 按数据源类型按块读取清洗后的微博；since/until 为 Unix 秒（左闭右开），uids 为用户ID，match 为任意命中的关键词
+# seen、only 同 iter_jsonl_frames；帖子库按 id 唯一存储，不需要去重
+def iter_clean_frames(path, chunk_size=100000, since=None, until=None, uids=None, match=None, seen=None, only=None):
+    if is_store_path(path):
+        return iter_store_frames(path, chunk_size, since, until, uids, match)
+    if uids:
+        raise ValueError(f"按用户筛选需要帖子库（.db），{path} 的分析数据中没有用户ID")
+    if path.endswith('.parquet'):
+        frames = iter_parquet_frames(path, chunk_size, seen, only)
+    else:
+        frames = iter_jsonl_frames(path, chunk_size, seen, only)
+    if since is None and until is None and not match:
+        return frames
+    return (filter_frame(frame, since, until, match) for frame in frames)
+
+# 只有按天、小时等固定长度切分时区间起点才有意义，按月、周等日历区间时用默认值
+def _bin_origin(interval, origin):
+    return origin if isinstance(to_offset(interval), Tick) else 'start_day'
+
+# 只取有命中的 (微博, 关键词) 对，按时间区间和关键词计数，返回以 (区间, 关键词下标) 为索引的 Series
+# 分块统计时要传 origin='epoch'，保证各块的区间边界一致
+def count_trend_hits(created_at, hits, interval='M', origin='start_day'):
+    coo = hits.tocoo()
+    pairs = pd.DataFrame({
+        'created_at': created_at.array[coo.row],
+        'keyword': coo.col,
+    })
+    return pairs.groupby([pd.Grouper(key='created_at', freq=interval, origin=_bin_origin(interval, origin)), 'keyword']).size()
+
+# 把计数展开成 区间×关键词 的表，补齐中间没有命中的区间
+def trend_table(counts, keywords, interval='M', origin='start_day'):
+    if counts.empty:
+        return pd.DataFrame(columns=keywords, dtype='int64')
+    trend_df = counts.unstack(fill_value=0).resample(interval, origin=_bin_origin(interval, origin)).sum()
+    trend_df = trend_df.reindex(columns=range(len(keywords)), fill_value=0)
+    trend_df.columns = keywords
+    return trend_df
+
+def save_trends(trend_df):
+    trend_df.to_csv('analysis_keyword_trends.csv', encoding='utf-8-sig')
+    print("趋势数据已保存至 analysis_keyword_trends.csv")
+
+# 保存共现矩阵（对角线置0）和各关键词对的 lift/PMI，total 为微博总数
+def save_cooccurrence(counts, keywords, total):
+    dense = counts.toarray()
+    np.fill_diagonal(dense, 0)
+    matrix = pd.DataFrame(dense, index=keywords, columns=keywords)
+    
+    matrix.to_csv('analysis_cooccurrence_matrix.csv', encoding='utf-8-sig')
+    print("共现矩阵已保存至 analysis_cooccurrence_matrix.csv")
+    
+    pairs = association_table(counts, keywords, total)
+    pairs.to_csv('analysis_cooccurrence_pairs.csv', index=False, encoding='utf-8-sig')
+    print("关键词对的 lift/PMI 已保存至 analysis_cooccurrence_pairs.csv")
+    return matrix
+
+# 打印并保存高频话题
+def report_top_hashtags(counter, top_n=20):
+    print("-" * 40)
+    print(f"{'热门话题':<20} | {'频次':<10}")
+    print("-" * 40)
+    for tag, count in counter.most_common(top_n):
+        print(f"#{tag:<18} | {count:<10}")
+    print("-" * 40)
+    
+    with open('analysis_top_hashtags.csv', 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['话题', '频次'])
+        writer.writerows(counter.most_common(top_n))
 
 class WeiboAnalyzer:
     def __init__(self, file_path):
         self.file_path = file_path
         self.df = None
         self.keywords = []
+        self.hits = None
+        self.hit_keywords = None
     
-    # 加载数据并进行预处理
-    def load_and_clean_data(self):
+    # 加载数据并进行预处理；默认按块读取并向量化清洗，vectorized=False 时使用逐行处理
+    # since/until（Unix 秒）、uids、match 为筛选条件：数据源是帖子库（.db）时在库里用索引筛选，
+    # 是JSONL或Parquet时读入后再筛选（不支持按用户筛选）；有筛选条件时总是按块向量化处理
+    def load_and_clean_data(self, chunk_size=100000, vectorized=True, since=None, until=None, uids=None, match=None):
         print(f"正在加载数据: {self.file_path} ...")
-        data_list = []
+        self.hits = None
         
         if not os.path.exists(self.file_path):
             print(f"错误: 文件 {self.file_path} 不存在")
             return False
 
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line: continue
-                try:
-                    weibo = json.loads(line)
-                    # 提取关键字段
-                    created_at = weibo.get('created_at', '')
-                    text = weibo.get('text_raw', weibo.get('text', '')) # 优先使用raw文本
+        if is_store_path(self.file_path) or since is not None or until is not None or uids or match:
+            return self.load_filtered(chunk_size, since, until, uids, match)
+        if self.file_path.endswith('.parquet'):
+            return self.load_parquet_data()
+        if vectorized:
+            return self.load_jsonl_chunked(chunk_size)
+        return self.load_jsonl_rowwise()
+    
+    # 按块读取JSONL并向量化清洗
+    def load_jsonl_chunked(self, chunk_size=100000):
+        self.df = pd.concat(iter_jsonl_frames(self.file_path, chunk_size), ignore_index=True)
+        print(f"数据加载完成，共清洗有效微博 {len(self.df)} 条")
+        return True
+    
+    # 按块读取并筛选
+    def load_filtered(self, chunk_size=100000, since=None, until=None, uids=None, match=None):
+        try:
+            frames = iter_clean_frames(self.file_path, chunk_size, since, until, uids, match)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return False
+        self.df = pd.concat(frames, ignore_index=True)
+        print(f"数据加载完成，共清洗有效微博 {len(self.df)} 条")
+        return True
+    
+    # 逐行读取并清洗（原始实现，保留用于对照和基准测试）
+    def load_jsonl_rowwise(self):
+        data_list = []
+        seen = set()
+        for part in input_files(self.file_path):
+            with open_binary(part) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line: continue
+                    try:
+                        weibo = json.loads(line)
+                        if is_duplicate(weibo.get('id'), seen):
+                            continue
+                        # 提取关键字段
+                        created_at = weibo.get('created_at', '')
+                        text = weibo.get('text_raw', weibo.get('text', '')) # 优先使用raw文本
                     
-                    # 清洗文本 (去除HTML标签等)
-                    text_clean = re.sub(r'<[^>]+>', '', text)
-                    text_clean = re.sub(r'http\S+', '', text_clean)
+                        # 清洗文本 (去除HTML标签等)
+                        text_clean = clean_text(text, strip_urls=True, collapse_space=False)
                     
-                    # 解析时间 (微博时间格式通常为: Wed Dec 03 10:00:00 +0800 2025)
-                    # 这里做简单的格式尝试，根据实际爬虫返回格式调整
-                    try:
-                        dt = datetime.strptime(created_at, '%a %b %d %H:%M:%S %z %Y')
-                    except:
-                        # 如果解析失败，尝试使用当前时间或跳过
-                        continue
+                        # 解析时间 (微博时间格式通常为: Wed Dec 03 10:00:00 +0800 2025)
+                        # 这里做简单的格式尝试，根据实际爬虫返回格式调整
+                        try:
+                            dt = datetime.strptime(created_at, '%a %b %d %H:%M:%S %z %Y')
+                        except:
+                            # 如果解析失败，尝试使用当前时间或跳过
+                            continue
 
-                    data_list.append({
-                        'created_at': dt,
-                        'text': text_clean,
-                        'hashtags': re.findall(r'#([^#]+)#', text_clean)
-                    })
-                except json.JSONDecodeError:
-                    continue
+                        data_list.append({
+                            'created_at': dt,
+                            'text': text_clean,
+                            'hashtags': extract_hashtags(text_clean)
+                        })
+                    except json.JSONDecodeError:
+                        continue
         
         self.df = pd.DataFrame(data_list)
         print(f"数据加载完成，共清洗有效微博 {len(self.df)} 条")
         return True
     
+    # 从Parquet列式文件加载，只读取需要的列，时间已是时间戳类型，清洗用向量化字符串操作
+    def load_parquet_data(self):
+        from columnar_store import load_parquet
+        df = load_parquet(self.file_path, columns=['id', 'created_at', 'text_raw'])
+        df = df[df['id'].isna() | ~df['id'].duplicated()]
+        self.df = build_clean_frame(df['created_at'], df['text_raw'])
+        print(f"数据加载完成，共清洗有效微博 {len(self.df)} 条")
+        return True
+    
+    # 建立关键词索引：用一个自动机扫描一遍语料，得到 微博×关键词 稀疏命中矩阵，同一组关键词只建一次
+    def keyword_hits(self, keywords):
+        keywords = list(dict.fromkeys(keywords))
+        if self.hits is None or self.hit_keywords != keywords:
+            print(f"正在建立关键词索引（{len(keywords)} 个关键词）...")
+            self.hits = keyword_hit_matrix(self.df['text'], keywords)
+            self.hit_keywords = keywords
+        return keywords, self.hits
+    
     # 分析关键词的时间趋势
     def analyze_trends(self, keywords, interval='M'):
         print("\n正在进行时间趋势分析...")
         self.keywords = keywords
+        keywords, hits = self.keyword_hits(keywords)
         
-        # 设置时间索引
-        self.df.set_index('created_at', inplace=True)
-        
-        trend_data = {}
-        
-        for kw in keywords:
-            # 统计包含该关键词的微博数量，按时间重采样
-            # 使用 lambda 函数判断文本中是否包含关键词
-            mask = self.df['text'].apply(lambda x: kw in x)
-            resampled = self.df[mask].resample(interval).size()
-            trend_data[kw] = resampled
-            
-        trend_df = pd.DataFrame(trend_data).fillna(0)
+        counts = count_trend_hits(self.df['created_at'], hits, interval)
+        trend_df = trend_table(counts, keywords, interval)
         
         # 保存趋势数据
-        trend_df.to_csv('analysis_keyword_trends.csv', encoding='utf-8-sig')
-        print("趋势数据已保存至 analysis_keyword_trends.csv")
-        
-        # 恢复索引
-        self.df.reset_index(inplace=True)
+        save_trends(trend_df)
+        return trend_df
 
-    # 分析关键词共现矩阵
+    # 分析关键词共现矩阵：命中矩阵的 XᵀX 即两两同时出现的微博数，另输出各关键词对的 lift/PMI
     def analyze_cooccurrence(self, keywords):
         print("\n正在进行共现分析...")
-        matrix = pd.DataFrame(0, index=keywords, columns=keywords)
+        keywords, hits = self.keyword_hits(keywords)
+        
+        return save_cooccurrence(cooccurrence_counts(hits), keywords, hits.shape[0])
+    
+    # 按时间窗口（默认每月）分别计算共现，观察关键词关联随时间的变化
+    def analyze_cooccurrence_windows(self, keywords, interval='M'):
+        print("\n正在进行分时段共现分析...")
+        keywords, hits = self.keyword_hits(keywords)
         
-        for text in self.df['text']:
-            found_kws = [kw for kw in keywords if kw in text]
-            if len(found_kws) > 1:
-                for i in range(len(found_kws)):
-                    for j in range(i + 1, len(found_kws)):
-                        k1, k2 = found_kws[i], found_kws[j]
-                        matrix.loc[k1, k2] += 1
-                        matrix.loc[k2, k1] += 1
-                        
-        matrix.to_csv('analysis_cooccurrence_matrix.csv', encoding='utf-8-sig')
-        print("共现矩阵已保存至 analysis_cooccurrence_matrix.csv")
-        return matrix
+        windows = windowed_association(hits, keywords, self.df['created_at'], interval)
+        windows.to_csv('analysis_cooccurrence_windows.csv', index=False, encoding='utf-8-sig')
+        print("分时段共现数据已保存至 analysis_cooccurrence_windows.csv")
+        return windows
+    
+    # 分词：jieba 分批并行分词并去除停用词，结果缓存到磁盘，语料和停用词不变时再次运行直接读取缓存
+    # jieba 只有分词时才需要，用到时再导入
+    def tokenize_corpus(self, stopwords_file='stopwords.txt', cache_path=None, workers=None, min_df=5):
+        from term_discovery import iter_tokens, load_stopwords, term_matrix
+        print("\n正在分词...")
+        if cache_path is None:
+            cache_path = self.file_path + '.tokens'
+        stopwords = load_stopwords(stopwords_file)
+        tokens = iter_tokens(self.df['text'].tolist(), stopwords, cache_path, workers)
+        matrix, terms = term_matrix(tokens, min_df)
+        print(f"分词完成，出现在至少 {min_df} 条微博中的词共 {len(terms)} 个")
+        return matrix, terms
+    
+    # 发现关键词：全语料 TF-IDF 高权重词、各时间区间的高权重词，以及相对前几个区间占比上升最快的新兴词
+    def discover_terms(self, top_n=30, interval='M', stopwords_file='stopwords.txt', cache_path=None,
+                       workers=None, min_df=5, window=3, min_count=10):
+        from term_discovery import emerging_terms, period_matrix, period_top_terms, tfidf, top_terms
+        matrix, terms = self.tokenize_corpus(stopwords_file, cache_path, workers, min_df)
+        weights = tfidf(matrix)
+        labels, indicator = period_matrix(self.df['created_at'], interval)
+        
+        corpus_terms = top_terms(weights, matrix, terms, top_n)
+        corpus_terms.to_csv('analysis_top_terms.csv', index=False, encoding='utf-8-sig')
+        print("TF-IDF 高权重词已保存至 analysis_top_terms.csv")
+        
+        period_terms = period_top_terms(weights, terms, labels, indicator, top_n)
+        period_terms.to_csv('analysis_period_terms.csv', index=False, encoding='utf-8-sig')
+        print("各时间区间的高权重词已保存至 analysis_period_terms.csv")
+        
+        emerging = emerging_terms(matrix, terms, labels, indicator, window, top_n, min_count)
+        emerging.to_csv('analysis_emerging_terms.csv', index=False, encoding='utf-8-sig')
+        print("新兴词已保存至 analysis_emerging_terms.csv")
+        return corpus_terms, period_terms, emerging
     
     # 提取相关的高频话题标签
     def extract_top_hashtags(self, top_n=20):
@@ -106,36 +419,27 @@ class WeiboAnalyzer:
         for tags in self.df['hashtags']:
             all_hashtags.extend(tags)
             
-        counter = Counter(all_hashtags)
-        
-        print("-" * 40)
-        print(f"{'热门话题':<20} | {'频次':<10}")
-        print("-" * 40)
-        for tag, count in counter.most_common(top_n):
-            print(f"#{tag:<18} | {count:<10}")
-        print("-" * 40)
-        
-        with open('analysis_top_hashtags.csv', 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['话题', '频次'])
-            writer.writerows(counter.most_common(top_n))
+        report_top_hashtags(Counter(all_hashtags), top_n)
 
 if __name__ == "__main__":
-    # 报告核心关键词组
-    KEYWORDS = [
-        '情绪价值', '悦己', '仪式感', '宠物', 'Citywalk', 
-        '泡泡玛特', '周边游', '治愈', '平替', '搭子'
-    ]
+    parser = argparse.ArgumentParser(description='微博关键词趋势、共现和话题分析')
+    parser.add_argument('data_file', nargs='?', help='JSONL（可压缩）、Parquet文件、分段输出清单或帖子库（.db）',
+                        default='all_weibos.txt')
+    parser.add_argument('--discover-terms', action='store_true', help='另外用 jieba 分词做 TF-IDF 和新兴词发现（需要 jieba）')
+    args = parser.parse_args()
     
-    DATA_FILE = 'all_weibos.txt'
-    
-    analyzer = WeiboAnalyzer(DATA_FILE)
+    analyzer = WeiboAnalyzer(args.data_file)
     if analyzer.load_and_clean_data():
         # 1. 趋势分析 (按月)
         analyzer.analyze_trends(KEYWORDS, interval='M')
         
         # 2. 共现分析 (查看哪些词经常一起出现)
         analyzer.analyze_cooccurrence(KEYWORDS)
+        analyzer.analyze_cooccurrence_windows(KEYWORDS, interval='M')
         
         # 3. 热门话题提取
-        analyzer.extract_top_hashtags()
\ No newline at end of file
+        analyzer.extract_top_hashtags()
+        
+        # 4. 关键词发现 (TF-IDF 与新兴词)
+        if args.discover_terms:
+            analyzer.discover_terms(interval='M')
\ No newline at end of file
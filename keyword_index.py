@@ -0,0 +1,122 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# 装了 pyahocorasick 时用它的C实现，否则用下面的纯Python自动机，结果相同
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# 纯Python的 Aho-Corasick 自动机：一遍扫描文本即可找出所有出现的关键词（包括互相重叠的）
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.output = [set()]
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for ch in keyword:
+                if ch not in self.goto[state]:
+                    self.goto.append({})
+                    self.output.append(set())
+                    self.goto[state][ch] = len(self.goto) - 1
+                state = self.goto[state][ch]
+            self.output[state].add(index)
+        self.fail = [0] * len(self.goto)
+        self._build_fail()
+
+    # 按层次遍历建立失配指针，并把失配状态的输出合并进来
+    def _build_fail(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, target in self.goto[state].items():
+                queue.append(target)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[target] = self.goto[fallback].get(ch, 0)
+                self.output[target] |= self.output[self.fail[target]]
+
+    # 返回文本中出现过的关键词下标集合
+    def hits(self, text):
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        found = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+# pyahocorasick 的包装，接口与 KeywordAutomaton 一致
+class _CKeywordAutomaton:
+    def __init__(self, keywords):
+        self.automaton = ahocorasick.Automaton()
+        for index, keyword in enumerate(keywords):
+            self.automaton.add_word(keyword, index)
+        self.automaton.make_automaton()
+
+    def hits(self, text):
+        return {index for _, index in self.automaton.iter(text)}
+
+def build_automaton(keywords):
+    if ahocorasick is not None and keywords:
+        return _CKeywordAutomaton(keywords)
+    return KeywordAutomaton(keywords)
+
+# 一遍扫描语料，得到 微博×关键词 的稀疏命中矩阵（命中为1，与 kw in text 的判断一致）
+# 分块处理时可传入已建好的 automaton，避免每块重建
+def keyword_hit_matrix(texts, keywords, automaton=None):
+    if automaton is None:
+        automaton = build_automaton(keywords)
+    indptr = [0]
+    indices = []
+    for text in texts:
+        found = automaton.hits(text) if isinstance(text, str) else ()
+        indices.extend(sorted(found))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.int32)
+    return sparse.csr_matrix((data, np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+                             shape=(len(indptr) - 1, len(keywords)))
+
+# 共现计数矩阵 XᵀX：对角线是每个关键词出现的微博数，其余是两两同时出现的微博数
+def cooccurrence_counts(hits):
+    return (hits.T @ hits).tocsr()
+
+# 由共现计数计算关联强度，只对实际共现过的关键词对计算，返回长表
+# lift = P(a,b) / (P(a)P(b))，pmi = log2(lift)
+def association_table(counts, keywords, total):
+    doc_freq = counts.diagonal().astype(np.float64)
+    pairs = sparse.triu(counts, k=1).tocoo()
+    both = pairs.data.astype(np.float64)
+    lift = both * total / (doc_freq[pairs.row] * doc_freq[pairs.col])
+    table = pd.DataFrame({
+        'keyword_a': np.asarray(keywords, dtype=object)[pairs.row],
+        'keyword_b': np.asarray(keywords, dtype=object)[pairs.col],
+        'count': pairs.data,
+        'count_a': doc_freq[pairs.row].astype(np.int64),
+        'count_b': doc_freq[pairs.col].astype(np.int64),
+        'lift': lift,
+        'pmi': np.log2(lift),
+    })
+    return table.sort_values(['count', 'lift'], ascending=False).reset_index(drop=True)
+
+# 按时间窗口（如每月）分别计算共现关联；created_at 与命中矩阵的行一一对应
+def windowed_association(hits, keywords, created_at, interval='M'):
+    rows = pd.Series(np.arange(len(created_at)), index=pd.DatetimeIndex(created_at))
+    tables = []
+    for period, window in rows.resample(interval):
+        if window.empty:
+            continue
+        window_hits = hits[window.values]
+        table = association_table(cooccurrence_counts(window_hits), keywords, window_hits.shape[0])
+        table.insert(0, 'period', period)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=['period', 'keyword_a', 'keyword_b', 'count', 'count_a', 'count_b', 'lift', 'pmi'])
+    return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,279 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# 本地模拟的微博接口，返回确定性的合成数据，用于离线测试和性能基准
+# 支持 profile/info、statuses/mymblog、statuses/user_timeline、statuses/buildComments、friendships/friends
+# 可配置响应延迟、随机错误率和限流（超过速率时返回 418，与微博限流时一致）
+
+WORDS = ['情绪价值', '悦己', '仪式感', '宠物', 'Citywalk', '泡泡玛特', '周边游', '治愈', '平替', '搭子', '咖啡', '周末']
+EMOTIONS = ['[笑cry]', '[doge]', '[心]', '[哈哈]', '[允悲]']
+BASE_TIME = datetime(2025, 12, 1, 12, 0, tzinfo=timezone(timedelta(hours=8)))
+
+# 模拟服务器的参数
+class MockConfig:
+    def __init__(self, posts_per_user=60, comments_per_post=5, friends_per_user=40, user_space=100000,
+                 latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=0.0, retry_after=1, seed=0):
+        self.posts_per_user = posts_per_user
+        self.comments_per_post = comments_per_post
+        self.friends_per_user = friends_per_user
+        # 关注列表里的用户ID在 1..user_space 之间，广度优先采集最终会收敛
+        self.user_space = user_space
+        # 每个响应的延迟（秒），实际延迟在 latency ± jitter 之间均匀分布
+        self.latency = latency
+        self.jitter = jitter
+        # 随机返回 500 的概率
+        self.error_rate = error_rate
+        # 全局限速（次/秒），0 表示不限；超过时返回 418 和 Retry-After
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.seed = seed
+
+# 同一用户、同一条微博每次生成的内容都相同；用字符串做种子，不受进程间 hash 随机化影响
+def _rng(seed, *keys):
+    return random.Random(':'.join(map(str, (seed,) + keys)))
+
+def comment_count(weibo_id, config):
+    return _rng(config.seed, 'comment_count', weibo_id).randint(0, config.comments_per_post)
+
+def make_user(uid, seed=0):
+    rng = _rng(seed, 'user', uid)
+    return {
+        'id': uid,
+        'screen_name': f'用户{uid}',
+        'description': '这是一个很长的个人简介' * rng.randint(1, 3),
+        'followers_count': rng.randint(0, 100000),
+        'friends_count': rng.randint(0, 2000),
+        'verified': rng.random() < 0.1,
+        'profile_image_url': f'https://tvax1.sinaimg.cn/crop.0.0.180.180.180/{uid:x}.jpg',
+    }
+
+# 用户 uid 的第 index 条微博（0 为最新），微博 id 随 index 增大而减小
+def make_weibo(uid, index, config):
+    rng = _rng(config.seed, 'weibo', uid, index)
+    a, b, c = rng.sample(WORDS, 3)
+    emotion = rng.choice(EMOTIONS)
+    weibo_id = uid * 1000000 + (config.posts_per_user - index)
+    text = (f"今天{a}和{b}<br /><a href='https://m.weibo.cn/search?containerid=231522'>#{c}#</a> 真的很好"
+            f"<img alt=\"{emotion}\" title=\"{emotion}\" src=\"https://face.t.sinajs.cn/t4/{index % 97}.png\" />"
+            f" &quot;{a}&quot;&nbsp;&amp; http://t.cn/A{weibo_id % 100000}")
+    weibo = {
+        'id': weibo_id,
+        'mblogid': f'N{weibo_id:x}',
+        'created_at': (BASE_TIME - timedelta(hours=index * 7, minutes=uid % 60)).strftime('%a %b %d %H:%M:%S %z %Y'),
+        'text': text,
+        'text_raw': f"今天{a}和{b}\n#{c}# 真的很好{emotion} \"{a}\" & http://t.cn/A{weibo_id % 100000}",
+        'reposts_count': rng.randint(0, 100),
+        'comments_count': comment_count(weibo_id, config),
+        'attitudes_count': rng.randint(0, 500),
+        'user': {'id': uid, 'screen_name': f'用户{uid}'},
+    }
+    if rng.random() < 0.2:
+        origin = rng.randint(1, 500)
+        weibo['retweeted_status'] = {
+            'id': 900000000 + origin,
+            'text': f'原文 {origin} #{c}#',
+            'user': {'id': origin, 'screen_name': f'原作者{origin}'},
+        }
+    return weibo
+
+# 一条微博的全部评论
+def make_comments(weibo_id, count, seed=0):
+    rng = _rng(seed, 'comments', weibo_id)
+    return [{
+        'id': weibo_id * 100 + i,
+        'text': f"评论{i} {rng.choice(WORDS)}<img alt=\"{rng.choice(EMOTIONS)}\" src=\"x.png\" />",
+        'like_count': rng.randint(0, 50),
+        'user': {'id': rng.randint(1, 100000), 'screen_name': f'评论者{i}'},
+    } for i in range(count)]
+
+def make_friend_ids(uid, config):
+    rng = _rng(config.seed, 'friends', uid)
+    return [rng.randint(1, config.user_space) for _ in range(config.friends_per_user)]
+
+# 生成 count 条合成微博（不经过服务器），用于测试写文件等不需要网络的环节
+def synthetic_weibos(count, config=None):
+    config = config or MockConfig()
+    for i in range(count):
+        uid, index = divmod(i, config.posts_per_user)
+        weibo = make_weibo(uid + 1, index, config)
+        weibo['comments'] = [{'user': c['user']['screen_name'], 'text': c['text'], 'like_count': c['like_count']}
+                             for c in make_comments(weibo['id'], weibo['comments_count'], config.seed)]
+        yield weibo
+
+class MockWeiboHandler(BaseHTTPRequestHandler):
+    # 支持长连接，与真实服务器一样可以复用连接池
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，不关 Nagle 算法时长连接上每个响应都会多等一个延迟确认
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if parts.path == '/_stats':
+            return self._send(200, server.stats_snapshot(), record=False)
+
+        if config.latency or config.jitter:
+            time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+        if not server.take_token():
+            return self._send(418, {'ok': 0, 'msg': '请求过于频繁'}, {'Retry-After': str(config.retry_after)})
+        if config.error_rate and random.random() < config.error_rate:
+            return self._send(500, {'ok': 0, 'msg': '服务器内部错误'})
+
+        handler = ROUTES.get(parts.path)
+        if handler is None:
+            return self._send(404, {'ok': 0, 'msg': 'not found'})
+        try:
+            body = handler(query, config)
+        except (KeyError, ValueError):
+            body = {'ok': 0, 'msg': '参数错误'}
+        self._send(200, body)
+
+    def _send(self, status, body, headers=None, record=True):
+        content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+        if record:
+            self.server.record(urlsplit(self.path).path, status, len(content))
+
+def handle_profile(query, config):
+    return {'ok': 1, 'data': {'user': make_user(int(query['uid']), config.seed)}}
+
+# mymblog 和 user_timeline 返回相同的数据；不带 page 时返回第一页
+def handle_statuses(query, config):
+    uid = int(query['uid'])
+    page = int(query.get('page', 1))
+    count = int(query.get('count', 20))
+    start = (page - 1) * count
+    end = min(start + count, config.posts_per_user)
+    return {'ok': 1, 'data': {
+        'list': [make_weibo(uid, index, config) for index in range(start, end)],
+        'total': config.posts_per_user,
+    }}
+
+# 评论按 max_id 翻页：max_id 是下一页起始位置，0 表示没有更多
+def handle_comments(query, config):
+    weibo_id = int(query['id'])
+    count = int(query.get('count', 10))
+    start = int(query.get('max_id', 0))
+    total = comment_count(weibo_id, config)
+    comments = make_comments(weibo_id, total, config.seed)[start:start + count]
+    next_id = start + count if start + count < total else 0
+    return {'ok': 1, 'data': comments, 'max_id': next_id, 'total_number': total}
+
+def handle_friends(query, config):
+    uid = int(query['uid'])
+    page = int(query.get('page', 1))
+    count = int(query.get('count', 20))
+    friend_ids = make_friend_ids(uid, config)[(page - 1) * count:page * count]
+    return {'ok': 1, 'users': [{'id': friend_id, 'screen_name': f'用户{friend_id}'} for friend_id in friend_ids]}
+
+ROUTES = {
+    '/ajax/profile/info': handle_profile,
+    '/ajax/statuses/mymblog': handle_statuses,
+    '/ajax/statuses/user_timeline': handle_statuses,
+    '/ajax/statuses/buildComments': handle_comments,
+    '/ajax/friendships/friends': handle_friends,
+}
+
+class MockWeiboServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, config=None):
+        super().__init__((host, port), MockWeiboHandler)
+        self.config = config or MockConfig()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes': 0, 'paths': {}, 'statuses': {}}
+        self.tokens = self.config.rate_limit
+        self.updated = time.monotonic()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    # 全局令牌桶，容量为一秒的请求数
+    def take_token(self):
+        if not self.config.rate_limit:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.config.rate_limit, self.tokens + (now - self.updated) * self.config.rate_limit)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    # 客户端提前断开连接（爬虫结束时关闭连接池）是正常情况，不打印异常
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    def record(self, path, status, nbytes):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += nbytes
+            self.stats['paths'][path] = self.stats['paths'].get(path, 0) + 1
+            self.stats['statuses'][str(status)] = self.stats['statuses'].get(str(status), 0) + 1
+
+    def stats_snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    # 在后台线程运行，返回接口地址
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name='mock-weibo', daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟微博接口服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--posts-per-user', type=int, default=60, help='每个用户的微博数')
+    parser.add_argument('--comments-per-post', type=int, default=5, help='每条微博最多的评论数')
+    parser.add_argument('--friends-per-user', type=int, default=40, help='每个用户的关注数')
+    parser.add_argument('--user-space', type=int, default=100000, help='关注列表中用户ID的取值范围')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个响应的延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟的随机波动（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回 500 的概率')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='全局限速（次/秒），超过时返回 418，0 表示不限')
+    parser.add_argument('--retry-after', type=int, default=1, help='限流响应的 Retry-After 秒数')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子')
+    args = parser.parse_args()
+
+    config = MockConfig(args.posts_per_user, args.comments_per_post, args.friends_per_user, args.user_space,
+                        args.latency, args.jitter, args.error_rate, args.rate_limit, args.retry_after, args.seed)
+    server = MockWeiboServer(args.host, args.port, config)
+    print(f"模拟微博接口已启动: {server.base_url}（统计信息: {server.base_url}/_stats）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("已停止")
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
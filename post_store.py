@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from crawl_state import weibo_id_of
+from text_clean import clean_texts
+
+# 带索引的本地帖子库（SQLite）：按发布时间、用户、微博 id 建索引，正文建 FTS5 全文索引
+# 分析时按时间范围、用户和关键词在库里筛选，只读出需要的微博，不必每次重新解析整个JSONL
+
+# 微博时间格式: Wed Dec 03 10:00:00 +0800 2025，时区固定为东八区
+CREATED_AT_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+CHINA_TZ = timezone(timedelta(hours=8))
+STORE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+# 时间、用户条件筛出的行数少于这个数时不用全文索引，直接逐条核对关键词
+NARROW_ROWS = 20000
+
+def is_store_path(path):
+    return str(path).lower().endswith(STORE_SUFFIXES)
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+MONTHS = {name: index for index, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+_timezones = {}
+
+def _timezone(offset):
+    tz = _timezones.get(offset)
+    if tz is None:
+        minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+        tz = _timezones[offset] = timezone(timedelta(minutes=-minutes if offset[0] == '-' else minutes))
+    return tz
+
+# 发布时间存为 Unix 秒，范围查询直接走索引；固定格式直接切片解析，格式不符时退回 strptime
+def _epoch(created_at):
+    try:
+        if len(created_at) == 30 and created_at[4:7] in MONTHS:
+            return int(datetime(int(created_at[26:]), MONTHS[created_at[4:7]], int(created_at[8:10]),
+                                int(created_at[11:13]), int(created_at[14:16]), int(created_at[17:19]),
+                                tzinfo=_timezone(created_at[20:25])).timestamp())
+        return int(datetime.strptime(created_at, CREATED_AT_FORMAT).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+# 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'（东八区）转成 Unix 秒
+def parse_time(value):
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(value, fmt).replace(tzinfo=CHINA_TZ).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"无法识别的时间: {value}，应为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS")
+
+# 命令行的时间筛选转成 (起, 止) 秒数，止为开区间；days 表示最近多少天，优先于 since
+def time_range(since=None, until=None, days=None):
+    start = parse_time(since) if since else None
+    end = parse_time(until) if until else None
+    if days:
+        start = int(time.time() - days * 86400)
+    return start, end
+
+# 中文没有空格分词，FTS5 自带的分词器会把整句当成一个词，trigram 分词器又查不了两个字的词（如"搭子"）
+# 所以索引时每个字符单独作为一个词，查询时把关键词写成短语（相邻字符依次出现），等价于子串查找；
+# unicode61 会忽略标点并把英文转成小写，再用 instr 在原文上精确核对一遍，结果与分析器的子串匹配一致
+def fts_tokens(text):
+    return ' '.join(text)
+
+def fts_phrase(keyword):
+    chars = [ch for ch in keyword if ch.isalnum()]
+    if not chars:
+        return None
+    return '"' + ' '.join(chars) + '"'
+
+class PostStore:
+    def __init__(self, path):
+        self.path = path
+        self.pending = []
+        self.written = 0
+        self.duplicates = 0
+        # 分片模式下多个进程写同一个库，WAL 模式下读写互不阻塞，写锁最多等 timeout 秒
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY,
+            mblogid TEXT,
+            uid INTEGER,
+            screen_name TEXT,
+            created_at INTEGER,
+            text TEXT,
+            reposts_count INTEGER,
+            comments_count INTEGER,
+            attitudes_count INTEGER,
+            retweeted_id INTEGER)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS posts_created_at ON posts (created_at)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS posts_uid ON posts (uid, created_at)')
+        # 只存索引不存内容（content=''），正文已经在 posts 表里
+        self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(text, content='')")
+        self.db.commit()
+
+    # 攒到缓冲区，主输出刷新时一起提交
+    def add(self, weibo):
+        self.pending.append(weibo)
+
+    # 主输出每次刷新后提交一次，库里的微博与已落盘的JSONL保持同步
+    def bind_writer(self, writer):
+        writer.add_record_listener(self.add)
+        writer.add_listener(lambda offset: self.commit())
+
+    # 一批微博一个事务：先查出库里已有的 id，新微博用 executemany 一次写入正文表和全文索引
+    # 同一条微博只保留第一次写入的版本，续爬、重复运行时重复写入不会产生多行
+    def commit(self):
+        if not self.pending:
+            return
+        weibos = {}
+        for weibo in self.pending:
+            weibo_id = weibo_id_of(weibo)
+            if weibo_id is not None and weibo_id not in weibos:
+                weibos[weibo_id] = weibo
+        self.duplicates += len(self.pending) - len(weibos)
+        self.pending = []
+        # 先拿写锁再查重，其他分片进程不会在查重和写入之间插入同一条微博
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            ids = list(weibos)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                for (weibo_id,) in self.db.execute(f"SELECT id FROM posts WHERE id IN ({','.join('?' * len(chunk))})",
+                                                    chunk):
+                    del weibos[weibo_id]
+                    self.duplicates += 1
+            # 正文与分析器一样：优先 text_raw，去标签、去链接，批量清洗
+            texts = clean_texts([weibo.get('text_raw', weibo.get('text', '')) for weibo in weibos.values()],
+                                strip_urls=True, collapse_space=False)
+            rows = []
+            for (weibo_id, weibo), text in zip(weibos.items(), texts):
+                user = weibo.get('user') or {}
+                retweeted = weibo.get('retweeted_status') or {}
+                rows.append((weibo_id, weibo.get('mblogid'), _int(user.get('id')), user.get('screen_name'),
+                             _epoch(weibo.get('created_at')), text, _int(weibo.get('reposts_count')),
+                             _int(weibo.get('comments_count')), _int(weibo.get('attitudes_count')),
+                             _int(retweeted.get('id'))))
+            # 按 id 升序写入：主键B树和全文索引都是顺序追加，比按时间线倒序写入快好几倍
+            rows.sort()
+            self.db.executemany('INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self.db.executemany('INSERT INTO posts_fts (rowid, text) VALUES (?, ?)',
+                                [(row[0], fts_tokens(row[5])) for row in rows if row[5]])
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        self.written += len(rows)
+
+    # 组装筛选条件：since/until 为 Unix 秒（左闭右开），uids 为用户 id 列表，match 中任意一个关键词出现即命中
+    def _where(self, since=None, until=None, uids=None, match=None):
+        clauses = ['created_at IS NOT NULL']
+        params = []
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(until)
+        if uids:
+            uids = [int(uid) for uid in uids]
+            clauses.append(f"uid IN ({','.join('?' * len(uids))})")
+            params.extend(uids)
+        if match:
+            phrases = [fts_phrase(keyword) for keyword in match]
+            # 全部关键词都能转成短语时先用全文索引缩小范围，否则只靠 instr 逐条核对；
+            # 时间、用户条件已经把范围缩得很小时（如最近几天），常见词的全文索引结果反而更多，直接逐条核对更快
+            if all(phrases) and not self._narrow(' AND '.join(clauses), params):
+                clauses.append('id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?)')
+                params.append(' OR '.join(phrases))
+            clauses.append('(' + ' OR '.join(['instr(text, ?) > 0'] * len(match)) + ')')
+            params.extend(match)
+        return ' AND '.join(clauses), params
+
+    # 用时间、用户索引数一下符合条件的行数，最多数到 limit，不会因为范围大而变慢
+    def _narrow(self, where, params, limit=NARROW_ROWS):
+        if len(params) == 0:
+            return False
+        sql = f'SELECT COUNT(*) FROM (SELECT 1 FROM posts WHERE {where} LIMIT {limit})'
+        return self.db.execute(sql, params).fetchone()[0] < limit
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        return self.db.execute(f'SELECT COUNT(*) FROM posts WHERE {where}', params).fetchone()[0]
+
+    # 按块读取符合条件的微博，每块是 columns 各列组成的元组列表，内存占用只与 chunk_size 有关
+    def iter_rows(self, columns=('id', 'created_at', 'text'), chunk_size=100000, order=None, limit=None, **filters):
+        where, params = self._where(**filters)
+        sql = f"SELECT {', '.join(columns)} FROM posts WHERE {where}"
+        if order:
+            sql += f' ORDER BY {order}'
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        cursor = self.db.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    def summary(self):
+        return f"帖子库 {self.path}：新增 {self.written} 条，重复跳过 {self.duplicates} 条"
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# 把已有的JSONL（支持 .gz/.zst 和分段输出清单）导入帖子库
+def import_jsonl(jsonl_path, store_path, batch_size=5000):
+    from compressed_io import open_binary
+    from rotating_output import input_files
+    print(f"正在导入 {jsonl_path} -> {store_path} ...")
+    with PostStore(store_path) as store:
+        for part in input_files(jsonl_path):
+            with open_binary(part) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        store.add(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+                    if len(store.pending) >= batch_size:
+                        store.commit()
+    print(store.summary())
+    return store.written
+
+def format_time(epoch):
+    return datetime.fromtimestamp(epoch, CHINA_TZ).strftime('%Y-%m-%d %H:%M:%S')
+
+def main():
+    parser = argparse.ArgumentParser(description='带索引的微博帖子库：导入JSONL，按时间、用户、关键词快速查询')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    importer = subparsers.add_parser('import', help='把JSONL微博文件导入帖子库')
+    importer.add_argument('inputs', nargs='+', help='JSONL文件（支持 .gz/.zst 和分段输出清单）')
+    importer.add_argument('store', help='帖子库文件（.db）')
+    query = subparsers.add_parser('query', help='查询帖子库')
+    query.add_argument('store', help='帖子库文件（.db）')
+    query.add_argument('--keyword', action='append', help='关键词，可重复指定，任意一个出现即命中', default=None)
+    query.add_argument('--uid', action='append', help='用户ID，可重复指定', default=None)
+    query.add_argument('--since', help='起始时间（含），YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS', default=None)
+    query.add_argument('--until', help='结束时间（不含）', default=None)
+    query.add_argument('--days', type=float, help='最近多少天，优先于 --since', default=None)
+    query.add_argument('--count', action='store_true', help='只输出条数')
+    query.add_argument('--limit', type=int, help='最多输出多少条，按时间从新到旧', default=20)
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        for path in args.inputs:
+            import_jsonl(path, args.store)
+        return
+
+    if not os.path.exists(args.store):
+        print(f"错误: 帖子库 {args.store} 不存在")
+        return
+    since, until = time_range(args.since, args.until, args.days)
+    filters = {'since': since, 'until': until, 'uids': args.uid, 'match': args.keyword}
+    start = time.perf_counter()
+    with PostStore(args.store) as store:
+        if args.count:
+            print(f"共 {store.count(**filters)} 条微博（{(time.perf_counter() - start) * 1000:.1f} ms）")
+            return
+        for rows in store.iter_rows(('id', 'screen_name', 'created_at', 'text'), order='created_at DESC',
+                                    limit=args.limit, **filters):
+            for weibo_id, screen_name, created_at, text in rows:
+                print(f"[{format_time(created_at)}] {screen_name} ({weibo_id}): {text}")
+    print(f"查询耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
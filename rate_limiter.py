@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 爬虫日志的子记录器，级别随 configure_logging 设置；退避属于失败，用 WARNING 级别
+logger = logging.getLogger('weibo_crawler.rate_limiter')
+
+# 接口族：按URL路径归类，同一族共用一个令牌桶
+ENDPOINT_FAMILIES = {
+    '/ajax/profile/info': 'profile',
+    '/ajax/statuses/mymblog': 'statuses',
+    '/ajax/statuses/user_timeline': 'statuses',
+    '/ajax/statuses/buildComments': 'comments',
+    '/ajax/friendships/friends': 'friends',
+}
+
+# 每个接口族的默认速率（次/秒）、突发容量和自适应提速上限
+DEFAULT_LIMITS = {
+    'profile': {'rate': 1.0, 'burst': 2, 'max_rate': 4.0},
+    'statuses': {'rate': 1.0, 'burst': 2, 'max_rate': 4.0},
+    'comments': {'rate': 2.0, 'burst': 4, 'max_rate': 8.0},
+    'friends': {'rate': 0.5, 'burst': 1, 'max_rate': 2.0},
+    'default': {'rate': 1.0, 'burst': 1, 'max_rate': 2.0},
+}
+
+# 触发退避的状态码（None 表示网络异常）
+BACKOFF_STATUSES = {418, 429}
+
+def endpoint_family(url):
+    path = urlsplit(url).path
+    return ENDPOINT_FAMILIES.get(path, 'default')
+
+def load_rate_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # 预定一个令牌，返回调用方需要等待的秒数；令牌可以透支，这样并发的等待者会被依次排开
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def set_rate(self, rate):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    # 在一段时间内暂停发放令牌（退避）
+    def pause(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class RateLimiter:
+    def __init__(self, limits=None, decrease_factor=0.5, increase_step=0.25, speedup_after=20,
+                 base_backoff=2.0, max_backoff=120.0):
+        config = {family: dict(values) for family, values in DEFAULT_LIMITS.items()}
+        for family, values in (limits or {}).items():
+            config.setdefault(family, dict(DEFAULT_LIMITS['default'])).update(values)
+
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.speedup_after = speedup_after
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+        self.buckets = {}
+        self.state = {}
+        for family, values in config.items():
+            self.buckets[family] = TokenBucket(values['rate'], values['burst'])
+            self.state[family] = {
+                'min_rate': values.get('min_rate', values['rate'] / 8),
+                'max_rate': max(values.get('max_rate', values['rate']), values['rate']),
+                'failures': 0,
+                'successes': 0,
+            }
+
+    def _bucket(self, url):
+        family = endpoint_family(url)
+        if family not in self.buckets:
+            family = 'default'
+        return family, self.buckets[family]
+
+    # 请求前调用，阻塞直到该接口族允许发送
+    def wait(self, url):
+        family, bucket = self._bucket(url)
+        delay = bucket.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    # async 引擎使用的等待版本
+    async def async_wait(self, url):
+        family, bucket = self._bucket(url)
+        delay = bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # 请求后调用，根据状态码调整速率：失败时乘性降速并带抖动退避，连续成功（2xx/3xx）后加性提速
+    # 其他 4xx（403 cookie 失效或被封、404 等）既不算失败也不算成功，不重置失败计数，也不会让速率升高
+    def record(self, url, status, retry_after=None):
+        family, bucket = self._bucket(url)
+        state = self.state[family]
+        with self.lock:
+            if status is None or status in BACKOFF_STATUSES or status >= 500:
+                state['failures'] += 1
+                state['successes'] = 0
+                rate = max(state['min_rate'], bucket.rate * self.decrease_factor)
+                bucket.set_rate(rate)
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (state['failures'] - 1))
+                delay = random.uniform(delay / 2, delay)
+                if retry_after:
+                    delay = max(delay, retry_after)
+                bucket.pause(delay)
+                logger.warning("[限速] %s 接口返回 %s，速率降至 %.2f/s，暂停 %.1fs", family, status, rate, delay)
+            elif 200 <= status < 400:
+                state['failures'] = 0
+                state['successes'] += 1
+                if state['successes'] >= self.speedup_after and bucket.rate < state['max_rate']:
+                    bucket.set_rate(min(state['max_rate'], bucket.rate + self.increase_step))
+                    state['successes'] = 0
+
+    # 各接口族当前速率，便于打印进度
+    def rates(self):
+        return {family: round(bucket.rate, 3) for family, bucket in self.buckets.items()}
+
+# 解析 Retry-After 响应头（只支持秒数形式）
+def parse_retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,162 @@
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from rate_limiter import endpoint_family
+
+# 各接口族的缓存有效期（秒）：用户资料变化慢，微博列表和评论更新较快
+DEFAULT_TTLS = {
+    'profile': 7 * 86400,
+    'statuses': 3600,
+    'comments': 6 * 3600,
+    'friends': 86400,
+    'default': 3600,
+}
+
+# 回放模式下缓存里没有的请求
+class CacheMiss(Exception):
+    pass
+
+# 从缓存取出的响应，提供爬虫用到的 requests.Response 属性
+class CachedResponse:
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+# 规范化URL作为缓存键：主机名小写、查询参数排序、去掉锚点
+def normalize_url(url):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+# 只缓存成功的响应：HTTP 200 且接口返回 ok == 1，避免把限流页、登录失效等结果缓存下来
+def is_cacheable(status, content):
+    if status != 200:
+        return False
+    try:
+        return json.loads(content).get('ok') == 1
+    except (ValueError, AttributeError):
+        return False
+
+# 基于SQLite的HTTP响应缓存，按接口族设置有效期，总大小超过上限时淘汰最久未访问的条目
+# replay=True 时只从缓存读取：忽略有效期，缓存没有的请求抛出 CacheMiss，不访问网络
+class ResponseCache:
+    def __init__(self, path, ttls=None, max_bytes=512 * 1024 * 1024, replay=False):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        # 评论线程池会在多个线程里使用同一个连接，访问都在锁内
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            family TEXT,
+            status INTEGER,
+            headers TEXT,
+            body BLOB,
+            size INTEGER,
+            stored_at REAL,
+            accessed_at REAL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        # 缓存总大小单独存一行，分片进程共用一个缓存文件时在写事务里读改这一行，各进程看到的总大小一致
+        self.db.execute('CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER)')
+        self.db.execute('INSERT OR IGNORE INTO cache_size SELECT 0, COALESCE(SUM(size), 0) FROM responses')
+        self.db.commit()
+        self.size = self._total()
+
+    def _total(self):
+        return self.db.execute('SELECT bytes FROM cache_size').fetchone()[0]
+
+    def ttl(self, family):
+        return self.ttls.get(family, self.ttls['default'])
+
+    # 命中时返回 CachedResponse，未命中或已过期返回 None（回放模式下抛出 CacheMiss）
+    def get(self, url):
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            row = self.db.execute('SELECT family, status, headers, body, stored_at FROM responses WHERE key = ?',
+                                  (key,)).fetchone()
+            if row is not None and (self.replay or now - row[4] <= self.ttl(row[0])):
+                self.db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+                # 立即提交，避免未提交的事务长时间占着写锁，挡住其他分片进程
+                self.db.commit()
+                self.stats['hits'] += 1
+                return CachedResponse(url, row[1], json.loads(row[2]), row[3])
+            self.stats['misses'] += 1
+        if self.replay:
+            raise CacheMiss(f"回放模式下缓存中没有: {url}")
+        return None
+
+    def put(self, url, status, headers, content):
+        if self.replay or not is_cacheable(status, content):
+            return
+        key = normalize_url(url)
+        now = time.time()
+        headers = json.dumps({'Content-Type': headers.get('Content-Type', 'application/json')})
+        with self.lock:
+            # 先拿写锁再读总大小，其他进程在此期间的写入和淘汰都已计入
+            self.db.execute('BEGIN IMMEDIATE')
+            try:
+                old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+                self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                (key, endpoint_family(url), status, headers, content, len(content), now, now))
+                self.db.execute('UPDATE cache_size SET bytes = bytes + ?', (len(content) - (old[0] if old else 0),))
+                self.size = self._total()
+                self.stats['stores'] += 1
+                if self.size > self.max_bytes:
+                    self._evict()
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+
+    # 按最近访问时间从旧到新删除，直到总大小降到上限的90%以下；在 put 的写事务内调用
+    def _evict(self):
+        target = self.max_bytes * 0.9
+        evicted = []
+        for key, size in self.db.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self.db.executemany('DELETE FROM responses WHERE key = ?', evicted)
+        self.db.execute('UPDATE cache_size SET bytes = ?', (self.size,))
+        self.stats['evictions'] += len(evicted)
+
+    def summary(self):
+        total = self.stats['hits'] + self.stats['misses']
+        rate = self.stats['hits'] / total * 100 if total else 0
+        with self.lock:
+            self.size = self._total()
+        return (f"响应缓存：命中 {self.stats['hits']} 次，未命中 {self.stats['misses']} 次（命中率 {rate:.1f}%），"
+                f"新增 {self.stats['stores']} 条，淘汰 {self.stats['evictions']} 条，"
+                f"占用 {self.size / 1024 / 1024:.1f} MB")
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
+
+# 有效期配置文件：{"statuses": 600, "comments": 3600}
+def load_cache_ttls(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {family: float(ttl) for family, ttl in json.load(f).items()}
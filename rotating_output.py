@@ -0,0 +1,394 @@
+import glob
+import json
+import os
+import re
+import time
+
+from compressed_io import SUFFIXES, compress_stream, iter_complete_lines
+
+# 分段压缩输出：按大小或条数切换到新的分段文件（all_weibos.00000.txt.zst、all_weibos.00001.txt.zst ...），
+# 每个分段封存后登记到清单 all_weibos.manifest.json；可选的字段投影去掉分析用不到的字段，
+# 用户资料只在 all_weibos.users.txt.zst 中保存一次，微博里只留 id 和昵称
+# tell() 返回跨分段连续的逻辑字节偏移（未压缩），进度日志和续爬照常使用
+
+# 分析、导出、帖子库和列式存储用到的字段
+PROJECTIONS = {
+    'analysis': ('id', 'mblogid', 'created_at', 'text', 'text_raw', 'reposts_count', 'comments_count',
+                 'attitudes_count', 'comments', 'retweeted_status', 'user'),
+}
+
+# all_weibos.txt -> all_weibos.manifest.json
+def manifest_path(output):
+    root, _ = os.path.splitext(output)
+    return root + '.manifest.json'
+
+def is_manifest(path):
+    return str(path).endswith('.manifest.json')
+
+# all_weibos.txt -> all_weibos.00003.txt.zst
+def part_path(output, index, compression=None):
+    root, ext = os.path.splitext(output)
+    return f"{root}.{index:05d}{ext}{SUFFIXES[compression]}"
+
+# all_weibos.txt -> all_weibos.users.txt.zst
+def users_path(output, compression=None):
+    root, ext = os.path.splitext(output)
+    return f"{root}.users{ext}{SUFFIXES[compression]}"
+
+# 磁盘上已有的分段 {序号: 路径}，包括崩溃时还没封存、清单里没有的分段
+def existing_parts(output, compression=None):
+    root, ext = os.path.splitext(output)
+    suffix = SUFFIXES[compression]
+    pattern = re.compile(re.escape(os.path.basename(root)) + r'\.(\d{5})' + re.escape(ext + suffix) + '$')
+    parts = {}
+    for path in glob.glob(glob.escape(root) + '.[0-9][0-9][0-9][0-9][0-9]' + glob.escape(ext + suffix)):
+        match = pattern.match(os.path.basename(path))
+        if match:
+            parts[int(match.group(1))] = path
+    return parts
+
+def load_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(path, manifest):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+# 清单中的文件名相对清单所在目录
+def manifest_parts(path):
+    base = os.path.dirname(path)
+    return [os.path.join(base, part['path']) for part in load_manifest(path)['parts']]
+
+# 输入路径展开为实际的数据文件：清单展开为各分段，其他原样返回
+def input_files(path):
+    return manifest_parts(path) if is_manifest(path) else [path]
+
+# 把 'analysis' 或逗号分隔的字段列表解析为投影，None 表示保留全部字段
+def parse_projection(spec):
+    if not spec:
+        return None
+    if spec in PROJECTIONS:
+        return Projection(PROJECTIONS[spec], spec)
+    return Projection([field.strip() for field in spec.split(',') if field.strip()], spec)
+
+class Projection:
+    def __init__(self, fields, name=None):
+        self.fields = tuple(fields)
+        self.name = name
+
+    # 返回只含投影字段的新字典，不修改原微博；user 换成 {id, screen_name}，完整资料交给 users；转发原文同样投影
+    def apply(self, weibo, users=None):
+        projected = {field: weibo[field] for field in self.fields if field in weibo}
+        user = projected.get('user')
+        if isinstance(user, dict):
+            if users is not None:
+                users.add(user)
+            projected['user'] = {'id': user.get('id'), 'screen_name': user.get('screen_name')}
+        retweeted = projected.get('retweeted_status')
+        if isinstance(retweeted, dict) and len(retweeted) > 1:
+            projected['retweeted_status'] = self.apply(retweeted, users)
+        return projected
+
+# 一个正在写入的文件：raw 是磁盘文件，f 是其上的压缩层（不压缩时就是 raw 本身）
+class _OpenFile:
+    def __init__(self, path, compression=None, level=None, append=False):
+        self.path = path
+        self.raw = open(path, 'ab' if append else 'wb')
+        self.f = compress_stream(self.raw, compression, level)
+
+    def write(self, data):
+        self.f.write(data)
+
+    def flush(self, fsync=False):
+        self.f.flush()
+        self.raw.flush()
+        if fsync:
+            os.fsync(self.raw.fileno())
+
+    def close(self, fsync=True):
+        # 关闭压缩层会写出压缩流的结尾，raw 随后刷新、落盘、关闭
+        if self.f is not self.raw:
+            self.f.close()
+        self.raw.flush()
+        if fsync:
+            os.fsync(self.raw.fileno())
+        self.raw.close()
+
+# 用户资料侧表：每个用户只写一次，随主输出一起刷新
+class UserTable:
+    def __init__(self, path, compression=None, level=None):
+        self.path = path
+        self.compression = compression
+        self.level = level
+        self.seen = set()
+        self.buffer = []
+        self.file = None
+
+    # append 为 True 时读出已有的用户，把完整的行重写一遍（去掉崩溃时写了一半的尾部）后继续追加
+    def open(self, append=False):
+        if append and os.path.exists(self.path):
+            recovered = _OpenFile(self.path + '.tmp', self.compression, self.level)
+            for line in iter_complete_lines(self.path):
+                try:
+                    self.seen.add(json.loads(line).get('id'))
+                except ValueError:
+                    continue
+                recovered.write(line)
+            recovered.close()
+            os.replace(self.path + '.tmp', self.path)
+        self.file = _OpenFile(self.path, self.compression, self.level, append=append)
+        return self
+
+    def add(self, user):
+        uid = user.get('id')
+        if uid is None or uid in self.seen:
+            return
+        self.seen.add(uid)
+        self.buffer.append((json.dumps(user, ensure_ascii=False) + '\n').encode('utf-8'))
+
+    def flush(self, fsync=False):
+        if self.buffer:
+            self.file.write(b''.join(self.buffer))
+            self.buffer.clear()
+        self.file.flush(fsync)
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# 与 JsonlWriter 接口相同（write/flush/tell/close、刷新和记录监听者），输出写入分段文件
+# max_bytes / max_records 为单个分段的未压缩字节数和条数上限，达到任意一个就封存当前分段、开始下一个
+class RotatingJsonlWriter:
+    def __init__(self, output, compression=None, max_bytes=None, max_records=None, projection=None,
+                 batch_size=200, fsync_interval=30.0, level=None):
+        self.output = output
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+        self.projection = projection
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.level = level
+        self.manifest_file = manifest_path(output)
+        self.users = UserTable(users_path(output, compression), compression, level) if projection else None
+        self.parts = []
+        self.position = 0
+        self.count = 0
+        self.buffer = []
+        self.listeners = []
+        self.record_listeners = []
+        self.last_fsync = time.monotonic()
+        self.file = None
+        self.part_index = 0
+        self.part_offset = 0
+        self.part_bytes = 0
+        self.part_records = 0
+
+    # 与 run_crawl 打开单个输出文件的三种方式对应：
+    # 默认从头写（删掉上次的分段和清单）；append 接在已有分段之后（增量模式）；
+    # resume 时按进度日志记录的偏移恢复：保留偏移之前的分段，偏移所在的分段只保留偏移之前的内容，之后的全部删掉
+    def open(self, append=False, resume=False, offset=None):
+        if resume and offset is None:
+            # 日志里还没有写完的页，输出也应从头开始
+            resume = False
+        on_disk = existing_parts(self.output, self.compression)
+        if append or resume:
+            if os.path.exists(self.manifest_file):
+                self.parts = load_manifest(self.manifest_file)['parts']
+        else:
+            for path in on_disk.values():
+                os.remove(path)
+            on_disk = {}
+        if resume:
+            self._recover(offset, on_disk)
+        else:
+            self.position = self.part_offset = sum(part['bytes'] for part in self.parts)
+            # 增量模式下跳过崩溃残留的未封存分段的序号，不覆盖它们
+            self.part_index = max([part['index'] + 1 for part in self.parts] + [index + 1 for index in on_disk],
+                                  default=0)
+        if self.users is not None:
+            self.users.open(append=append or resume)
+        self._save_manifest(complete=False)
+        return self
+
+    # 找到第一个越过 offset 的分段，把其中 offset 之前的行重写为新的当前分段，之后的分段（含未封存的）全部删除
+    def _recover(self, offset, on_disk):
+        kept = []
+        position = 0
+        for part in self.parts:
+            if position + part['bytes'] > offset:
+                break
+            kept.append(part)
+            position += part['bytes']
+        last_kept = kept[-1]['index'] if kept else -1
+        candidates = sorted(index for index in on_disk if index > last_kept)
+        self.parts = kept
+        self.position = self.part_offset = position
+        if position < offset and candidates:
+            index = candidates[0]
+            path = part_path(self.output, index, self.compression)
+            recovered = _OpenFile(path + '.tmp', self.compression, self.level)
+            for candidate in candidates:
+                for line in iter_complete_lines(on_disk[candidate]):
+                    if self.position + len(line) > offset:
+                        break
+                    recovered.write(line)
+                    self.position += len(line)
+                    self.part_bytes += len(line)
+                    self.part_records += 1
+                if self.position >= offset:
+                    break
+            recovered.close()
+            for candidate in candidates:
+                os.remove(on_disk[candidate])
+            os.replace(path + '.tmp', path)
+            self.part_index = index
+            self.file = _OpenFile(path, self.compression, self.level, append=True)
+        else:
+            for candidate in candidates:
+                os.remove(on_disk[candidate])
+            self.part_index = last_kept + 1
+        if self.position != offset:
+            print(f"警告：分段输出只恢复到 {self.position} 字节，进度日志记录的是 {offset} 字节")
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def add_record_listener(self, callback):
+        self.record_listeners.append(callback)
+
+    # 记录监听者收到投影前的完整微博
+    def write(self, record):
+        for callback in self.record_listeners:
+            callback(record)
+        if self.projection is not None:
+            record = self.projection.apply(record, self.users)
+        try:
+            line = json.dumps(record, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存微博json时出错: {e}")
+            line = json.dumps({"error": str(e), "id": record.get('id', 'unknown')}, ensure_ascii=False)
+        data = (line + '\n').encode('utf-8')
+        self.buffer.append(data)
+        self.position += len(data)
+        self.part_bytes += len(data)
+        self.part_records += 1
+        self.count += 1
+        if len(self.buffer) >= self.batch_size or self._full():
+            self.flush()
+
+    def _full(self):
+        return ((self.max_bytes is not None and self.part_bytes >= self.max_bytes) or
+                (self.max_records is not None and self.part_records >= self.max_records))
+
+    # 先刷新用户侧表再写主输出，落盘的微博总能在侧表里找到它的用户
+    def flush(self):
+        fsync = self.fsync_interval is not None and time.monotonic() - self.last_fsync >= self.fsync_interval
+        if self.users is not None:
+            self.users.flush(fsync)
+        if self.buffer:
+            if self.file is None:
+                self.file = _OpenFile(part_path(self.output, self.part_index, self.compression),
+                                      self.compression, self.level)
+            self.file.write(b''.join(self.buffer))
+            self.buffer.clear()
+        if self.file is not None:
+            self.file.flush(fsync)
+            if self._full():
+                self._seal()
+        if fsync:
+            self.last_fsync = time.monotonic()
+        for callback in self.listeners:
+            callback(self.position)
+
+    # 关闭当前分段并登记到清单
+    def _seal(self):
+        self.file.close(fsync=self.fsync_interval is not None)
+        self.parts.append({
+            'index': self.part_index,
+            'path': os.path.basename(self.file.path),
+            'offset': self.part_offset,
+            'records': self.part_records,
+            'bytes': self.part_bytes,
+            'compressed_bytes': os.path.getsize(self.file.path),
+        })
+        self.file = None
+        self.part_index += 1
+        self.part_offset = self.position
+        self.part_bytes = 0
+        self.part_records = 0
+        self._save_manifest(complete=False)
+
+    def _save_manifest(self, complete):
+        save_manifest(self.manifest_file, {
+            'format': 'jsonl',
+            'compression': self.compression,
+            'projection': list(self.projection.fields) if self.projection is not None else None,
+            'users': [os.path.basename(self.users.path)] if self.users is not None else [],
+            'records': sum(part['records'] for part in self.parts),
+            'bytes': sum(part['bytes'] for part in self.parts),
+            'compressed_bytes': sum(part['compressed_bytes'] for part in self.parts),
+            'complete': complete,
+            'parts': self.parts,
+        })
+
+    def tell(self):
+        return self.position
+
+    def summary(self):
+        manifest = load_manifest(self.manifest_file)
+        ratio = manifest['bytes'] / manifest['compressed_bytes'] if manifest['compressed_bytes'] else 1.0
+        return (f"分段输出：{len(manifest['parts'])} 个分段，{manifest['records']} 条微博，"
+                f"{manifest['bytes'] / 1024 / 1024:.1f} MB -> {manifest['compressed_bytes'] / 1024 / 1024:.1f} MB"
+                f"（{ratio:.1f} 倍），清单 {self.manifest_file}")
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self._seal()
+        if self.users is not None:
+            self.users.close()
+        self._save_manifest(complete=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+# 合并各工作进程的清单（分段文件都在同一目录，不必移动），按分段路径去重；append 为 True 时接在已有清单之后
+def merge_manifests(paths, output_manifest, append=False):
+    merged = load_manifest(output_manifest) if append and os.path.exists(output_manifest) else None
+    parts = list(merged['parts']) if merged else []
+    users = list(merged['users']) if merged else []
+    known = {part['path'] for part in parts}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        manifest = load_manifest(path)
+        if merged is None:
+            merged = manifest
+        for part in manifest['parts']:
+            if part['path'] not in known:
+                known.add(part['path'])
+                parts.append(part)
+        users.extend(user for user in manifest['users'] if user not in users)
+    if merged is None:
+        return 0
+    offset = 0
+    for part in parts:
+        part['offset'] = offset
+        offset += part['bytes']
+    merged.update({
+        'users': users,
+        'records': sum(part['records'] for part in parts),
+        'bytes': offset,
+        'compressed_bytes': sum(part['compressed_bytes'] for part in parts),
+        'complete': True,
+        'parts': parts,
+    })
+    save_manifest(output_manifest, merged)
+    print(f"清单合并完成：{len(parts)} 个分段，{merged['records']} 条微博，写入 {output_manifest}")
+    return merged['records']
@@ -0,0 +1,158 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+
+from crawl_state import CrawlState
+from dedup_index import merge_retweet_stores, merge_seen_indexes
+from rotating_output import manifest_path, merge_manifests
+from weibo_crawler import append_output, output_source, rotating_output, run_crawl
+
+# 用户ID所属分片；用 md5 而不是 hash()，保证不同进程、不同次运行结果一致
+def shard_of(user_id, shards):
+    digest = hashlib.md5(str(user_id).encode('utf-8')).hexdigest()
+    return int(digest, 16) % shards
+
+def split_user_ids(user_ids, shards):
+    parts = [[] for _ in range(shards)]
+    for user_id in user_ids:
+        parts[shard_of(user_id, shards)].append(user_id)
+    return parts
+
+# cookie池文件：每行一个cookie，忽略空行和注释行
+def load_cookie_pool(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        cookies = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    print(f"cookie池中共有 {len(cookies)} 个cookie")
+    return cookies
+
+# all_weibos.txt -> all_weibos.shard0.txt
+def shard_path(path, index):
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{index}{ext}"
+
+def _run_shard(user_ids, cookie, args, state_seed, dedup_seed, retweet_seed):
+    # 各进程的输出分别写入自己的日志，避免在终端交错
+    with open(args.output + '.log', 'a', encoding='utf-8', buffering=1) as log, contextlib.redirect_stdout(log):
+        try:
+            run_crawl(user_ids, cookie, args, state_seed, dedup_seed, retweet_seed)
+        except KeyboardInterrupt:
+            sys.exit(1)
+
+# 合并各分片输出，按微博 id 去重；append 为 True 时追加到已有文件之后
+def merge_shards(paths, output_file, append=False):
+    seen = set()
+    written = 0
+    duplicates = 0
+    with open(output_file, 'ab' if append else 'wb') as out:
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        weibo_id = json.loads(line).get('id')
+                    except json.JSONDecodeError:
+                        continue
+                    if weibo_id is not None:
+                        if weibo_id in seen:
+                            duplicates += 1
+                            continue
+                        seen.add(weibo_id)
+                    out.write(line)
+                    written += 1
+    print(f"合并完成：写入 {written} 条微博，去除重复 {duplicates} 条")
+    return written
+
+# 把各分片的增量状态合并回总状态文件
+def merge_states(paths, state_file):
+    state = CrawlState(state_file)
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state.pending.update(json.load(f))
+    state.save()
+
+# 协调者：按用户ID哈希切分 user_ids，每个分片一个进程、一个cookie，最后合并去重
+def run_sharded(user_ids, cookies, args):
+    shards = args.shards
+    if len(cookies) < shards:
+        print(f"警告：cookie池只有 {len(cookies)} 个cookie，少于分片数 {shards}，将轮流复用")
+
+    parts = split_user_ids(user_ids, shards)
+    outputs = [shard_path(args.output, i) for i in range(shards)]
+    journals = [shard_path(args.journal, i) for i in range(shards)]
+    states = [shard_path(args.state_file, i) for i in range(shards)]
+    # 去重索引和转发文件同样每个分片一份：分片只读总文件、只写自己的文件，结束后再合并，避免互相覆盖
+    dedup_indexes = [shard_path(args.dedup_index, i) for i in range(shards)] if args.dedup_index else []
+    retweet_stores = [shard_path(args.retweet_store, i) for i in range(shards)] if args.retweet_store else []
+    side_files = dedup_indexes + retweet_stores + [path + '.idx' for path in retweet_stores]
+    if not args.resume:
+        # 不续爬时清掉上次残留的分片文件
+        for path in outputs + journals + states + side_files:
+            if os.path.exists(path):
+                os.remove(path)
+
+    processes = []
+    for index, part in enumerate(parts):
+        print(f"分片 {index}: {len(part)} 个用户，输出 {outputs[index]}")
+        if not part:
+            continue
+        shard_args = argparse.Namespace(**vars(args))
+        shard_args.output = outputs[index]
+        shard_args.journal = journals[index]
+        shard_args.state_file = states[index]
+        if args.dedup_index:
+            shard_args.dedup_index = dedup_indexes[index]
+        if args.retweet_store:
+            shard_args.retweet_store = retweet_stores[index]
+        shard_args.total_limit = math.ceil(args.total_limit / shards)
+        # 响应缓存各分片共用一个文件（--cache），总大小在缓存的写事务里统一计算，上限对所有分片生效
+        # 多个进程同时写同一个接口记忆文件会互相覆盖，分片内只在内存中记忆
+        shard_args.endpoint_memo = None
+        # 各分片的指标分别写入自己的文件
+        if args.metrics_file:
+            shard_args.metrics_file = shard_path(args.metrics_file, index)
+        cookie = cookies[index % len(cookies)] if cookies else None
+        process = multiprocessing.Process(target=_run_shard, name=f'shard-{index}',
+                                          args=(part, cookie, shard_args, args.state_file, args.dedup_index,
+                                                args.retweet_store))
+        process.start()
+        processes.append(process)
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+        print("\n分片爬取已中断，可使用 --resume 继续")
+        sys.exit(1)
+
+    failed = [process.name for process in processes if process.exitcode != 0]
+    if failed:
+        print(f"以下分片未正常结束: {failed}，分片文件已保留，可使用 --resume 继续")
+        sys.exit(1)
+
+    if rotating_output(args):
+        # 分段输出不必复制数据：各分片的分段文件留在原处，合并清单即可；分片按用户划分，不会有重复微博
+        manifests = [manifest_path(path) for path in outputs]
+        merge_manifests(manifests, manifest_path(args.output), append=append_output(args))
+    else:
+        manifests = []
+        merge_shards(outputs, args.output, append=append_output(args))
+    merge_states(states, args.state_file)
+    # 索引在输出合并之后再合并，中断时索引不会领先于输出
+    if args.dedup_index:
+        merge_seen_indexes(dedup_indexes, args.dedup_index)
+    if args.retweet_store:
+        merge_retweet_stores(retweet_stores, args.retweet_store)
+    if not args.keep_shards:
+        for path in outputs + journals + states + manifests + side_files + [path + '.log' for path in outputs]:
+            if os.path.exists(path):
+                os.remove(path)
+    print(f"所有分片已合并到 {output_source(args)}")
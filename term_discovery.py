@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+jieba.setLogLevel(logging.WARNING)
+
+# 至少含一个中文、字母或数字才算词，过滤标点、表情符号和空白
+WORD_PATTERN = re.compile(r'[\u4e00-\u9fffA-Za-z0-9]')
+NUMBER_PATTERN = re.compile(r'^[0-9.%]+$')
+
+# 读取停用词表，每行一个词
+def load_stopwords(path='stopwords.txt'):
+    if not os.path.exists(path):
+        print(f"警告: 停用词文件 {path} 不存在，不过滤停用词")
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+# 对单条文本分词：去掉停用词、单字、纯数字和标点，英文统一小写
+def tokenize_text(text, stopwords):
+    tokens = []
+    for word in jieba.cut(text):
+        word = word.strip().lower()
+        if len(word) < 2 or word in stopwords:
+            continue
+        if not WORD_PATTERN.search(word) or NUMBER_PATTERN.match(word):
+            continue
+        tokens.append(word)
+    return tokens
+
+_worker_stopwords = set()
+
+def _init_worker(stopwords):
+    global _worker_stopwords
+    _worker_stopwords = stopwords
+    jieba.initialize()
+
+def _tokenize_batch(texts):
+    return [tokenize_text(text, _worker_stopwords) for text in texts]
+
+# 分批并行分词，按原顺序逐批产出
+def iter_token_batches(texts, stopwords, workers=None, batch_size=2000):
+    batches = (texts[i:i + batch_size] for i in range(0, len(texts), batch_size))
+    if workers == 1:
+        for batch in batches:
+            yield [tokenize_text(text, stopwords) for text in batch]
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stopwords,)) as executor:
+        yield from executor.map(_tokenize_batch, batches)
+
+# 语料和停用词的摘要，任何一个变了缓存就失效
+def corpus_digest(texts, stopwords):
+    digest = hashlib.md5()
+    digest.update(jieba.__version__.encode('utf-8'))
+    digest.update('\n'.join(sorted(stopwords)).encode('utf-8'))
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+# 读取分词缓存：第一行是摘要，之后每行一条微博的词，以空格分隔；摘要不符时返回 None
+def read_token_cache(path, digest):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline())
+        except json.JSONDecodeError:
+            return None
+        if header.get('digest') != digest:
+            return None
+        return [line.split(' ') if line else [] for line in f.read().split('\n')[:-1]]
+
+# 逐条产出分词结果；有可用缓存时直接读取，否则分词并同时写入缓存
+def iter_tokens(texts, stopwords, cache_path=None, workers=None):
+    digest = corpus_digest(texts, stopwords) if cache_path else None
+    cached = read_token_cache(cache_path, digest)
+    if cached is not None and len(cached) == len(texts):
+        print(f"使用分词缓存 {cache_path}")
+        yield from cached
+        return
+
+    out = None
+    if cache_path:
+        # 先写临时文件，完整写完后再替换，中断时不会留下残缺的缓存
+        out = open(cache_path + '.tmp', 'w', encoding='utf-8')
+        out.write(json.dumps({'digest': digest, 'rows': len(texts)}) + '\n')
+    try:
+        for batch in iter_token_batches(texts, stopwords, workers):
+            if out is not None:
+                out.write(''.join(' '.join(tokens) + '\n' for tokens in batch))
+            yield from batch
+    finally:
+        if out is not None:
+            out.close()
+    if out is not None:
+        os.replace(cache_path + '.tmp', cache_path)
+        print(f"分词结果已缓存至 {cache_path}")
+
+# 由分词结果构建 微博×词 的稀疏词频矩阵，只保留出现在至少 min_df 条微博中的词
+def term_matrix(token_lists, min_df=1):
+    vocab = {}
+    indptr = [0]
+    indices = []
+    counts = []
+    for tokens in token_lists:
+        for word, count in Counter(tokens).items():
+            indices.append(vocab.setdefault(word, len(vocab)))
+            counts.append(count)
+        indptr.append(len(indices))
+    terms = np.empty(len(vocab), dtype=object)
+    for word, index in vocab.items():
+        terms[index] = word
+    matrix = sparse.csr_matrix((np.asarray(counts, dtype=np.float64), np.asarray(indices, dtype=np.int64),
+                                np.asarray(indptr, dtype=np.int64)), shape=(len(indptr) - 1, len(vocab)))
+    if min_df > 1:
+        keep = np.flatnonzero(document_frequency(matrix) >= min_df)
+        matrix = matrix[:, keep]
+        terms = terms[keep]
+    return matrix, terms
+
+# 每个词出现在多少条微博中
+def document_frequency(matrix):
+    return np.bincount(matrix.indices, minlength=matrix.shape[1])
+
+# TF-IDF：idf = ln((1+N)/(1+df)) + 1，每条微博的向量做 L2 归一化
+def tfidf(matrix):
+    posts = matrix.shape[0]
+    idf = np.log((1 + posts) / (1 + document_frequency(matrix))) + 1
+    weighted = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sparse.diags(1 / norms) @ weighted).tocsr()
+
+# 全语料按 TF-IDF 总分排序的高权重词
+def top_terms(weights, matrix, terms, top_n=50):
+    scores = np.asarray(weights.sum(axis=0)).ravel()
+    order = np.argsort(-scores)[:top_n]
+    return pd.DataFrame({
+        'term': terms[order],
+        'tfidf': scores[order],
+        'posts': document_frequency(matrix)[order],
+    })
+
+# 时间区间指示矩阵 (区间×微博)，用它左乘即可按区间汇总
+def period_matrix(created_at, interval='M'):
+    rows = pd.Series(np.arange(len(created_at)), index=pd.DatetimeIndex(created_at))
+    labels = []
+    codes = np.zeros(len(created_at), dtype=np.int64)
+    for period, window in rows.resample(interval):
+        codes[window.values] = len(labels)
+        labels.append(period)
+    indicator = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))),
+                                  shape=(len(labels), len(codes)))
+    return labels, indicator
+
+# 每个区间内 TF-IDF 总分最高的词
+def period_top_terms(weights, terms, labels, indicator, top_n=20):
+    scores = (indicator @ weights).toarray()
+    rows = []
+    for i, period in enumerate(labels):
+        order = np.argsort(-scores[i])[:top_n]
+        for rank, j in enumerate(order, 1):
+            if scores[i, j] <= 0:
+                break
+            rows.append({'period': period, 'rank': rank, 'term': terms[j], 'tfidf': scores[i, j]})
+    return pd.DataFrame(rows, columns=['period', 'rank', 'term', 'tfidf'])
+
+# 新兴词：某区间内出现该词的微博占比，相对之前 window 个区间平均占比的增长倍数
+# 为避免偶然出现的词排到前面，要求区间内至少出现在 min_count 条微博中
+def emerging_terms(matrix, terms, labels, indicator, window=3, top_n=20, min_count=10):
+    present = matrix.copy()
+    present.data[:] = 1
+    doc_counts = (indicator @ present).toarray()
+    totals = np.asarray(indicator.sum(axis=1)).ravel()
+    shares = doc_counts / np.maximum(totals, 1)[:, None]
+    rows = []
+    for i in range(1, len(labels)):
+        if totals[i] == 0:
+            continue
+        recent = slice(max(0, i - window), i)
+        active = totals[recent] > 0
+        if not active.any():
+            continue
+        baseline = shares[recent][active].mean(axis=0)
+        # 平滑项相当于基线期多出现半条，避免除以0
+        smoothing = 0.5 / totals[i]
+        growth = (shares[i] + smoothing) / (baseline + smoothing)
+        growth[doc_counts[i] < min_count] = 0
+        order = np.argsort(-growth)[:top_n]
+        for j in order:
+            if growth[j] <= 1:
+                break
+            rows.append({'period': labels[i], 'term': terms[j], 'posts': int(doc_counts[i, j]),
+                         'share': shares[i, j], 'baseline_share': baseline[j], 'growth': growth[j]})
+    return pd.DataFrame(rows, columns=['period', 'term', 'posts', 'share', 'baseline_share', 'growth'])
@@ -0,0 +1,70 @@
+import json
+from collections import Counter
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis_driver
+from analysis_driver import may_overlap, run_analysis
+from keyword_analysis import WeiboAnalyzer, count_trend_hits, trend_table
+from keyword_index import cooccurrence_counts
+
+KEYWORDS = ['苹果', '香蕉', '橙子']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr']
+
+def weibo(weibo_id, variant=0):
+    words = [KEYWORDS[(weibo_id + k) % 3] for k in range(weibo_id % 3 + variant)]
+    return {'id': weibo_id, 'created_at': f'Wed {MONTHS[weibo_id % 4]} 03 10:00:00 +0800 2025',
+            'text_raw': f"{''.join(words)} #话题{weibo_id % 5 + variant}# 第{weibo_id}条"}
+
+def write_jsonl(path, weibos):
+    path.write_text(''.join(json.dumps(w, ensure_ascii=False) + '\n' for w in weibos), encoding='utf-8')
+    return str(path)
+
+def analyzer_totals(path):
+    analyzer = WeiboAnalyzer(path)
+    analyzer.load_and_clean_data()
+    keywords, hits = analyzer.keyword_hits(KEYWORDS)
+    return {'posts': len(analyzer.df),
+            'trends': trend_table(count_trend_hits(analyzer.df['created_at'], hits), keywords),
+            'cooccurrence': cooccurrence_counts(hits).toarray(),
+            'hashtags': Counter(chain.from_iterable(analyzer.df['hashtags']))}
+
+# 分片之间、分片内部都有重复微博，重复的副本内容不同：结果应与 WeiboAnalyzer 分析全部分片拼接后的文件一致
+@pytest.mark.parametrize('workers', [1, 2])
+def test_overlapping_shards_match_weibo_analyzer(tmp_path, workers):
+    shards = [
+        [weibo(i) for i in range(0, 40)],
+        # 与第一个分片重复 20 条（内容不同，应统计前面的版本），分片内部也有重复
+        [weibo(i, variant=1) for i in range(20, 60)] + [weibo(i, variant=2) for i in range(50, 55)],
+        [weibo(i) for i in range(1000, 1030)],
+        # 没有 id 的微博不去重
+        [dict(weibo(i), id=None) for i in range(5)] + [weibo(i, variant=1) for i in range(35, 45)],
+    ]
+    paths = [write_jsonl(tmp_path / f'part{i}.txt', weibos) for i, weibos in enumerate(shards)]
+    combined = write_jsonl(tmp_path / 'all.txt', chain.from_iterable(shards))
+
+    expected = analyzer_totals(combined)
+    result = run_analysis(paths, KEYWORDS, chunk_size=16, workers=workers)
+    assert result['posts'] == expected['posts']
+    pd.testing.assert_frame_equal(result['trends'], expected['trends'], check_dtype=False, check_freq=False)
+    np.testing.assert_array_equal(result['cooccurrence'].toarray(), expected['cooccurrence'])
+    assert result['hashtags'] == expected['hashtags']
+
+# 同一次分片爬取的不同分片按用户划分，不做跨分片去重，也不写 id 文件
+def test_shard_crawl_outputs_skip_dedup(tmp_path, monkeypatch):
+    assert not may_overlap('out/all.shard0.txt', 'out/all.shard1.00002.txt.zst')
+    assert may_overlap('out/all.shard0.00001.txt', 'out/all.shard0.00002.txt')
+    assert may_overlap('out/all.shard0.txt', 'out/other.shard1.txt')
+    assert may_overlap('a.txt', 'b.txt')
+
+    paths = [write_jsonl(tmp_path / f'all.shard{i}.txt', [weibo(j) for j in range(i * 10, i * 10 + 10)])
+             for i in range(3)]
+    calls = []
+    analyze_shard = analysis_driver.analyze_shard
+    monkeypatch.setattr(analysis_driver, 'analyze_shard', lambda *args: calls.append(args) or analyze_shard(*args))
+    result = run_analysis(paths, KEYWORDS, workers=1)
+    assert result['posts'] == 30
+    assert len(calls) == 3 and all(args[5] is None for args in calls)
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from compressed_io import iter_complete_lines, open_binary, open_text
+from format_weibo_to_txt import export_readable
+
+LINES = [json.dumps({'id': i, 'text': f'第{i}条微博'}, ensure_ascii=False).encode('utf-8') + b'\n' for i in range(1000)]
+
+@pytest.fixture(params=['gz', 'zst'])
+def suffix(request):
+    if request.param == 'zst':
+        pytest.importorskip('zstandard')
+    return request.param
+
+# 写入、追加一段新的压缩数据后，逐行读取、文本读取和 iter_complete_lines 都能读回全部行
+def test_write_append_read_round_trip(tmp_path, suffix):
+    path = str(tmp_path / f'data.jsonl.{suffix}')
+    with open_binary(path, 'wb') as f:
+        f.write(b''.join(LINES[:600]))
+    with open_binary(path, 'ab') as f:
+        f.write(b''.join(LINES[600:]))
+
+    with open_binary(path) as f:
+        assert list(f) == LINES
+    with open_text(path) as f:
+        assert [line.encode('utf-8') for line in f] == LINES
+    assert list(iter_complete_lines(path)) == LINES
+
+# 写入时崩溃留下的截断文件：读到最后一个完整的行为止
+def test_truncated_file_yields_complete_lines(tmp_path, suffix):
+    path = str(tmp_path / f'data.jsonl.{suffix}')
+    with open_binary(path, 'wb') as f:
+        f.write(b''.join(LINES))
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    lines = list(iter_complete_lines(path))
+    assert lines == LINES[:len(lines)]
+
+def test_export_readable_reads_compressed_input(tmp_path, suffix):
+    path = str(tmp_path / f'data.jsonl.{suffix}')
+    with open_binary(path, 'wb') as f:
+        f.write(b''.join(LINES))
+    written, failed = export_readable(path, str(tmp_path / 'readable.txt'))
+    assert (written, failed) == (len(LINES), 0)
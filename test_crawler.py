@@ -1,4 +1,5 @@
 from weibo_crawler import WeiboCrawler
+from crawl_metrics import configure_logging
 import sys
 
 # 测试单个用户的微博爬取
@@ -60,6 +61,8 @@ def main():
         return
     
     user_id = sys.argv[1]
+    # 测试脚本需要看到每个请求的响应内容
+    configure_logging('DEBUG')
     test_single_user(user_id)
 
 if __name__ == "__main__":
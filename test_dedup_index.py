@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+
+import pytest
+
+from compressed_io import iter_complete_lines
+from dedup_index import SeenIndex
+from mock_weibo_server import MockConfig, MockWeiboServer
+from rotating_output import input_files, manifest_path
+import weibo_crawler
+
+# 限速器放开到不成为瓶颈
+FAST_LIMITS = {family: {'rate': 100000.0, 'burst': 1000, 'max_rate': 100000.0}
+               for family in ('profile', 'statuses', 'comments', 'friends', 'default')}
+
+@pytest.fixture
+def mock_server():
+    server = MockWeiboServer(config=MockConfig(posts_per_user=20, comments_per_post=0))
+    server.start()
+    yield server
+    server.stop()
+
+def run_main(monkeypatch, tmp_path, server, *extra, users=3):
+    user_ids = tmp_path / 'user_ids.txt'
+    user_ids.write_text('\n'.join(str(uid) for uid in range(1, users + 1)), encoding='utf-8')
+    rate_config = tmp_path / 'rate.json'
+    rate_config.write_text(json.dumps(FAST_LIMITS), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['weibo_crawler.py', '--user-ids-file', str(user_ids), '--base-url', server.base_url,
+                                      '--rate-config', str(rate_config), '--max-pages', '1', '--progress-interval', '0',
+                                      '--comment-workers', '0', *extra])
+    weibo_crawler.main()
+
+# 单个输出文件或分段输出的清单
+def read_ids(path):
+    return [json.loads(line)['id'] for part in input_files(str(path)) for line in iter_complete_lines(part)]
+
+# 带去重索引的普通重跑：第二次什么都不写，但第一次的数据不能被清空
+def test_rerun_with_dedup_index_keeps_output(monkeypatch, tmp_path, mock_server):
+    run_main(monkeypatch, tmp_path, mock_server, '--dedup-index', 'seen.idx')
+    first = read_ids(tmp_path / 'all_weibos.txt')
+    assert len(first) == 60
+
+    run_main(monkeypatch, tmp_path, mock_server, '--dedup-index', 'seen.idx')
+    assert read_ids(tmp_path / 'all_weibos.txt') == first
+
+    # 新用户的微博追加在后面
+    run_main(monkeypatch, tmp_path, mock_server, '--dedup-index', 'seen.idx', users=4)
+    ids = read_ids(tmp_path / 'all_weibos.txt')
+    assert ids[:60] == first and len(ids) == 80 and len(set(ids)) == 80
+
+def test_rerun_with_dedup_index_keeps_rotating_output(monkeypatch, tmp_path, mock_server):
+    run_main(monkeypatch, tmp_path, mock_server, '--dedup-index', 'seen.idx', '--compress', 'gzip',
+             '--rotate-records', '25')
+    first = read_ids(tmp_path / manifest_path('all_weibos.txt'))
+    assert len(first) == 60
+
+    run_main(monkeypatch, tmp_path, mock_server, '--dedup-index', 'seen.idx', '--compress', 'gzip',
+             '--rotate-records', '25')
+    assert read_ids(tmp_path / manifest_path('all_weibos.txt')) == first
+
+# 分片模式下各分片写自己的索引和转发文件，合并后每条原文只保存一次，索引包含全部已写入的微博
+def test_sharded_dedup_index_and_retweet_store(monkeypatch, tmp_path, mock_server):
+    run_main(monkeypatch, tmp_path, mock_server, '--dedup-index', 'seen.idx', '--retweet-store', 'retweets.jsonl',
+             '--shards', '2', users=30)
+    ids = read_ids(tmp_path / 'all_weibos.txt')
+    assert len(ids) == 600
+    index = SeenIndex(str(tmp_path / 'seen.idx'))
+    assert all(weibo_id in index for weibo_id in ids)
+
+    stored = read_ids(tmp_path / 'retweets.jsonl')
+    assert stored and len(stored) == len(set(stored))
+    assert all(weibo_id in SeenIndex(str(tmp_path / 'retweets.jsonl.idx')) for weibo_id in stored)
+    assert not [name for name in os.listdir(tmp_path) if '.shard' in name]
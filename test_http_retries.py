@@ -0,0 +1,57 @@
+import pytest
+
+from async_crawler import AsyncWeiboCrawler, run_async_batch_crawl
+from crawl_metrics import CrawlMetrics
+from http_transport import HttpTransport
+from jsonl_writer import JsonlWriter
+from mock_weibo_server import MockConfig, MockWeiboServer
+from rate_limiter import RateLimiter
+from weibo_crawler import batch_crawl
+
+FAST_LIMITS = {family: {'rate': 100000.0, 'burst': 1000, 'max_rate': 100000.0}
+               for family in ('profile', 'statuses', 'comments', 'friends', 'default')}
+
+# 记下限速器收到的每个失败状态码
+class CountingRateLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__(FAST_LIMITS, base_backoff=0.001, max_backoff=0.01)
+        self.failures = 0
+
+    def record(self, url, status, retry_after=None):
+        if status is None or status >= 500:
+            self.failures += 1
+        super().record(url, status, retry_after)
+
+@pytest.fixture
+def flaky_server():
+    server = MockWeiboServer(config=MockConfig(posts_per_user=20, comments_per_post=0, error_rate=0.3))
+    server.start()
+    yield server
+    server.stop()
+
+def server_errors(metrics):
+    return sum(stats['statuses'].get('500', 0) for stats in metrics.snapshot()['endpoints'].values())
+
+# 两个引擎都重试 5xx，不丢用户；每次失败的尝试都报给了限速器
+@pytest.mark.parametrize('engine', ['sync', 'async'])
+def test_retries_5xx_through_rate_limiter(tmp_path, flaky_server, engine):
+    user_ids = [str(uid) for uid in range(1, 7)]
+    rate_limiter = CountingRateLimiter()
+    metrics = CrawlMetrics()
+    with JsonlWriter(open(tmp_path / 'out.jsonl', 'wb')) as output:
+        if engine == 'async':
+            run_async_batch_crawl(user_ids, None, 1, 10 ** 9, base_url=flaky_server.base_url,
+                                  rate_limiter=rate_limiter, output=output, metrics=metrics, retries=8)
+        else:
+            transport = HttpTransport(retries=8)
+            batch_crawl(user_ids, None, 1, 10 ** 9, base_url=flaky_server.base_url, rate_limiter=rate_limiter,
+                        output=output, comment_workers=0, metrics=metrics, transport=transport)
+            transport.close()
+    assert output.count == 120
+    assert server_errors(metrics) > 0
+    assert rate_limiter.failures == server_errors(metrics)
+
+# async 引擎不创建同步版的传输层
+def test_async_crawler_has_no_sync_transport():
+    crawler = AsyncWeiboCrawler()
+    assert crawler.transport is None and crawler.session is None
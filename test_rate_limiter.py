@@ -0,0 +1,25 @@
+from rate_limiter import RateLimiter
+
+URL = 'https://weibo.com/ajax/statuses/mymblog?uid=1&page=1'
+
+def limiter():
+    return RateLimiter({'statuses': {'rate': 1.0, 'burst': 1, 'max_rate': 10.0}}, speedup_after=2, base_backoff=0.001,
+                       max_backoff=0.001)
+
+# 403/404 等 4xx 不算成功：不会让速率升高，也不重置失败计数
+def test_other_4xx_neither_speed_up_nor_reset_failures():
+    rate_limiter = limiter()
+    for _ in range(5):
+        rate_limiter.record(URL, 403)
+    assert rate_limiter.rates()['statuses'] == 1.0
+
+    rate_limiter.record(URL, 500)
+    rate_limiter.record(URL, 404)
+    assert rate_limiter.state['statuses']['failures'] == 1
+
+# 2xx/3xx 计为成功，连续成功后提速
+def test_successes_speed_up():
+    rate_limiter = limiter()
+    rate_limiter.record(URL, 200)
+    rate_limiter.record(URL, 304)
+    assert rate_limiter.rates()['statuses'] == 1.25
@@ -0,0 +1,38 @@
+import json
+import sqlite3
+
+from response_cache import ResponseCache
+
+def body(i, size):
+    content = json.dumps({'ok': 1, 'data': {'i': i}}).encode('utf-8')
+    return content + b' ' * (size - len(content))
+
+def stored_bytes(path):
+    with sqlite3.connect(path) as db:
+        return db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+# 多个分片进程共用一个缓存文件：每个进程都看到其他进程写入的大小，总大小不超过上限
+def test_shared_cache_enforces_total_cap(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    caches = [ResponseCache(path, max_bytes=100 * 1000) for _ in range(3)]
+    for i in range(300):
+        cache = caches[i % 3]
+        cache.put(f'https://weibo.com/ajax/statuses/mymblog?uid={i}&page=1', 200, {}, body(i, 1000))
+        assert stored_bytes(path) <= 100 * 1000
+    # 同一个键被其他进程覆盖时不重复计算
+    caches[0].put('https://weibo.com/ajax/statuses/mymblog?uid=299&page=1', 200, {}, body(299, 500))
+    assert caches[1].size <= 100 * 1000
+    for cache in caches:
+        cache.summary()
+        assert cache.size == stored_bytes(path)
+        cache.close()
+
+# 旧版本建的缓存文件没有总大小这一行，打开时按已有条目算出
+def test_existing_cache_size_is_initialized(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = ResponseCache(path)
+    cache.put('https://weibo.com/ajax/profile/info?uid=1', 200, {}, body(1, 800))
+    cache.db.execute('DROP TABLE cache_size')
+    cache.db.commit()
+    cache.close()
+    assert ResponseCache(path).size == 800
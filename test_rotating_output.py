@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from compressed_io import iter_complete_lines
+from keyword_analysis import WeiboAnalyzer
+from mock_weibo_server import MockConfig, synthetic_weibos
+from post_store import import_jsonl
+from rotating_output import RotatingJsonlWriter, input_files, manifest_path, parse_projection, users_path
+
+pytest.importorskip('zstandard')
+
+def open_writer(output):
+    return RotatingJsonlWriter(output, 'zstd', max_records=25, projection=parse_projection('analysis'), batch_size=10,
+                               fsync_interval=None)
+
+def read_ids(manifest):
+    return [json.loads(line)['id'] for part in input_files(manifest) for line in iter_complete_lines(part)]
+
+# 写到一半崩溃（当前分段未封存），按进度日志的偏移恢复后继续写，zstd 分段和用户侧表都能正确读回
+def test_resume_zstd_rotation_and_analyze(tmp_path):
+    output = str(tmp_path / 'all_weibos.txt')
+    weibos = list(synthetic_weibos(60, MockConfig(posts_per_user=20)))
+
+    crashed = open_writer(output).open()
+    for weibo in weibos[:40]:
+        crashed.write(weibo)
+    crashed.flush()
+    offset = crashed.tell()
+    # 偏移之后写入、已落盘但进度日志还没记录的微博，恢复时应被丢弃
+    for weibo in weibos[40:50]:
+        crashed.write(weibo)
+    crashed.flush()
+
+    with open_writer(output).open(resume=True, offset=offset) as writer:
+        for weibo in weibos[40:]:
+            writer.write(weibo)
+
+    manifest = manifest_path(output)
+    assert read_ids(manifest) == [weibo['id'] for weibo in weibos]
+    users = [json.loads(line)['id'] for line in iter_complete_lines(users_path(output, 'zstd'))]
+    assert len(users) == len(set(users)) and {weibo['user']['id'] for weibo in weibos} <= set(users)
+
+    analyzer = WeiboAnalyzer(manifest)
+    assert analyzer.load_and_clean_data()
+    assert len(analyzer.df) == len(weibos)
+
+    assert import_jsonl(manifest, str(tmp_path / 'posts.db')) == len(weibos)
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import user_collecter
+from mock_weibo_server import MockConfig, MockWeiboServer
+from rate_limiter import RateLimiter
+from user_collecter import DiscoveryState, collect_user_ids, collect_users, fetch_friends_page
+
+FAST_LIMITS = {family: {'rate': 100000.0, 'burst': 1000, 'max_rate': 100000.0}
+               for family in ('profile', 'statuses', 'comments', 'friends', 'default')}
+
+@pytest.fixture
+def mock_server():
+    server = MockWeiboServer(config=MockConfig(friends_per_user=5))
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def cookies_path(tmp_path):
+    path = tmp_path / 'cookies.json'
+    path.write_text(json.dumps([{'name': 'SUB', 'value': 'test'}]), encoding='utf-8')
+    return str(path)
+
+def read_ids(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+class JsonResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+class FixedTransport:
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, url, **kwargs):
+        return JsonResponse(self.data)
+
+# 响应是 JSON 但不是对象时按失败重试，最终返回 None
+@pytest.mark.parametrize('data', [None, [], 'users'])
+def test_fetch_friends_page_rejects_non_object_json(data):
+    assert fetch_friends_page(FixedTransport(data), RateLimiter(FAST_LIMITS), 'http://mock', '1', 1) is None
+
+# 展开某个用户时出现意外异常：只记为失败，其余用户照常展开，该用户留到下次运行重试
+def test_unexpected_error_does_not_abort_collection(tmp_path, monkeypatch, mock_server, cookies_path):
+    fetch_friends = user_collecter.fetch_friends
+
+    def flaky(transport, rate_limiter, base_url, uid, *args):
+        if uid == '2':
+            raise AttributeError("'list' object has no attribute 'get'")
+        return fetch_friends(transport, rate_limiter, base_url, uid, *args)
+
+    monkeypatch.setattr(user_collecter, 'fetch_friends', flaky)
+    output = str(tmp_path / 'user_ids.txt')
+    users = collect_users(['1', '2', '3'], max_count=100, max_depth=1, workers=2, cookies_path=cookies_path,
+                          output_file=output, rate_limiter=RateLimiter(FAST_LIMITS), base_url=mock_server.base_url)
+    assert users and set(read_ids(output)) == users
+    state = DiscoveryState(output + '.state')
+    assert state.expanded == {'1', '3'}
+    state.close()
+
+# collect_user_ids 与原来一样每次重新采集、覆盖输出文件，不续用上次的进度
+def test_collect_user_ids_overwrites_by_default(tmp_path, monkeypatch, mock_server, cookies_path):
+    calls = []
+    fetch_friends = user_collecter.fetch_friends
+    monkeypatch.setattr(user_collecter, 'fetch_friends', lambda *args: calls.append(args[3]) or fetch_friends(*args))
+    output = tmp_path / 'user_ids.txt'
+    output.write_text('stale\n', encoding='utf-8')
+    for _ in range(2):
+        users = collect_user_ids('1', cookies_path=cookies_path, output_file=str(output),
+                                 rate_limiter=RateLimiter(FAST_LIMITS), base_url=mock_server.base_url)
+        assert users and sorted(read_ids(output)) == sorted(users)
+    assert calls == ['1', '1']
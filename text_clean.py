@@ -0,0 +1,93 @@
+import html
+import re
+
+# 爬虫和分析器共用的微博文本清洗，正则都预先编译好，批量接口一次处理一个字符串列表
+# 清洗顺序：换行标签换成空格 → 去标签（表情 <img alt="[笑]"> 保留 alt 文本）→ 去链接 → 解码HTML实体 → 合并空白
+
+# 链接在空白、中文或全角标点处结束，不会吞掉紧跟的正文
+URL_PATTERN = re.compile(r'https?://[^\s\u3000-\u9fff\uff00-\uffef]+')
+# 含表情图片时标签一次扫描处理：用 split 切开，唯一的分组是 alt 文本，其余标签切掉后对应位置为 None
+# split 和 join 都在C里完成，比带 \1 替换模板的 sub 快一倍多
+MARKUP_PATTERN = re.compile(r'<img\b[^>]*?\balt=["\']([^"\'>]*)["\'][^>]*>|<[^>]+>', re.IGNORECASE)
+# 没有表情图片时直接删除所有标签
+TAG_PATTERN = re.compile(r'<[^>]+>')
+BREAK_PATTERN = re.compile(r'<br\s*/?>', re.IGNORECASE)
+HASHTAG_PATTERN = re.compile(r'#([^#]+)#')
+# 微博昵称由中英文、数字、下划线和减号组成，最长30个字符
+MENTION_PATTERN = re.compile(r'@([\w\-]{1,30})')
+
+# 解码HTML实体。微博里常见的几个实体用 str.replace 解码，&nbsp; 与原来一样解码为普通空格；
+# 还有其他实体（数字实体、&hellip; 等）或不成实体的 & 时交给 html.unescape 处理全部实体
+def unescape_entities(text):
+    fast = text.replace('&quot;', '"').replace('&lt;', '<').replace('&gt;', '>').replace('&nbsp;', ' ')
+    if fast.count('&') != fast.count('&amp;'):
+        return html.unescape(text)
+    # &amp; 最后解码，'&amp;lt;' 得到 '&lt;' 而不是 '<'，与 html.unescape 一致
+    return fast.replace('&amp;', '&')
+
+# 缺失值（None、NaN）当作空串，其他非字符串转成字符串
+def _as_text(text):
+    if isinstance(text, str):
+        return text
+    if text is None or text != text:
+        return ''
+    return str(text)
+
+# 批量清洗，返回与输入等长的列表；strip_urls 为 True 时去掉链接，collapse_space 为 True 时把连续空白合并为一个空格
+# 方法查找提到循环外，'<'、'&' 等字符不存在时跳过对应的正则
+def clean_texts(texts, strip_urls=False, collapse_space=True):
+    markup_split = MARKUP_PATTERN.split
+    tag_sub = TAG_PATTERN.sub
+    url_sub = URL_PATTERN.sub
+    break_sub = BREAK_PATTERN.sub
+    unescape = unescape_entities
+    join = ''.join
+    cleaned = []
+    append = cleaned.append
+    for text in texts:
+        if not isinstance(text, str):
+            text = _as_text(text)
+        if '<' in text:
+            # 换行标签换成空格，免得前后两行的字连在一起
+            if '<br' in text or '<BR' in text:
+                text = text.replace('<br />', ' ')
+                if '<br' in text or '<BR' in text:
+                    text = break_sub(' ', text)
+            if '<img' in text or '<IMG' in text:
+                text = join(filter(None, markup_split(text)))
+            else:
+                text = tag_sub('', text)
+        # 链接单独一次替换：并进标签的正则会让它失去按 '<' 快速跳过的优化，反而更慢
+        if strip_urls and 'http' in text:
+            text = url_sub('', text)
+        if '&' in text:
+            text = unescape(text)
+        if collapse_space:
+            # 大部分文本只有单个空格，不必重新拼接；isprintable() 对空格以外的所有空白字符都返回 False
+            # str.split() 按Unicode空白切分（含 \xa0 和全角空格），比正则替换快
+            if '  ' in text or not text.isprintable():
+                text = ' '.join(text.split())
+            else:
+                text = text.strip()
+        append(text)
+    return cleaned
+
+# 清洗一条文本
+def clean_text(text, strip_urls=False, collapse_space=True):
+    return clean_texts((text,), strip_urls, collapse_space)[0]
+
+# 提取话题 #话题#，应在清洗后的文本上调用
+def extract_hashtags(text):
+    return HASHTAG_PATTERN.findall(text) if '#' in text else []
+
+def extract_hashtags_batch(texts):
+    findall = HASHTAG_PATTERN.findall
+    return [findall(text) if '#' in text else [] for text in texts]
+
+# 提取 @提及的昵称
+def extract_mentions(text):
+    return MENTION_PATTERN.findall(text) if '@' in text else []
+
+def extract_mentions_batch(texts):
+    findall = MENTION_PATTERN.findall
+    return [findall(text) if '@' in text else [] for text in texts]
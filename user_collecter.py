@@ -1,7 +1,19 @@
-import requests
 import json
-import time
 import os
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from rate_limiter import RateLimiter, load_rate_config, parse_retry_after
+from http_transport import TRANSPORT_ERRORS, HttpTransport
+from crawl_metrics import configure_logging
+
+DEFAULT_BASE_URL = 'https://weibo.com'
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'X-Requested-With': 'XMLHttpRequest',
+}
 
 def load_cookies(cookies_path='weibo_cookies.json'):
     with open(cookies_path, 'r', encoding='utf-8') as f:
@@ -9,40 +21,200 @@ def load_cookies(cookies_path='weibo_cookies.json'):
     cookies_dict = {c['name']: c['value'] for c in cookies}
     return cookies_dict
 
-def collect_user_ids(seed_uid, max_count=2000, cookies_path='weibo_cookies.json', output_file='user_ids.txt'):
-    cookies = load_cookies(cookies_path)
-    user_ids = set()
-    page = 1
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-        'Referer': f'https://weibo.com/u/{seed_uid}',
-        'Accept': 'application/json, text/plain, */*',
-        'X-Requested-With': 'XMLHttpRequest',
-    }
-    while len(user_ids) < max_count:
-        url = f'https://weibo.com/ajax/friendships/friends?uid={seed_uid}&page={page}&count=20'
-        resp = requests.get(url, cookies=cookies, headers=headers)
-        if resp.status_code != 200:
-            print('请求失败，状态码：', resp.status_code)
-            time.sleep(10)
+# 采集进度：已发现的用户（含层数）和已展开完关注列表的用户，追加写入，重启后据此继续
+# 文件每行一条事件：D <uid> <depth> 表示发现，X <uid> 表示已展开
+class DiscoveryState:
+    def __init__(self, path):
+        self.path = path
+        self.depths = {}
+        self.expanded = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3 and parts[0] == 'D':
+                        self.depths.setdefault(parts[1], int(parts[2]))
+                    elif len(parts) == 2 and parts[0] == 'X':
+                        self.expanded.add(parts[1])
+            print(f"已读取采集进度 {path}：发现 {len(self.depths)} 个用户，已展开 {len(self.expanded)} 个")
+        self.f = open(path, 'a', encoding='utf-8')
+
+    def discover(self, uid, depth):
+        if uid in self.depths:
+            return False
+        self.depths[uid] = depth
+        self.f.write(f"D {uid} {depth}\n")
+        return True
+
+    def mark_expanded(self, uid):
+        self.expanded.add(uid)
+        self.f.write(f"X {uid}\n")
+        self.f.flush()
+
+    # 待展开的用户，按层数排序保证广度优先
+    def frontier(self, max_depth):
+        pending = [(depth, uid) for uid, depth in self.depths.items()
+                   if uid not in self.expanded and depth < max_depth]
+        return deque(uid for depth, uid in sorted(pending, key=lambda item: item[0]))
+
+    def close(self):
+        self.f.close()
+
+# 抓取一个用户关注列表的一页；非200或网络异常时重试，最多 max_retries 次，退避由限速器负责
+# 传输层只重试建立连接失败；5xx、读超时、限流和非JSON响应等都在这里重试，每次都经过限速器
+def fetch_friends_page(transport, rate_limiter, base_url, uid, page, max_retries=3):
+    url = f'{base_url}/ajax/friendships/friends?uid={uid}&page={page}&count=20'
+    for attempt in range(1, max_retries + 1):
+        rate_limiter.wait(url)
+        try:
+            resp = transport.get(url, headers={'Referer': f'{base_url}/u/{uid}'}, timeout=15)
+        except TRANSPORT_ERRORS as e:
+            rate_limiter.record(url, None)
+            print(f'请求失败（第 {attempt} 次）：{e}')
             continue
-        data = resp.json()
-        users = data.get('users', [])
+        rate_limiter.record(url, resp.status_code, parse_retry_after(resp.headers.get('Retry-After')))
+        if resp.status_code == 200:
+            try:
+                data = resp.json()
+            except ValueError:
+                print(f'响应不是JSON（第 {attempt} 次）：{url}')
+                continue
+            if not isinstance(data, dict):
+                print(f'响应格式异常（第 {attempt} 次）：{url}')
+                continue
+            return data.get('users') or []
+        print(f'请求失败，状态码：{resp.status_code}（第 {attempt} 次）')
+    return None
+
+# 展开一个用户：翻页取完关注列表（最多 max_pages 页），任意一页最终失败时返回 None
+def fetch_friends(transport, rate_limiter, base_url, uid, max_pages=None, max_retries=3):
+    friend_ids = []
+    page = 1
+    while max_pages is None or page <= max_pages:
+        users = fetch_friends_page(transport, rate_limiter, base_url, uid, page, max_retries)
+        if users is None:
+            return None
         if not users:
             break
-        for u in users:
-            user_ids.add(str(u['id']))
-            if len(user_ids) >= max_count:
-                break
-        print(f'已采集用户数：{len(user_ids)}')
+        friend_ids.extend(str(u['id']) for u in users if u.get('id') is not None)
         page += 1
-        time.sleep(3)
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for uid in user_ids:
-            f.write(uid + '\n')
-    print(f'用户ID已保存到 {output_file}')
+    return friend_ids
+
+# 从多个种子出发按关注关系广度优先扩展，workers 个线程同时展开不同用户
+# 新发现的用户ID立即追加到 output_file；进度写入 state_file，中断后再次运行会跳过已展开的用户
+def collect_users(seed_uids, max_count=2000, max_depth=1, workers=4, cookies_path='weibo_cookies.json',
+                  output_file='user_ids.txt', state_file=None, rate_limiter=None, base_url=DEFAULT_BASE_URL,
+                  max_pages=None, max_retries=3, fresh=False, transport=None):
+    if state_file is None:
+        state_file = output_file + '.state'
+    if fresh:
+        for path in (output_file, state_file):
+            if os.path.exists(path):
+                os.remove(path)
+    # 与 WeiboCrawler 共用同一套按接口族的限速器
+    if rate_limiter is None:
+        rate_limiter = RateLimiter()
+
+    # 所有线程共用一个连接池，每个线程都能复用自己的 keep-alive 连接
+    if transport is None:
+        transport = HttpTransport(pool_connections=1, pool_maxsize=max(workers, 1))
+    transport.session.headers.update(HEADERS)
+    transport.session.cookies.update(load_cookies(cookies_path))
+
+    state = DiscoveryState(state_file)
+    written = set()
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            written = {line.strip() for line in f if line.strip()}
+    out = open(output_file, 'a', encoding='utf-8')
+
+    for uid in seed_uids:
+        state.discover(str(uid), 0)
+    frontier = state.frontier(max_depth)
+    print(f"种子用户 {len(seed_uids)} 个，最大层数 {max_depth}，待展开 {len(frontier)} 个，已采集 {len(written)} 个")
+
+    failed = 0
+    running = {}
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collect')
+    try:
+        while (frontier or running) and len(written) < max_count:
+            while frontier and len(running) < workers:
+                uid = frontier.popleft()
+                future = executor.submit(fetch_friends, transport, rate_limiter, base_url, uid, max_pages, max_retries)
+                running[future] = uid
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                uid = running.pop(future)
+                try:
+                    friend_ids = future.result()
+                except Exception as e:
+                    # 解析出错等意外异常只影响这一个用户，不中断整个采集
+                    print(f'用户 {uid} 的关注列表处理出错：{e!r}')
+                    friend_ids = None
+                if friend_ids is None:
+                    # 本次放弃，该用户未标记为已展开，下次运行会重试
+                    failed += 1
+                    print(f'用户 {uid} 的关注列表获取失败，跳过')
+                    continue
+                depth = state.depths[uid] + 1
+                complete = True
+                for friend_id in friend_ids:
+                    if state.discover(friend_id, depth) and depth < max_depth:
+                        frontier.append(friend_id)
+                    if friend_id not in written:
+                        if len(written) >= max_count:
+                            complete = False
+                            break
+                        written.add(friend_id)
+                        out.write(friend_id + '\n')
+                out.flush()
+                # 达到上限时没写完的用户不标记为已展开，下次提高上限后会重新展开
+                if complete:
+                    state.mark_expanded(uid)
+                print(f'已采集用户数：{len(written)}（第 {depth} 层，待展开 {len(frontier)} 个）')
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        transport.close()
+        out.close()
+        state.close()
+    print(f'用户ID已保存到 {output_file}，共 {len(written)} 个，失败 {failed} 个')
+    return written
+
+# 单个种子、只采集一层关注列表；与原来一样默认覆盖 output_file 重新采集，fresh=False 时续用 state_file 中的进度
+def collect_user_ids(seed_uid, max_count=2000, cookies_path='weibo_cookies.json', output_file='user_ids.txt', rate_limiter=None,
+                     base_url=DEFAULT_BASE_URL, transport=None, fresh=True, state_file=None):
+    return collect_users([seed_uid], max_count, max_depth=1, workers=1, cookies_path=cookies_path,
+                         output_file=output_file, state_file=state_file, rate_limiter=rate_limiter, base_url=base_url,
+                         fresh=fresh, transport=transport)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='从种子用户出发，按关注关系广度优先采集用户ID')
     # 想采集的种子用户ID
-    seed_uid = '5025719938'
-    collect_user_ids(seed_uid, max_count=2000)
\ No newline at end of file
+    parser.add_argument('--seeds', help='逗号分隔的种子用户ID', default='5025719938')
+    parser.add_argument('--seeds-file', help='种子用户ID文件，每行一个', default=None)
+    parser.add_argument('--max-count', type=int, help='最多采集的用户数', default=2000)
+    parser.add_argument('--depth', type=int, help='最多扩展的层数，1 表示只采集种子的关注列表', default=1)
+    parser.add_argument('--workers', type=int, help='同时展开的用户数', default=4)
+    parser.add_argument('--max-pages', type=int, help='每个用户最多翻几页关注列表', default=None)
+    parser.add_argument('--max-retries', type=int, help='每页请求失败后的最大尝试次数', default=3)
+    parser.add_argument('--cookies', help='cookie JSON文件', default='weibo_cookies.json')
+    parser.add_argument('--output', help='输出的用户ID文件，边采集边追加', default='user_ids.txt')
+    parser.add_argument('--state-file', help='采集进度文件，默认为 输出文件.state', default=None)
+    parser.add_argument('--fresh', action='store_true', help='清空已有的输出和进度，从头采集')
+    parser.add_argument('--rate-config', help='限速配置JSON文件', default=None)
+    parser.add_argument('--base-url', help='微博接口地址（可指向本地模拟服务器）', default=DEFAULT_BASE_URL)
+    parser.add_argument('--http-retries', type=int, help='建立连接失败的传输层重试次数（只重试GET），5xx 由 --max-retries 重试', default=2)
+    parser.add_argument('--http2', action='store_true', help='使用 HTTP/2 多路复用（需要 httpx[http2]）')
+    args = parser.parse_args()
+    # 限速器的退避信息走日志
+    configure_logging()
+
+    seeds = [uid.strip() for uid in args.seeds.split(',') if uid.strip()]
+    if args.seeds_file:
+        with open(args.seeds_file, 'r', encoding='utf-8') as f:
+            seeds = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    rate_limiter = RateLimiter(load_rate_config(args.rate_config) if args.rate_config else None)
+    transport = HttpTransport(pool_connections=1, pool_maxsize=max(args.workers, 1), retries=args.http_retries,
+                              http2=args.http2)
+    collect_users(seeds, args.max_count, args.depth, args.workers, args.cookies, args.output, args.state_file,
+                  rate_limiter, args.base_url.rstrip('/'), args.max_pages, args.max_retries, args.fresh, transport)
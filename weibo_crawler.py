@@ -1,120 +1,177 @@
-import requests
-import json
 import time
 import os
-import re
 import argparse
+import logging
 from datetime import datetime
 import sys
 import pickle
+from functools import partial
+from rate_limiter import RateLimiter, endpoint_family, load_rate_config, parse_retry_after
+from crawl_journal import CrawlJournal, open_resumed_output
+from jsonl_writer import JsonlWriter
+from crawl_state import CrawlState, filter_new_weibos
+from endpoint_memo import EndpointMemo
+from comment_pipeline import CommentPipeline
+from response_cache import ResponseCache, load_cache_ttls
+from dedup_index import RetweetStore, SeenIndex
+from post_store import PostStore
+from rotating_output import RotatingJsonlWriter, manifest_path, parse_projection
+from crawl_metrics import CrawlMetrics, configure_logging
+from http_transport import RETRY_STATUSES, TRANSPORT_ERRORS, HttpTransport
+from text_clean import clean_text, clean_texts
+from format_weibo_to_txt import format_created_at
+
+# 热路径上的逐请求、逐页输出用 DEBUG 级别，默认不输出；用户级进度为 INFO，失败为 WARNING
+logger = logging.getLogger('weibo_crawler')
+
+DEFAULT_BASE_URL = 'https://weibo.com'
+
+# format_weibo 每条微博末尾的分隔线
+WEIBO_SEPARATOR = '-' * 50 + '\n'
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'zh-CN,zh;q=0.9',
+    'Referer': 'https://weibo.com/',
+    'Origin': 'https://weibo.com',
+}
 
 class WeiboCrawler:
-    def __init__(self, cookie=None):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'zh-CN,zh;q=0.9',
-            'Referer': 'https://weibo.com/',
-            'Origin': 'https://weibo.com',
-        }
+    def __init__(self, cookie=None, base_url=DEFAULT_BASE_URL, rate_limiter=None, endpoint_memo=None, response_cache=None,
+                 metrics=None, transport=None):
+        # base_url 可指向本地模拟服务器，便于离线测试
+        self.base_url = base_url.rstrip('/')
+        self.headers = dict(DEFAULT_HEADERS)
         
         if cookie:
             self.headers['Cookie'] = cookie
         
-        self.session = requests.Session()
+        self._init_transport(transport)
+        # 按接口族限速，替代固定的 time.sleep
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        # 记住可用的微博列表接口，避免每页都从第一个接口试起
+        self.endpoint_memo = endpoint_memo if endpoint_memo is not None else EndpointMemo()
+        # 可选的磁盘响应缓存，命中时不发请求也不占用限速令牌
+        self.response_cache = response_cache
+        # 按接口族统计请求数、状态码、延迟和流量
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+
+    # 连接池、重试和 HTTP/2 等由 HttpTransport 配置，评论线程与主线程共用同一个会话
+    def _init_transport(self, transport):
+        self.transport = transport if transport is not None else HttpTransport()
+        self.session = self.transport.session
         self.session.headers.update(self.headers)
 
+    # 所有GET请求的统一入口：先查响应缓存；未命中时请求前等待令牌，请求后把状态码反馈给限速器
+    # 记录的延迟不含限速等待，只计网络请求本身，并按 DNS、建连、TLS、传输分段统计
+    # 网络异常和 5xx 最多重试 transport.retries 次，每次重试都重新等待令牌，限速器先按失败降速退避
+    def _get(self, url, **kwargs):
+        family = endpoint_family(url)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(url)
+            if cached is not None:
+                self.metrics.record_cache_hit(family)
+                return cached
+        for attempt in range(self.transport.retries + 1):
+            last = attempt == self.transport.retries
+            self.rate_limiter.wait(url)
+            start = time.perf_counter()
+            try:
+                response, phases = self.transport.timed_get(url, **kwargs)
+            except Exception as e:
+                self.metrics.record_request(family, None, time.perf_counter() - start)
+                self.rate_limiter.record(url, None)
+                if last or not isinstance(e, TRANSPORT_ERRORS):
+                    raise
+                logger.debug("请求失败，重试 (%d/%d): %s %s", attempt + 1, self.transport.retries, url, e)
+                continue
+            self.metrics.record_request(family, response.status_code, time.perf_counter() - start,
+                                        len(response.content), phases)
+            self.rate_limiter.record(url, response.status_code, parse_retry_after(response.headers.get('Retry-After')))
+            if last or response.status_code not in RETRY_STATUSES:
+                break
+            logger.debug("状态码 %s，重试 (%d/%d): %s", response.status_code, attempt + 1, self.transport.retries, url)
+        if self.response_cache is not None:
+            self.response_cache.put(url, response.status_code, response.headers, response.content)
+        return response
+
     # 获取用户基本信息
     def get_user_info(self, user_id):
-        url = f'https://weibo.com/ajax/profile/info?uid={user_id}'
+        url = f'{self.base_url}/ajax/profile/info?uid={user_id}'
         try:
-            response = self.session.get(url)
-            print(f"请求URL: {url}")
-            print(f"响应状态码: {response.status_code}")
-            print(f"响应内容: {response.text[:300]}")
+            response = self._get(url)
+            logger.debug("请求URL: %s", url)
+            logger.debug("响应状态码: %s", response.status_code)
+            # 截取响应内容要解码整个响应体，只在 DEBUG 级别下才做
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("响应内容: %s", response.text[:300])
             if response.status_code == 200:
                 data = response.json()
                 if data.get('ok') == 1 and 'data' in data:
                     return data['data']['user']
             return None
         except Exception as e:
-            print(f"获取用户信息失败: {e}")
+            logger.warning("获取用户信息失败: %s", e)
             return None
         
     # 获取用户的微博列表
     def get_user_weibos(self, user_id, page=1, count=20):
-        # 尝试多个API接口
-        urls_to_try = [
-            f'https://weibo.com/ajax/statuses/mymblog?uid={user_id}&page={page}&count={count}',
-            f'https://weibo.com/ajax/statuses/mymblog?uid={user_id}&page={page}',
-            f'https://weibo.com/ajax/statuses/mymblog?uid={user_id}',
-            f'https://weibo.com/ajax/statuses/user_timeline?uid={user_id}&page={page}&count={count}',
-            f'https://weibo.com/ajax/statuses/user_timeline?uid={user_id}&page={page}'
-        ]
+        # 尝试多个API接口，上次成功的接口排在最前，冷却中的接口跳过
+        candidates = self.endpoint_memo.candidates(self.base_url, user_id, page, count)
         
-        for url in urls_to_try:
+        for attempts, (name, url) in enumerate(candidates, 1):
             try:
-                print(f"尝试请求: {url}")
-                response = self.session.get(url, timeout=30)
-                print(f"响应状态码: {response.status_code}")
+                logger.debug("尝试请求: %s", url)
+                response = self._get(url, timeout=30)
+                logger.debug("响应状态码: %s", response.status_code)
                 
                 if response.status_code == 200:
                     data = response.json()
-                    print(f"API响应: {data.get('ok', 'unknown')}")
+                    logger.debug("API响应: %s", data.get('ok', 'unknown'))
                     
                     if data.get('ok') == 1 and 'data' in data:
                         weibo_list = data['data']['list']
                         total = data['data'].get('total', 0)
-                        print(f"获取到 {len(weibo_list)} 条微博，总数: {total}")
+                        logger.debug("获取到 %d 条微博，总数: %s", len(weibo_list), total)
+                        self.endpoint_memo.record_success(name, attempts)
                         return weibo_list, total
                     else:
-                        print(f"API返回错误: {data}")
+                        logger.warning("API返回错误: %s", data)
+                        self.endpoint_memo.record_failure(name, response.status_code)
                 elif response.status_code == 414:
-                    print(f"URL过长错误(414)，尝试下一个接口...")
+                    logger.warning("URL过长错误(414)，尝试下一个接口...")
+                    self.endpoint_memo.record_failure(name, response.status_code)
                     continue
                 else:
-                    print(f"HTTP请求失败: {response.status_code}")
+                    logger.warning("HTTP请求失败: %s", response.status_code)
+                    self.endpoint_memo.record_failure(name, response.status_code)
                     continue
             except Exception as e:
-                print(f"请求失败: {e}")
+                logger.warning("请求失败: %s", e)
+                self.endpoint_memo.record_failure(name)
                 continue
         
-        print("所有API接口都失败了")
+        logger.warning("所有API接口都失败了")
+        self.endpoint_memo.record_exhausted(len(candidates))
         return [], 0
     
-    # 清理文本内容，去除HTML标签等
+    # 清理文本内容，去除HTML标签、解码实体、合并空白，表情保留为 [笑] 这样的文字
     def clean_text(self, text):
-        if not text:
-            return ""
-        # 去除HTML标签
-        text = re.sub(r'<[^>]+>', '', text)
-        # 替换特殊字符
-        text = text.replace('&nbsp;', ' ')
-        text = text.replace('&lt;', '<')
-        text = text.replace('&gt;', '>')
-        text = text.replace('&amp;', '&')
-        # 去除多余空格和换行
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        return clean_text(text)
     
     # 格式化微博内容
     def format_weibo(self, weibo):
         try:
             if not weibo or not isinstance(weibo, dict):
-                return f"[数据格式错误] 微博数据无效\n" + "-" * 50 + "\n"
+                return f"[数据格式错误] 微博数据无效\n" + WEIBO_SEPARATOR
             created_at = weibo.get('created_at', '')
-            if created_at:
-                try:
-                    created_at = datetime.strptime(created_at, '%a %b %d %H:%M:%S %z %Y').strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    created_at = str(created_at)
-            else:
-                created_at = '未知时间'
+            # 固定格式的时间直接切片转换，不逐条 strptime
+            created_at = format_created_at(created_at) if created_at else '未知时间'
             text = weibo.get('text', '')
             if text is None:
                 text = ''
-            text = self.clean_text(text)
-            formatted = f"[{created_at}]\n{text}\n"
+            parts = [f"[{created_at}]\n{self.clean_text(text)}\n"]
             # 转发内容
             retweeted_status = weibo.get('retweeted_status')
             if retweeted_status is not None and isinstance(retweeted_status, dict):
@@ -128,59 +185,66 @@ class WeiboCrawler:
                 retweeted_text = retweeted_status.get('text', '')
                 if retweeted_text is None:
                     retweeted_text = ''
-                retweeted_text = self.clean_text(retweeted_text)
-                formatted += f"\n转发 @{retweeted_user_name}: {retweeted_text}\n"
-            
-            formatted += "-" * 50 + "\n"
-            return formatted
+                parts.append(f"\n转发 @{retweeted_user_name}: {self.clean_text(retweeted_text)}\n")
+            parts.append(WEIBO_SEPARATOR)
+            return ''.join(parts)
         except Exception as e:
-            print(f"格式化微博时出错: {e}")
+            logger.warning("格式化微博时出错: %s", e)
             try:
                 weibo_id = weibo.get('id', 'unknown') if weibo else 'unknown'
-                return f"[格式化错误] 微博ID: {weibo_id}\n" + "-" * 50 + "\n"
+                return f"[格式化错误] 微博ID: {weibo_id}\n" + WEIBO_SEPARATOR
             except:
-                return f"[格式化错误] 微博数据异常\n" + "-" * 50 + "\n"
+                return f"[格式化错误] 微博数据异常\n" + WEIBO_SEPARATOR
     
     # 爬取用户的所有微博
     def crawl_user_weibos(self, user_id, max_pages=None):
         user_info = self.get_user_info(user_id)
         if not user_info:
-            print(f"未找到用户 {user_id} 的信息")
+            logger.warning("未找到用户 %s 的信息", user_id)
             return [], str(user_id)  # 返回空列表和用户ID作为用户名
         
         screen_name = user_info.get('screen_name', user_id)
-        print(f"开始爬取用户 {screen_name} 的微博")
+        logger.info("开始爬取用户 %s 的微博", screen_name)
         
         all_weibos = []
-        page = 1
+        for page, weibos in self.iter_user_pages(user_id, max_pages):
+            all_weibos.extend(weibos)
+        
+        logger.info("共爬取到 %d 条微博", len(all_weibos))
+        return all_weibos, screen_name
+    
+    # 逐页爬取用户微博，每次产出 (页码, 本页微博列表)
+    # 传入 since_id 时只产出比它新的微博，碰到已爬过的微博就停止翻页
+    def iter_user_pages(self, user_id, max_pages=None, start_page=1, since_id=None):
+        page = start_page
         
         while True:
             # 检查页数限制
             if max_pages is not None and page > max_pages:
-                print(f"已达到最大页数限制: {max_pages}，停止爬取")
+                logger.debug("已达到最大页数限制: %s，停止爬取", max_pages)
                 break
                 
-            print(f"正在爬取第 {page} 页...")
+            logger.debug("正在爬取第 %d 页...", page)
             weibos, total = self.get_user_weibos(user_id, page)
             
             if not weibos:
-                print(f"第 {page} 页没有数据，停止爬取")
+                logger.debug("第 %d 页没有数据，停止爬取", page)
                 break
                 
-            all_weibos.extend(weibos)
-            print(f"第 {page} 页获取到 {len(weibos)} 条微博")
+            logger.debug("第 %d 页获取到 %d 条微博", page, len(weibos))
+            new_weibos, reached_seen = filter_new_weibos(weibos, since_id)
+            yield page, new_weibos
+            
+            if reached_seen:
+                logger.debug("第 %d 页已到达上次爬取的位置，停止爬取", page)
+                break
             
             # 如果返回的微博数量少于20条，说明可能是最后一页
             if len(weibos) < 20:
-                print(f"第 {page} 页只有 {len(weibos)} 条微博，可能是最后一页")
+                logger.debug("第 %d 页只有 %d 条微博，可能是最后一页", page, len(weibos))
                 break
             
             page += 1
-            # 防止请求过快
-            time.sleep(1)
-        
-        print(f"共爬取到 {len(all_weibos)} 条微博")
-        return all_weibos, screen_name
     
     # 爬取用户微博并保存到文件
     def save_weibos_to_file(self, user_id, max_pages=None):
@@ -198,97 +262,202 @@ class WeiboCrawler:
             f.write(f"微博数量: {len(weibos)}\n")
             f.write("=" * 50 + "\n\n")
             
-            for weibo in weibos:
-                formatted = self.format_weibo(weibo)
-                f.write(formatted)
+            f.writelines(self.format_weibo(weibo) for weibo in weibos)
         
         print(f"微博内容已保存到文件: {filename}")
         return filename
 
-    # 获取微博下的评论
-    def get_comments(self, weibo_id, count=10):
-        url = f"https://weibo.com/ajax/statuses/buildComments?is_reload=1&id={weibo_id}&is_show_bulletin=2&is_mix=0&count={count}"
-        try:
-            resp = self.session.get(url, timeout=10)
-            data = resp.json()
-            if data.get("ok") == 1 and "data" in data:
-                comments = []
-                for c in data["data"]:
-                    comments.append({
-                        "user": c.get("user", {}).get("screen_name", ""),
-                        "text": self.clean_text(c.get("text", "")),
-                        "like_count": c.get("like_count", 0)
-                    })
-                return comments
-            else:
-                return []
-        except Exception as e:
-            print(f"获取评论失败: {e}")
+    # 获取微博下的评论，按返回的 max_id 继续翻页，最多 max_pages 页（None 表示翻到底）
+    def get_comments(self, weibo_id, count=10, max_pages=1):
+        comments = []
+        max_id = 0
+        fetched_pages = 0
+        while max_pages is None or fetched_pages < max_pages:
+            url = f"{self.base_url}/ajax/statuses/buildComments?is_reload=1&id={weibo_id}&is_show_bulletin=2&is_mix=0&count={count}"
+            if max_id:
+                url += f"&max_id={max_id}"
+            try:
+                resp = self._get(url, timeout=10)
+                data = resp.json()
+                if data.get("ok") == 1 and "data" in data:
+                    # 一页评论的文本一次批量清洗
+                    texts = clean_texts([c.get("text", "") for c in data["data"]])
+                    for c, text in zip(data["data"], texts):
+                        comments.append({
+                            "user": c.get("user", {}).get("screen_name", ""),
+                            "text": text,
+                            "like_count": c.get("like_count", 0)
+                        })
+                    fetched_pages += 1
+                    max_id = data.get("max_id", 0)
+                    if not max_id or not data["data"]:
+                        break
+                else:
+                    break
+            except Exception as e:
+                logger.warning("获取评论失败: %s", e)
+                break
+        return comments
+    
+    # 获取某页中一条微博的评论；有进度日志时优先使用崩溃前已获取的结果
+    def fetch_weibo_comments(self, weibo, user_id=None, page=None, journal=None, max_pages=1):
+        weibo_id = weibo.get("id")
+        if not weibo_id:
+            return []
+        # 没有评论的微博不必请求
+        if weibo.get("comments_count") == 0:
             return []
+        if journal is not None:
+            cached = journal.cached_comments(user_id, page, weibo_id)
+            if cached is not None:
+                return cached
+        comments = self.get_comments(weibo_id, count=10, max_pages=max_pages)
+        if journal is not None:
+            journal.record_comments(user_id, page, weibo_id, comments)
+        return comments
 
-def batch_crawl(user_ids, cookie=None, max_pages=None, total_limit=10000):
-    crawler = WeiboCrawler(cookie=cookie)
-    all_weibos = []
+# 批量爬取的生成器版本：逐条产出带评论的微博，调用方边取边写，内存占用与总量无关
+# 评论由 CommentPipeline 的线程池并发获取，与翻页同时进行；comment_workers=0 时逐条抓取
+# 传入 journal 时跳过已完成的用户/页，并在每页的微博全部交给调用方后记录进度
+# 传入 state 时记录每个用户的最新微博；incremental 为 True 时只爬比上次更新的微博
+# 传入 dedup（SeenIndex）时跳过已写过的微博，不抓评论也不输出；传入 retweets（RetweetStore）时转发原文单独存放
+def iter_batch_crawl(crawler, user_ids, max_pages=None, total_limit=10000, journal=None, state=None, incremental=False,
+                     comment_workers=4, comment_pages=1, dedup=None, retweets=None):
+    total_count = journal.written if journal is not None else 0
+    pipeline = CommentPipeline(crawler, comment_workers, comment_pages, journal)
     
-    print(f"开始批量爬取，目标：总微博数≥{total_limit}")
-    print(f"用户列表长度: {len(user_ids)}")
-    print(f"每个用户最大爬取页数: {max_pages if max_pages else '无限制'}")
+    logger.info("开始批量爬取，目标：总微博数≥%d", total_limit)
+    logger.info("用户列表长度: %d", len(user_ids))
+    logger.info("每个用户最大爬取页数: %s", max_pages if max_pages else '无限制')
     
-    for i, user_id in enumerate(user_ids, 1):
-        print(f"\n正在处理第 {i}/{len(user_ids)} 个用户: {user_id}")
-        
-        try:
-            weibos, screen_name = crawler.crawl_user_weibos(user_id, max_pages)
-            print(f"用户 {screen_name} 爬取到 {len(weibos)} 条微博")
-            
-            for weibo in weibos:
-                # 爬取评论
-                weibo_id = weibo.get("id")
-                if weibo_id:
-                    comments = crawler.get_comments(weibo_id, count=10)
-                    weibo["comments"] = comments
-                else:
-                    weibo["comments"] = []
-                all_weibos.append(weibo)
-                
-                # 检查是否达到目标
-                if len(all_weibos) >= total_limit:
-                    print(f"已达到目标：总微博数 {len(all_weibos)}")
-                    return all_weibos, crawler
-            
-            print(f"当前累计：总微博数 {len(all_weibos)}")
-            
-            # 如果已经爬取了足够多的用户，可以提前停止
-            if i >= 20 and len(all_weibos) >= total_limit * 0.8:  # 爬取20个用户或达到80%目标
-                print(f"已爬取 {i} 个用户，达到预期目标，提前停止")
+    try:
+        for i, user_id in enumerate(user_ids, 1):
+            if total_count >= total_limit:
+                logger.info("已达到目标：总微博数 %d", total_count)
                 break
+            if journal is not None and journal.is_user_done(user_id):
+                continue
+            logger.info("\n正在处理第 %d/%d 个用户: %s", i, len(user_ids), user_id)
             
-        except Exception as e:
-            print(f"处理用户 {user_id} 时出错: {e}")
-            continue
+            try:
+                user_info = crawler.get_user_info(user_id)
+                if not user_info:
+                    logger.warning("未找到用户 %s 的信息", user_id)
+                    if journal is not None:
+                        pipeline.put_marker(partial(journal.record_user, user_id))
+                    continue
+                screen_name = user_info.get('screen_name', user_id)
+                start_page = journal.next_page(user_id) if journal is not None else 1
+                since_id = state.since_id(user_id) if state is not None and incremental else None
+                user_count = 0
+                
+                for page, weibos in crawler.iter_user_pages(user_id, max_pages, start_page, since_id):
+                    if dedup is not None:
+                        weibos = [weibo for weibo in weibos if not dedup.check(weibo)]
+                    # 只处理达到目标所需的条数
+                    weibos = weibos[:total_limit - total_count]
+                    for weibo in weibos:
+                        if retweets is not None:
+                            retweets.detach(weibo)
+                        # 爬取评论
+                        pipeline.put_weibo(weibo, user_id, page)
+                    
+                    if dedup is not None:
+                        pipeline.put_marker(partial(dedup.commit, weibos))
+                    if journal is not None:
+                        pipeline.put_marker(partial(journal.record_page, user_id, page, len(weibos)))
+                    total_count += len(weibos)
+                    user_count += len(weibos)
+                    
+                    # 产出评论已到齐的微博，不等待其余的
+                    for uid, weibo in pipeline.drain():
+                        crawler.metrics.add_posts(1, len(weibo.get('comments') or ()))
+                        yield weibo
+                        if state is not None:
+                            state.advance(uid, weibo)
+                    
+                    # 检查是否达到目标
+                    if total_count >= total_limit:
+                        break
+                
+                if total_count >= total_limit:
+                    logger.info("已达到目标：总微博数 %d", total_count)
+                    break
+                if journal is not None:
+                    pipeline.put_marker(partial(journal.record_user, user_id))
+                logger.info("用户 %s 爬取到 %d 条微博", screen_name, user_count)
+                logger.info("当前累计：总微博数 %d", total_count)
+                
+                # 如果已经爬取了足够多的用户，可以提前停止
+                if i >= 20 and total_count >= total_limit * 0.8:  # 爬取20个用户或达到80%目标
+                    logger.info("已爬取 %d 个用户，达到预期目标，提前停止", i)
+                    break
+                
+            except Exception as e:
+                logger.warning("处理用户 %s 时出错: %s", user_id, e)
+                continue
+        
+        # 等待剩余评论全部到齐
+        for uid, weibo in pipeline.drain(block=True):
+            crawler.metrics.add_posts(1, len(weibo.get('comments') or ()))
+            yield weibo
+            if state is not None:
+                state.advance(uid, weibo)
+    finally:
+        pipeline.close()
     
-    print(f"所有用户处理完成，最终结果：总微博数 {len(all_weibos)}")
+    logger.info("所有用户处理完成，最终结果：总微博数 %d", total_count)
+
+# 批量爬取。传入 output（JsonlWriter）时边爬边写，不在内存中累积；否则返回全部微博的列表
+def batch_crawl(user_ids, cookie=None, max_pages=None, total_limit=10000, base_url=DEFAULT_BASE_URL, rate_limiter=None,
+                journal=None, output=None, state=None, incremental=False, endpoint_memo=None,
+                comment_workers=4, comment_pages=1, response_cache=None, dedup=None, retweets=None, metrics=None,
+                transport=None):
+    # 评论线程和翻页的主线程同时发请求，默认连接池按线程数设置，避免连接用完后被丢弃重建
+    if transport is None:
+        transport = HttpTransport(pool_maxsize=max(comment_workers + 1, 1))
+    crawler = WeiboCrawler(cookie=cookie, base_url=base_url, rate_limiter=rate_limiter, endpoint_memo=endpoint_memo,
+                           response_cache=response_cache, metrics=metrics, transport=transport)
+    all_weibos = []
+    for weibo in iter_batch_crawl(crawler, user_ids, max_pages, total_limit, journal, state, incremental,
+                                  comment_workers, comment_pages, dedup, retweets):
+        if output is not None:
+            output.write(weibo)
+        else:
+            all_weibos.append(weibo)
     return all_weibos, crawler
 
-# 保存批量爬取的微博到文件
-def save_batch_weibos(all_weibos, crawler=None):
-    print(f"开始保存微博，总微博数: {len(all_weibos)}")
-    
-    # 如果没有传入crawler实例，创建一个新的
-    if crawler is None:
-        crawler = WeiboCrawler()
-    
+# 保存批量爬取的微博到文件，all_weibos 可以是列表，也可以是 iter_batch_crawl 返回的生成器
+# 指定 compression、rotate_bytes、rotate_records 或 projection 时写成分段压缩文件和清单（见 rotating_output）
+def save_batch_weibos(all_weibos, crawler=None, output_file='all_weibos.txt', batch_size=200, fsync_interval=30.0,
+                      compression=None, rotate_bytes=None, rotate_records=None, projection=None):
     # 保存所有微博为jsonl格式
-    print("正在保存所有微博到 all_weibos.txt...")
-    with open('all_weibos.txt', 'w', encoding='utf-8') as f:
+    print(f"正在保存所有微博到 {output_file}...")
+    if compression or rotate_bytes or rotate_records or projection:
+        writer = RotatingJsonlWriter(output_file, compression, rotate_bytes, rotate_records, parse_projection(projection),
+                                     batch_size, fsync_interval).open()
+    else:
+        writer = JsonlWriter(open(output_file, 'wb'), batch_size, fsync_interval)
+    with writer:
         for weibo in all_weibos:
-            try:
-                f.write(json.dumps(weibo, ensure_ascii=False) + "\n")
-            except Exception as e:
-                print(f"保存微博json时出错: {e}")
-                f.write(json.dumps({"error": str(e), "id": weibo.get('id', 'unknown')}, ensure_ascii=False) + "\n")
+            writer.write(weibo)
     
-    print("所有文件保存完成！")
+    print(f"所有文件保存完成！总微博数: {writer.count}")
+    if isinstance(writer, RotatingJsonlWriter):
+        print(writer.summary())
+
+# 命令行是否要求分段压缩输出
+def rotating_output(args):
+    return bool(args.compress or args.rotate_mb or args.rotate_records or args.projection)
+
+# 不续爬时输出是否追加到已有数据之后：增量模式，或使用去重索引时
+# 去重索引记录的是已写入输出的微博，清空输出后这些微博会被一直跳过，所以有索引时输出只能追加
+def append_output(args):
+    return bool(args.incremental or args.dedup_index)
+
+# 爬取结果的读取入口：分段输出时是清单文件，否则是输出文件本身
+def output_source(args):
+    return manifest_path(args.output) if rotating_output(args) else args.output
 
 def main():
     parser = argparse.ArgumentParser(description='微博爬虫 - 批量爬取用户微博')
@@ -297,7 +466,55 @@ def main():
     parser.add_argument('--cookie-file', help='包含cookie的文件路径', default=None)
     parser.add_argument('--user-ids-file', help='用户ID列表txt文件', default='user_ids.txt')
     parser.add_argument('--total-limit', type=int, help='累计微博总数', default=10000)
+    parser.add_argument('--engine', choices=['sync', 'async'], help='爬取引擎：sync 逐个请求，async 并发请求', default='sync')
+    parser.add_argument('--concurrency', type=int, help='async 引擎同时爬取的用户数', default=8)
+    parser.add_argument('--per-host-limit', type=int, help='async 引擎每个主机的最大连接数', default=8)
+    parser.add_argument('--base-url', help='微博接口地址（可指向本地模拟服务器）', default=DEFAULT_BASE_URL)
+    parser.add_argument('--rate-config', help='限速配置JSON文件，按接口族设置 rate/burst/max_rate', default=None)
+    parser.add_argument('--output', help='输出的JSONL文件', default='all_weibos.txt')
+    parser.add_argument('--journal', help='爬取进度日志文件', default='crawl_journal.jsonl')
+    parser.add_argument('--resume', action='store_true', help='根据进度日志跳过已完成的用户/页，继续追加到输出文件')
+    parser.add_argument('--incremental', action='store_true', help='增量模式：只爬取比上次更新的微博，并追加到输出文件')
+    parser.add_argument('--state-file', help='记录每个用户最新微博的状态文件', default='crawl_state.json')
+    parser.add_argument('--endpoint-memo', help='保存可用接口记忆的JSON文件，跨次运行复用', default=None)
+    parser.add_argument('--endpoint-cooldown', type=float, help='失败接口的冷却秒数', default=600)
+    parser.add_argument('--comment-workers', type=int, help='并发抓取评论的线程数，0 表示逐条抓取', default=4)
+    parser.add_argument('--comment-pages', type=int, help='每条微博最多抓取的评论页数（按 max_id 翻页）', default=1)
+    parser.add_argument('--flush-every', type=int, help='每攒多少条微博写一次文件', default=200)
+    parser.add_argument('--fsync-interval', type=float, help='两次 fsync 之间的最小秒数，负数表示不主动 fsync', default=30.0)
+    parser.add_argument('--shards', type=int, help='按用户ID哈希分片，启动多少个工作进程并行爬取', default=1)
+    parser.add_argument('--cookie-pool', help='分片模式的cookie池文件，每行一个cookie，各工作进程轮流使用', default=None)
+    parser.add_argument('--keep-shards', action='store_true', help='合并后保留各分片的输出和进度日志')
+    parser.add_argument('--parquet', help='爬取结束后另存一份Parquet列式文件（需要 pyarrow）', default=None)
+    parser.add_argument('--cache', help='HTTP响应缓存的SQLite文件，重复运行时直接使用缓存的响应', default=None)
+    parser.add_argument('--cache-ttl-config', help='缓存有效期配置JSON文件，按接口族设置秒数', default=None)
+    parser.add_argument('--cache-max-mb', type=float, help='响应缓存的最大体积（MB），超过后淘汰最久未用的条目', default=512)
+    parser.add_argument('--replay', action='store_true', help='回放模式：只使用 --cache 中的响应，不访问网络')
+    parser.add_argument('--dedup-index', help='已写入微博的id索引文件，跨用户、跨次运行跳过重复微博；使用时输出总是追加写入',
+                        default=None)
+    parser.add_argument('--retweet-store', help='转发原文单独保存的JSONL文件，微博中只保留原文id', default=None)
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], help='输出写成压缩的分段文件（zstd 需要 zstandard）',
+                        default=None)
+    parser.add_argument('--rotate-mb', type=float, help='单个分段的最大未压缩体积（MB），达到后切换到新分段', default=None)
+    parser.add_argument('--rotate-records', type=int, help='单个分段的最多微博条数，达到后切换到新分段', default=None)
+    parser.add_argument('--projection', help="字段投影：'analysis' 只保留分析用到的字段，或逗号分隔的字段列表；"
+                        "用户资料单独保存一次", default=None)
+    parser.add_argument('--post-store', help='同时写入带索引的SQLite帖子库（.db），分析时可按时间、用户、关键词筛选', default=None)
+    parser.add_argument('--pool-size', type=int, help='每个主机保持的连接数，sync 引擎默认为评论线程数+1，'
+                        'async 引擎指定时代替 --per-host-limit', default=None)
+    parser.add_argument('--http-retries', type=int, help='网络异常和5xx的重试次数，每次重试都经过限速器', default=2)
+    parser.add_argument('--http-backoff', type=float, help='sync 引擎建立连接失败时重试的指数退避因子（秒）', default=0.5)
+    parser.add_argument('--no-keep-alive', action='store_true', help='每个请求后关闭连接（用于对比keep-alive的效果）')
+    parser.add_argument('--http2', action='store_true', help='sync 引擎使用 HTTP/2 多路复用（需要 httpx[http2]）')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='日志级别：DEBUG 输出每个请求和每页的详情，WARNING 只输出失败', default='INFO')
+    parser.add_argument('--metrics-file', help='爬取指标输出文件，.prom 后缀为 Prometheus 文本格式，其余为JSON', default=None)
+    parser.add_argument('--progress-interval', type=float, help='每隔多少秒输出一行进度并刷新指标文件，0 表示不输出', default=30)
     args = parser.parse_args()
+    if args.replay and not args.cache:
+        parser.error('--replay 需要同时指定 --cache')
+    if args.http2 and args.engine == 'async':
+        parser.error('--http2 只支持 sync 引擎，aiohttp 不支持 HTTP/2')
 
     cookie = args.cookie
     if args.cookie_file and not cookie:
@@ -333,11 +550,128 @@ def main():
         print(f"读取用户ID文件失败: {e}")
         sys.exit(1)
 
+    if args.shards > 1:
+        from shard_crawl import load_cookie_pool, run_sharded
+        cookies = load_cookie_pool(args.cookie_pool) if args.cookie_pool else [cookie]
+        run_sharded(user_ids, cookies, args)
+    else:
+        run_crawl(user_ids, cookie, args)
+
+    if args.parquet:
+        from columnar_store import jsonl_to_parquet
+        jsonl_to_parquet(output_source(args), args.parquet)
+
+# 按命令行参数执行一次爬取，结果写入 args.output，返回累计写入的微博数
+# 分片模式下每个工作进程也调用它，state_seed、dedup_seed、retweet_seed 为总状态文件、总去重索引和总转发文件
+def run_crawl(user_ids, cookie, args, state_seed=None, dedup_seed=None, retweet_seed=None):
+    configure_logging(args.log_level)
+    rate_limiter = RateLimiter(load_rate_config(args.rate_config) if args.rate_config else None)
+
+    # 边爬边分批写入输出文件并记录进度，中断后可用 --resume 继续
+    journal = CrawlJournal(args.journal).open(resume=args.resume)
+    fsync_interval = args.fsync_interval if args.fsync_interval >= 0 else None
+    if rotating_output(args):
+        output = RotatingJsonlWriter(args.output, args.compress,
+                                     int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None,
+                                     args.rotate_records, parse_projection(args.projection),
+                                     args.flush_every, fsync_interval)
+        output.open(append=append_output(args), resume=args.resume, offset=journal.output_offset)
+    else:
+        if args.resume:
+            f = open_resumed_output(args.output, journal)
+        elif append_output(args):
+            # 新微博追加到已有数据之后
+            f = open(args.output, 'ab')
+        else:
+            f = open(args.output, 'wb')
+        output = JsonlWriter(f, args.flush_every, fsync_interval)
+    journal.bind_writer(output)
+    state = CrawlState(args.state_file, seed_path=state_seed)
+    state.bind_writer(output)
+    endpoint_memo = EndpointMemo(cooldown=args.endpoint_cooldown, path=args.endpoint_memo)
+    response_cache = None
+    if args.cache:
+        response_cache = ResponseCache(args.cache,
+                                       ttls=load_cache_ttls(args.cache_ttl_config) if args.cache_ttl_config else None,
+                                       max_bytes=int(args.cache_max_mb * 1024 * 1024), replay=args.replay)
+    dedup = None
+    if args.dedup_index:
+        dedup = SeenIndex(args.dedup_index, dedup_seed)
+        dedup.bind_writer(output)
+    retweets = None
+    if args.retweet_store:
+        retweets = RetweetStore(args.retweet_store, args.flush_every, fsync_interval, retweet_seed)
+        retweets.bind_writer(output)
+    post_store = None
+    if args.post_store:
+        post_store = PostStore(args.post_store)
+        post_store.bind_writer(output)
+    transport = None
+    metrics = CrawlMetrics()
+    if args.progress_interval > 0:
+        metrics.start_reporter(args.progress_interval, args.metrics_file, logger.info)
+
     print(f"设置最大爬取页数: {args.max_pages}")
-    all_weibos, crawler = batch_crawl(user_ids, cookie, args.max_pages, args.total_limit)
-    print(f"最终累计微博数: {len(all_weibos)}")
-    save_batch_weibos(all_weibos, crawler)
-    print("所有微博已保存到 all_weibos.txt")
+    try:
+        if args.engine == 'async':
+            from async_crawler import run_async_batch_crawl
+            run_async_batch_crawl(user_ids, cookie, args.max_pages, args.total_limit,
+                                  base_url=args.base_url,
+                                  user_concurrency=args.concurrency,
+                                  per_host_limit=args.pool_size or args.per_host_limit,
+                                  retries=args.http_retries,
+                                  keep_alive=not args.no_keep_alive,
+                                  rate_limiter=rate_limiter,
+                                  journal=journal, output=output,
+                                  state=state, incremental=args.incremental,
+                                  endpoint_memo=endpoint_memo,
+                                  comment_pages=args.comment_pages,
+                                  response_cache=response_cache,
+                                  dedup=dedup, retweets=retweets, metrics=metrics)
+        else:
+            transport = HttpTransport(pool_maxsize=args.pool_size or max(args.comment_workers + 1, 1),
+                                      retries=args.http_retries, backoff=args.http_backoff,
+                                      keep_alive=not args.no_keep_alive, http2=args.http2)
+            print(transport.summary())
+            batch_crawl(user_ids, cookie, args.max_pages, args.total_limit,
+                        base_url=args.base_url, rate_limiter=rate_limiter,
+                        journal=journal, output=output,
+                        state=state, incremental=args.incremental,
+                        endpoint_memo=endpoint_memo,
+                        comment_workers=args.comment_workers, comment_pages=args.comment_pages,
+                        response_cache=response_cache, dedup=dedup, retweets=retweets, metrics=metrics,
+                        transport=transport)
+    except KeyboardInterrupt:
+        print(f"\n爬取已中断，进度已保存到 {args.journal}，可使用 --resume 继续")
+        sys.exit(1)
+    finally:
+        metrics.stop_reporter()
+        if transport is not None:
+            transport.close()
+        output.close()
+        journal.close()
+        endpoint_memo.save()
+        print(endpoint_memo.summary())
+        if response_cache is not None:
+            print(response_cache.summary())
+            response_cache.close()
+        if dedup is not None:
+            print(dedup.summary())
+        if retweets is not None:
+            retweets.close()
+            print(retweets.summary())
+        if post_store is not None:
+            post_store.close()
+            print(post_store.summary())
+        print(metrics.progress_line())
+        if args.metrics_file:
+            metrics.dump(args.metrics_file)
+            print(f"爬取指标已保存到 {args.metrics_file}")
+    print(f"最终累计微博数: {journal.written}")
+    if isinstance(output, RotatingJsonlWriter):
+        print(output.summary())
+    print(f"所有微博已保存到 {output_source(args)}")
+    return journal.written
 
 if __name__ == "__main__":
     main()
\ No newline at end of file